@@ -1,30 +1,58 @@
 from collections import UserDict
+from collections.abc import Mapping
+from itertools import islice
 from record import *
 from change import *
+from journal import *
+from searchindex import SubstringIndex, SortedNameIndex, FuzzyNameIndex
+from autosave import AutoSaver
 import warnings
 import pickle
 import os
+import threading
 #from collections.abc import Iterable
 from myexception import *
 
 
+def synchronized(method):
+    """
+    Executes the method of the address book while holding its lock, e.g. to avoid that the address book
+    is changed while it is saved from the autosave thread.
+    """
+    def inner(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    inner.__name__ = method.__name__
+    inner.__doc__ = method.__doc__
+    return inner
+
+
 class ABIterator:
     """
     this class represents an iterator over the records in an address book.
+    Records are pulled from the collection lazily, only when the next page is requested.
     """
 
-    def __init__(self, collection, n=None):
+    def __init__(self, collection, n=None, cursor=None, start_idx=0):
         """
         Initializes the iterator.
-        :param collection: collection over with the iterator will iterate. Expected: dict with records.
+        :param collection: collection over with the iterator will iterate. Expected: dict (or another mapping)
+                    with records (contact name -> record) or any other iterable with records.
         :param n: number of objects from the collection which have to be returned in one iteration.
                     If None, all objects will be returned at once.
+        :param cursor: contact name after which the collection starts, if it continues an earlier listing
+                    (see AddressBook.sorted_iterator).
+        :param start_idx: number of records listed before the collection, e.g. up to the cursor:
+                    the records are numbered from start_idx + 1.
         """
+        self.cursor = cursor    # contact name of the last returned record: the listing can be resumed after it
         self.collection = None
+        self.records = iter(())
         self.set_collection(collection)
         self.n = None
         self.set_n(n)
-        self.start_idx = 0
+        self.start_idx = start_idx
 
     def set_collection(self, new_collection):
         """
@@ -33,11 +61,38 @@ class ABIterator:
         """
         if not new_collection:
             self.collection = None
+            self.records = iter(())
+            return
+        try:
+            iter(new_collection)
+        except Exception:
+            raise ValueError(f"The collection {new_collection} for iteration is not iterable.")
+        self.collection = new_collection
+        if isinstance(new_collection, Mapping):
+            self.records = self.iterate_dict(new_collection)
         else:
+            self.records = iter(new_collection)
+
+    @staticmethod
+    def iterate_dict(collection: dict):
+        """
+        Generates the records stored in a dict. If the dict gets changed between two pages, the iteration
+        continues over the changed dict: records which were already returned are skipped,
+        deleted records are not returned anymore, added records are returned at the end.
+        :param collection: dict (or another mapping) with records (contact name -> record).
+        :return: generator of records.
+        """
+        seen = set()
+        while True:
             try:
-                self.collection = list(new_collection)
-            except Exception:
-                raise ValueError(f"The collection {new_collection} for iteration is not iterable.")
+                for name in collection:
+                    if name not in seen:
+                        seen.add(name)
+                        yield collection[name]
+                return
+            except RuntimeError:
+                # the dict changed size during iteration: start a new pass over the dict
+                continue
 
     def set_n(self, new_n: int):
         """
@@ -60,28 +115,34 @@ class ABIterator:
         return self
 
     def __next__(self):
-        if not self.collection:
-            raise StopIteration
-        elif self.start_idx >= len(self.collection):
-            raise StopIteration
-        elif not self.n:
-            self.start_idx = len(self.collection)
-            return AddressBook.display_records(self.collection)
+        if not self.n:
+            page = list(self.records)
         else:
-            end_idx = min(self.start_idx + self.n, len(self.collection))
-            res = self.collection[self.start_idx: end_idx]
-            res = AddressBook.display_records(res, self.start_idx)
-            self.start_idx = end_idx
-            return res
+            page = list(islice(self.records, self.n))
+        if not page:
+            raise StopIteration
+        res = AddressBook.display_records(page, self.start_idx)
+        self.start_idx += len(page)
+        self.cursor = page[-1].get_name()
+        return res
 
 
 class AddressBook(UserDict):
     """
     Class representing the address book.
     """
+    # number of names taken from the sorted name index at once during a sorted iteration
+    FETCH_SIZE = 500
+    # maximum edit distance of the search for names with typos (see get_record_by_fuzzy_name)
+    FUZZY_MAX_DISTANCE = 2
+    # attributes with the indexes of the records: they are not stored in the snapshots (see rebuild_indexes)
+    INDEXES = ("phone_index", "email_index", "birthday_index", "birthday_calendar", "substring_index",
+               "name_index", "fuzzy_index")
+
     @staticmethod
     def display_records(data, prev_id=0):
-        res = "\n\n".join(f"{prev_id + pos + 1}. {record.to_string()}" for pos, record in enumerate(data))
+        today = Today.get()     # one context of the current date for all records
+        res = "\n\n".join(f"{prev_id + pos + 1}. {record.to_string(today)}" for pos, record in enumerate(data))
         return res
 
     def __init__(self, username="defaultuser"):
@@ -92,12 +153,44 @@ class AddressBook(UserDict):
         super(AddressBook, self).__init__(self)
         self.username = username    # owner of the address book
         self.n = None               # number of records to be returned per one iteration
+        # the contact names in the indexes are kept in dicts (name -> None): unlike sets, they keep the order
+        # in which the names were added, so the results of the searches do not depend on the hashes of the names
+        self.phone_index = {}       # key of a phone number -> contact names whose records contain it
+        self.email_index = {}       # e-mail -> contact names whose records contain it
+        self.birthday_index = {}    # birthday date ("dd/mm") -> contact names with this birthday
+        self.birthday_calendar = [{} for _ in range(Birthday.DAYS_IN_CALENDAR)]  # day of year -> contact names
+        self.substring_index = SubstringIndex()  # fragments of names, phones and e-mails -> contact names
+        self.name_index = SortedNameIndex()  # contact names in sorted order
+        self.fuzzy_index = None     # FuzzyNameIndex of the contact names, built at the first search for a similar name
+        self.journal = None         # journal for the changes since the last snapshot (None: journaled mode is off)
+        self.dirty = False          # True if there are changes which were not saved to a file yet
+        self.changed_records = set()  # contact names of the records changed since the last save
+        self.lock = threading.RLock()  # guards changes and saves of the address book
+        self.autosave = None        # AutoSaver of the address book (None: autosave is off)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["journal"] = None     # open files cannot be stored, the journal is re-attached after loading
+        state["dirty"] = False
+        state["changed_records"] = set()
+        for index in self.INDEXES:
+            state[index] = None     # the indexes are derived from the records, they are built again after loading
+        del state["lock"], state["autosave"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+        self.autosave = None
+        self.rebuild_indexes()  # also replaces the indexes stored by older versions
 
     def get_username(self):
         return self.username
 
+    @synchronized
     def set_username(self, new_name):
         self.username = new_name
+        self.dirty = True
 
     def set_number_records_per_iteration(self, new_n: int):
         """
@@ -115,16 +208,210 @@ class AddressBook(UserDict):
         except:
             raise MyException(f"Positive integer number is expected as a parameter for iteration, provided: '{new_n}")
 
-    def add_record(self, record: Record):
+    @staticmethod
+    def add_to_index(index: dict, value: str, name: str):
         """
-        Adds a new record to the address book.
-        :param record: new record to be added to the address book.
+        Registers the contact name under the given value in an index.
+        :param index: one of the indexes of the address book, e.g. self.phone_index.
+        :param value: indexed value (phone number, e-mail, birthday date).
+        :param name: contact name of the record containing the value.
+        :return: None.
+        """
+        if value in index:
+            index[value][name] = None
+        else:
+            index[value] = {name: None}
+
+    @staticmethod
+    def remove_from_index(index: dict, value: str, name: str):
+        """
+        Removes the contact name registered under the given value from an index.
+        :param index: one of the indexes of the address book, e.g. self.phone_index.
+        :param value: indexed value (phone number, e-mail, birthday date).
+        :param name: contact name of the record which contained the value.
+        :return: None.
+        """
+        names = index.get(value)
+        if names is not None:
+            names.pop(name, None)
+            if not names:
+                del index[value]
+
+    def index_name(self, name: str):
+        """
+        Registers a contact name in the indexes of the names.
+        :param name: contact name.
+        :return: None.
+        """
+        self.name_index.add(name)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.add(name)
+
+    def unindex_name(self, name: str):
+        self.name_index.remove(name)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.remove(name)
+
+    def index_record(self, record: Record):
+        """
+        Registers phone numbers, e-mails and the birthday date of a record in the indexes of the address book.
+        :param record: record to be indexed.
+        :return: None.
+        """
+        name = record.get_name()
+        self.index_name(name)
+        self.substring_index.add(name, name)
+        for phone in record.phones:
+            self.add_to_index(self.phone_index, phone.get_key(), name)
+            self.substring_index.add(phone.get_value(), name)
+        for email in record.get_emails():
+            self.add_to_index(self.email_index, email, name)
+            self.substring_index.add(email, name)
+        birthday = record.get_birthday()
+        if birthday:
+            self.add_to_index(self.birthday_index, birthday, name)
+            self.birthday_calendar[record.birthday.get_day_of_year()][name] = None
+
+    def unindex_record(self, record: Record):
+        """
+        Removes phone numbers, e-mails and the birthday date of a record from the indexes of the address book.
+        Must be called before the record gets changed or removed.
+        :param record: record to be removed from the indexes.
+        :return: None.
+        """
+        name = record.get_name()
+        self.unindex_name(name)
+        self.substring_index.remove(name, name)
+        for phone in record.phones:
+            self.remove_from_index(self.phone_index, phone.get_key(), name)
+            self.substring_index.remove(phone.get_value(), name)
+        for email in record.get_emails():
+            self.remove_from_index(self.email_index, email, name)
+            self.substring_index.remove(email, name)
+        birthday = record.get_birthday()
+        if birthday:
+            self.remove_from_index(self.birthday_index, birthday, name)
+            self.birthday_calendar[record.birthday.get_day_of_year()].pop(name, None)
+
+    def reindex_record(self, old_record: Record, new_record: Record):
+        """
+        Updates the indexes after a record was replaced with its changed copy with the same contact name:
+        only the phone numbers, e-mails and the birthday date which differ are unregistered and registered.
+        :param old_record: replaced record.
+        :param new_record: record which replaced it.
+        :return: None.
+        """
+        name = new_record.get_name()
+        for index, old_keys, new_keys in ((self.phone_index, old_record.get_phone_keys(), new_record.get_phone_keys()),
+                                          (self.email_index, old_record.get_emails(), new_record.get_emails())):
+            for key in set(old_keys).difference(new_keys):
+                self.remove_from_index(index, key, name)
+            for key in set(new_keys).difference(old_keys):
+                self.add_to_index(index, key, name)
+        for old_values, new_values in ((old_record.get_phones(), new_record.get_phones()),
+                                       (old_record.get_emails(), new_record.get_emails())):
+            for value in set(old_values).difference(new_values):
+                self.substring_index.remove(value, name)
+            for value in set(new_values).difference(old_values):
+                self.substring_index.add(value, name)
+        if old_record.get_birthday() != new_record.get_birthday():
+            if old_record.birthday:
+                self.remove_from_index(self.birthday_index, old_record.get_birthday(), name)
+                self.birthday_calendar[old_record.birthday.get_day_of_year()].pop(name, None)
+            if new_record.birthday:
+                self.add_to_index(self.birthday_index, new_record.get_birthday(), name)
+                self.birthday_calendar[new_record.birthday.get_day_of_year()][name] = None
+
+    def rebuild_indexes(self):
+        """
+        Rebuilds all indexes from scratch, e.g. after the records were replaced wholesale.
+        :return: None.
+        """
+        self.phone_index = {}
+        self.email_index = {}
+        self.birthday_index = {}
+        self.birthday_calendar = [{} for _ in range(Birthday.DAYS_IN_CALENDAR)]
+        self.substring_index = SubstringIndex()
+        self.name_index = SortedNameIndex(self.data)
+        self.fuzzy_index = None
+        for record in self.data.values():
+            self.index_record(record)
+
+    def get_records_from_index(self, index: dict, value: str):
+        """
+        Returns the records registered under the given value in an index.
+        :param index: one of the indexes of the address book, e.g. self.phone_index.
+        :param value: value to look for.
+        :return: list of records in the order in which they were indexed (empty if the value is not indexed).
+        """
+        return [self.data[name] for name in index.get(value, ())]
+
+    def log_operation(self, op: JournalOp, payload):
+        """
+        Marks the address book and the records as changed and appends the operation to the journal
+        if the journaled mode is on.
+        :param op: type of the operation.
+        :param payload: data needed to repeat the operation.
+        :return: None.
+        """
+        self.dirty = True
+        match op:
+            case JournalOp.ADD_RECORD | JournalOp.EDIT_RECORD:
+                self.changed_records.add(payload.get_name())
+            case JournalOp.DELETE_RECORD:
+                self.changed_records.add(payload)
+            case JournalOp.RENAME_RECORD:
+                self.changed_records.update(payload)
+        if self.journal is not None:
+            self.journal.append(op, payload)
+        if self.autosave is not None:
+            self.autosave.notify_change()
+
+    def mark_saved(self):
+        self.dirty = False
+        self.changed_records.clear()
+
+    def get_changed_records(self):
+        return set(self.changed_records)
+
+    @synchronized
+    def put_record(self, record: Record):
+        """
+        Stores a record in the address book under its contact name and indexes it. Nothing is journaled.
+        :param record: record to be stored.
         :return: None.
         """
         if record.get_name() in self.data:
             warnings.warn(f"WARNING: the record for the contact '{record.get_name()}' gets overwritten.")
+            self.unindex_record(self.data[record.get_name()])
         self.data[record.get_name()] = record
+        self.index_record(record)
 
+    @synchronized
+    def add_record(self, record: Record):
+        """
+        Adds a new record to the address book.
+        :param record: new record to be added to the address book.
+        :return: None.
+        """
+        self.put_record(record)
+        self.log_operation(JournalOp.ADD_RECORD, record)
+
+    @synchronized
+    def add_records(self, records):
+        """
+        Adds many records to the address book in one pass, e.g. during an import.
+        :param records: iterable with the records, it is consumed lazily.
+        :return: number of added records.
+        """
+        cnt = 0
+        for record in records:
+            self.put_record(record)
+            self.log_operation(JournalOp.ADD_RECORD, record)
+            cnt += 1
+        return cnt
+
+    @synchronized
     def delete_record(self, name: str):
         """
         Deletes a record from the address book.
@@ -132,11 +419,14 @@ class AddressBook(UserDict):
         :return: None.
         """
         try:
-            del self.data[name]
+            record = self.data.pop(name)
         except KeyError:
             raise MyException(f"The record for the contact '{name}' cannot be deleted: this name is not in the "
                               f"address book.")
+        self.unindex_record(record)
+        self.log_operation(JournalOp.DELETE_RECORD, name)
 
+    @synchronized
     def edit_record_name(self, old_name: str, new_name: str):
         """
         Changes the contact name within a record. Updates the way the record is stored in the address book.
@@ -146,25 +436,123 @@ class AddressBook(UserDict):
         """
         try:
             record = self.data.pop(old_name)
-            record.set_name(new_name)
-            self.add_record(record)
-            return record
         except KeyError:
             raise MyException(f"Cannot change the name of a record: the name '{old_name}' is not in the address book.")
+        self.unindex_record(record)
+        record.set_name(new_name)
+        self.put_record(record)
+        self.log_operation(JournalOp.RENAME_RECORD, (old_name, new_name))
+        return record
 
+    @synchronized
     def edit_record(self, change: Change):
         """
-        Conducts changes specified by the Change object.
+        Conducts changes specified by the Change object. If the change fails, the record stays unchanged.
         :param change: object containing information about the change which has to be performed.
-        :return: None.
+        :return: the changed record.
+        """
+        return self.edit_records([change])[0]
+
+    @synchronized
+    def edit_records(self, changes):
+        """
+        Conducts many changes in one transaction: either all of them are performed or none.
+        The changes are validated first, then applied one by one to copies of the records, so a failed change
+        leaves the address book untouched. Only after all changes succeeded, the copies replace the records,
+        each changed record is re-indexed once and the changes are journaled.
+        :param changes: iterable with Change objects, applied in the given order.
+        :return: list with the changed record for every change.
+        """
+        changes = list(changes)
+        for number, change in enumerate(changes, 1):
+            try:
+                change.validate()
+            except MyException as e:
+                raise MyException(self.describe_failed_change(e, number, len(changes)))
+        working = {}    # contact name -> changed copy of the record, None if the name is gone after a renaming
+        res = []
+        with warnings.catch_warnings(record=True) as warning_list:
+            warnings.simplefilter("always")
+            for number, change in enumerate(changes, 1):
+                try:
+                    res.append(self.apply_to_working_copy(working, change))
+                except MyException as e:
+                    raise MyException(self.describe_failed_change(e, number, len(changes)))
+        self.commit_records(working)
+        for change in changes:
+            if change.get_changetype() == ChangeType.EDIT_NAME:
+                self.log_operation(JournalOp.RENAME_RECORD, (change.get_name(), change.get_kwargs()["new_name"]))
+            else:
+                self.log_operation(JournalOp.EDIT_RECORD, change)
+        for w in warning_list:
+            warnings.warn(w.message, w.category)
+        return res
+
+    @staticmethod
+    def describe_failed_change(e: MyException, number: int, total: int):
+        if total == 1:
+            return str(e)
+        return f"Change {number} of {total} cannot be performed, no changes were made: {e}"
+
+    def apply_to_working_copy(self, working: dict, change: Change):
+        """
+        Applies one change of a transaction (see edit_records) to a copy of the record, which is made at the first
+        change of the record.
+        :param working: contact name -> changed copy of the record (None if the name is gone after a renaming).
+        :param change: change to be applied.
+        :return: the changed copy of the record.
         """
         name = change.get_name()
+        if name in working:
+            record = working[name]
+            if record is None:
+                raise MyException(f"No record with the name '{name}' in the address book.")
+        else:
+            record = self.get_record_by_name(name).copy()
+            working[name] = record
         changetype = change.get_changetype()
         kwargs = change.get_kwargs()
-        record = self.get_record_by_name(name)
+        if changetype == ChangeType.EDIT_NAME:
+            new_name = kwargs["new_name"]
+            if new_name == name:
+                return record
+            if working.get(new_name) is not None or (new_name not in working and new_name in self.data):
+                warnings.warn(f"WARNING: the record for the contact '{new_name}' gets overwritten.")
+            record.set_name(new_name)
+            working[name] = None
+            working[new_name] = record
+        else:
+            self.apply_change(record, changetype, kwargs)
+        return record
+
+    def commit_records(self, working: dict):
+        """
+        Replaces the records changed in a transaction (see edit_records) with their changed copies.
+        :param working: contact name -> changed copy of the record (None if the name is gone after a renaming).
+        :return: None.
+        """
+        for name, record in working.items():
+            old_record = self.data.get(name)
+            if record is None:
+                if old_record is not None:
+                    self.unindex_record(self.data.pop(name))
+            elif old_record is None:
+                self.data[name] = record
+                self.index_record(record)
+            else:
+                self.data[name] = record
+                self.reindex_record(old_record, record)
+
+    @staticmethod
+    def apply_change(record: Record, changetype: ChangeType, kwargs: dict):
+        """
+        Applies a change of the phone numbers, e-mails or the birthday date to a record.
+        :param record: record which has to be changed.
+        :param changetype: type of the change.
+        :param kwargs: key word arguments needed to conduct the change.
+        :return: None.
+        """
         match changetype:
-            case ChangeType.EDIT_NAME:
-                record = self.edit_record_name(old_name=name, new_name=kwargs["new_name"])
             case ChangeType.EDIT_PHONE:
                 record.edit_phone_number(**kwargs)
             case ChangeType.EDIT_EMAIL:
@@ -183,7 +571,6 @@ class AddressBook(UserDict):
                 record.remove_birthday()
             case _:
                 raise MyException("Change type is unknown.")
-        return record
 
     def get_record_by_name(self, name: str):
         """
@@ -200,16 +587,13 @@ class AddressBook(UserDict):
 
     def get_record_by_phone(self, phone: str):
         """
-        Finds all records where specified phone number is found.
+        Finds all records where specified phone number is found, in any notation (see Phone.get_key_of).
         :param phone: phone number to look for in records.
         :return: list of records which contain the specified phone number.
         """
-        res = []
         if not self.data:
             raise MyException(f"The address book is empty.")
-        for record in self.data.values():
-            if phone in record.get_phones():
-                res.append(record)
+        res = self.get_records_from_index(self.phone_index, Phone.get_key_of(phone))
         if not res:
             raise MyException(f"No record with the phone number '{phone}' in the address book.")
         return res
@@ -220,12 +604,9 @@ class AddressBook(UserDict):
         :param email: e-mail to look for in records.
         :return: list of records which contain the specified e-mail.
         """
-        res = []
         if not self.data:
             raise MyException(f"The address book is empty.")
-        for record in self.data.values():
-            if email in record.get_emails():
-                res.append(record)
+        res = self.get_records_from_index(self.email_index, email)
         if not res:
             raise MyException(f"No record with the e-mail '{email}' in the address book.")
         return res
@@ -236,35 +617,316 @@ class AddressBook(UserDict):
         :param birthday: birthday date to look for in records.
         :return: list of records which contain the specified birthday date.
         """
-        res = []
         if not self.data:
             raise MyException(f"The address book is empty.")
-        birthday = Birthday.reformat_value(birthday)
-        for record in self.data.values():
-            if birthday == record.get_birthday():
-                res.append(record)
+        birthday = normalize_birthday(birthday)
+        res = self.get_records_from_index(self.birthday_index, birthday)
         if not res:
             raise MyException(f"No record with the birthday date '{birthday}' in the address book.")
         return res
 
-    def store_to_file(self, path="", filename=""):
+    def get_record_by_fragment(self, fragment: str):
+        """
+        Finds all records where the contact name, a phone number or an e-mail contains the fragment (case-insensitive).
+        :param fragment: part of a name, phone number or e-mail to look for in records.
+        :return: list of records sorted by the contact name.
+        """
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        res = [self.data[name] for name in sorted(self.substring_index.find(fragment))]
+        if not res:
+            raise MyException(f"No record with a name, phone number or e-mail containing '{fragment}' in the address book.")
+        return res
+
+    def get_names_in_range(self, start=None, stop=None, after=None, limit=None):
+        """
+        Finds the contact names within a range in sorted order, e.g. for an alphabetical listing.
+        :param start: first name of the range (inclusive). If None, the range starts with the first name.
+        :param stop: end of the range (exclusive). If None, the range ends with the last name.
+        :param after: cursor: only the names after it are returned, e.g. the last name of the previous page.
+        :param limit: maximum number of names. If None, all names within the range are returned.
+        :return: list of names.
+        """
+        return self.name_index.range(start, stop, after, limit)
+
+    def count_names(self, start=None, stop=None, last=None):
+        """
+        Counts the contact names within a range, e.g. to find the position of a cursor in a listing.
+        :param start: first name of the range (inclusive). If None, the range starts with the first name.
+        :param stop: end of the range (exclusive). If None, the range ends with the last name.
+        :param last: only the names up to this one (inclusive) are counted. If None, all names within the range.
+        :return: number of names.
+        """
+        high = len(self.name_index)
+        if stop is not None:
+            high = self.name_index.rank(stop)
+        if last is not None:
+            high = min(high, self.name_index.rank(last, inclusive=True))
+        low = self.name_index.rank(start) if start is not None else 0
+        return max(high - low, 0)
+
+    def iterate_sorted(self, start=None, stop=None, after=None):
+        """
+        Generates the records sorted by the contact name. The names are taken from the index in portions,
+        each after the last name of the previous one, so the address book can be changed during the iteration:
+        deleted records are skipped, added records are returned if they come after the current position.
+        :param start: first name of the range (inclusive). If None, the range starts with the first name.
+        :param stop: end of the range (exclusive). If None, the range ends with the last name.
+        :param after: cursor: the iteration starts after this name.
+        :return: generator of records.
+        """
+        while True:
+            names = self.get_names_in_range(start, stop, after, self.FETCH_SIZE)
+            if not names:
+                return
+            for name in names:
+                if name in self.data:
+                    yield self.data[name]
+            after = names[-1]
+
+    def get_fuzzy_index(self):
+        with self.lock:
+            if self.fuzzy_index is None:
+                self.fuzzy_index = FuzzyNameIndex(self.data, self.FUZZY_MAX_DISTANCE)
+            return self.fuzzy_index
+
+    def get_record_by_fuzzy_name(self, name: str, max_distance=None):
+        """
+        Finds the records with the contact names which differ from the name by a few typos (case-insensitive):
+        insertions, deletions, substitutions or transpositions of adjacent characters.
+        :param name: the name to look for, possibly with typos.
+        :param max_distance: maximum number of typos, at most FUZZY_MAX_DISTANCE (by default).
+        :return: list of records, from the closest names.
+        """
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        if max_distance is None:
+            max_distance = self.FUZZY_MAX_DISTANCE
+        elif not 0 <= max_distance <= self.FUZZY_MAX_DISTANCE:
+            raise MyException(f"The edit distance has to be from 0 to {self.FUZZY_MAX_DISTANCE}, "
+                              f"provided: '{max_distance}'.")
+        res = [self.data[contact_name] for _, contact_name in self.get_fuzzy_index().find(name, max_distance)]
+        if not res:
+            raise MyException(f"No record with a name similar to '{name}' in the address book.")
+        return res
+
+    def get_upcoming_birthdays(self, days: int, cur_date=None):
+        """
+        Finds all records with the birthday within the specified number of days, starting from today.
+        Only the days of the calendar within the period are visited (from the nearest one), not all records.
+        :param days: number of days (0: only the birthdays of today).
+        :param cur_date: current date, by default: today.
+        :return: list of pairs (number of days till the birthday, record), sorted by the number of days.
+        """
+        try:
+            days = int(days)
+            if days < 0:
+                raise ValueError()
+        except ValueError:
+            raise MyException(f"Non-negative integer number of days is expected, provided: '{days}'.")
+        today = Today.get(cur_date)
+        res = []
+        for day_of_year in today.calendar_order:
+            offset = today.days_until(day_of_year)
+            if offset > days:
+                break
+            res.extend((offset, record) for record in self.get_records_by_day_of_year(day_of_year))
+        return res
+
+    def get_records_by_day_of_year(self, day_of_year: int):
+        """
+        Finds all records with the birthday on the specified day of the calendar.
+        :param day_of_year: day of the year in the calendar of a leap year, from 0 to 365.
+        :return: list of records.
+        """
+        return [self.data[name] for name in self.birthday_calendar[day_of_year]]
+
+    @staticmethod
+    def get_journal_filename(filename: str):
+        """
+        Returns the path to the journal which belongs to a snapshot file: "<username>.bin" -> "<username>.log".
+        :param filename: path to the snapshot file.
+        :return: path to the journal file.
+        """
+        return os.path.splitext(filename)[0] + ".log"
+
+    def get_snapshot_filename(self, path="", filename=""):
         if not filename:
             filename = self.username
-        filename = os.path.join(path, filename + ".bin")
-        with open(filename, "wb") as f:
+        return os.path.join(path, filename + ".bin")
+
+    @synchronized
+    def store_to_file(self, path="", filename=""):
+        """
+        Stores the whole address book as a snapshot. The journal next to the snapshot gets cleared
+        because all the changes logged in it are now part of the snapshot.
+        If the journaled mode is on, further changes are logged into the journal of the new snapshot.
+        :param path: folder for the snapshot.
+        :param filename: name of the snapshot file without the extension. By default, the username is used.
+        :return: None.
+        """
+        filename = self.get_snapshot_filename(path, filename)
+        # the snapshot is written into a temporary file first: a failure while writing never damages the old one
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "wb") as f:
             pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+        journal = Journal(self.get_journal_filename(filename))
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = journal
+        journal.clear()
+        self.mark_saved()
+
+    @synchronized
+    def enable_journal(self, path="", filename=""):
+        """
+        Switches the journaled mode on: from now on, every change is appended to the journal
+        next to the snapshot file. A snapshot is stored first if there is none yet.
+        :param path: folder with the snapshot.
+        :param filename: name of the snapshot file without the extension. By default, the username is used.
+        :return: None.
+        """
+        snapshot = self.get_snapshot_filename(path, filename)
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = Journal(self.get_journal_filename(snapshot))
+        if not os.path.exists(snapshot):
+            self.store_to_file(path, filename)
 
+    def is_journaled_to(self, path="", filename=""):
+        """
+        Checks if the changes are currently journaled next to the specified snapshot file.
+        :param path: folder with the snapshot.
+        :param filename: name of the snapshot file without the extension. By default, the username is used.
+        :return: True if the journaled mode is on and the journal belongs to this snapshot.
+        """
+        snapshot = self.get_snapshot_filename(path, filename)
+        return self.journal is not None and os.path.exists(snapshot) and \
+            self.journal.get_filename() == self.get_journal_filename(snapshot)
+
+    @synchronized
+    def flush_journal(self):
+        if self.journal is not None:
+            self.journal.flush()
+            self.mark_saved()
+
+    @synchronized
+    def flush(self, path=""):
+        """
+        Saves the changes which were not saved yet: in the journaled mode, the journal is written to the disk,
+        otherwise the whole address book is stored if it was changed.
+        :param path: folder with the snapshot.
+        :return: None.
+        """
+        if self.journal is not None:
+            self.flush_journal()
+        elif self.dirty:
+            self.store_to_file(path)
+
+    def enable_autosave(self, path="", interval=60.0, max_changes=100):
+        """
+        Starts saving the changes from a background thread (see flush) after a time interval
+        or after a number of changes, whichever comes first.
+        :param path: folder for the file of the address book.
+        :param interval: maximum number of seconds between the saves. If None, only the number of changes is checked.
+        :param max_changes: number of changes which triggers a save at once. If None, only the time is checked.
+        :return: None.
+        """
+        self.disable_autosave()
+        self.autosave = AutoSaver(self, path, interval, max_changes)
+        self.autosave.start()
+
+    def disable_autosave(self):
+        # the lock must not be held here: the autosave thread may be waiting for it
+        if self.autosave is not None:
+            self.autosave.stop()
+            self.autosave = None
+
+    def close(self):
+        """
+        Stops the autosave and releases the files used by the address book (the journal). Unsaved changes are not saved.
+        :return: None.
+        """
+        self.disable_autosave()
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+
+    @synchronized
+    def replay_journal(self, journal: Journal):
+        """
+        Repeats the operations logged in the journal. The replayed operations are not logged again.
+        :param journal: journal to be replayed.
+        :return: number of replayed operations.
+        """
+        cur_journal, self.journal = self.journal, None
+        cnt = 0
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                for op, payload in journal.read():
+                    match op:
+                        case JournalOp.ADD_RECORD:
+                            self.put_record(payload)
+                        case JournalOp.DELETE_RECORD:
+                            self.delete_record(payload)
+                        case JournalOp.RENAME_RECORD:
+                            self.edit_record_name(*payload)
+                        case JournalOp.EDIT_RECORD:
+                            self.edit_record(payload)
+                        case _:
+                            raise MyException(f"Unknown operation in the journal '{journal.get_filename()}'.")
+                    cnt += 1
+        except MyException as e:
+            raise MyException(f"The journal '{journal.get_filename()}' cannot be replayed: {e}")
+        finally:
+            self.journal = cur_journal
+        return cnt
+
+    @synchronized
     def load_from_file(self, filename):
+        """
+        Loads the address book from a snapshot and replays the journal stored next to it, if there is any.
+        In this case, the journaled mode is switched on.
+        :param filename: path to the snapshot file.
+        :return: None.
+        """
         try:
             with open(filename, "rb") as f:
                 ab = pickle.load(f)
                 self.data = ab.data
                 self.username = ab.username
+            for index in self.INDEXES:
+                setattr(self, index, getattr(ab, index))    # built when the address book was unpickled
         except FileNotFoundError:
             raise MyException(f"Address book cannot be loaded from the file '{filename}: the file does not exist.")
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        journal = Journal(self.get_journal_filename(filename))
+        if os.path.exists(journal.get_filename()):
+            self.replay_journal(journal)
+            self.journal = journal
+        self.mark_saved()
 
     def iterator(self, n=None):
-        return ABIterator(self.data.values(), n)
+        return ABIterator(self.data, n)
+
+    def sorted_iterator(self, n=None, start=None, stop=None, cursor=None):
+        """
+        Returns an iterator over the pages of the records sorted by the contact name.
+        :param n: number of records per page. If None, all records are returned at once.
+        :param start: first name of the range (inclusive). If None, the range starts with the first name.
+        :param stop: end of the range (exclusive). If None, the range ends with the last name.
+        :param cursor: the listing starts after this name, e.g. the cursor of an earlier iterator.
+                    The records are numbered from the position of the cursor in the range.
+        :return: ABIterator.
+        """
+        start_idx = self.count_names(start, stop, cursor) if cursor is not None else 0
+        return ABIterator(self.iterate_sorted(start, stop, cursor), n, cursor, start_idx)
 
     def to_string(self):
         return AddressBook.display_records(self.data.values())
@@ -0,0 +1,66 @@
+"""
+Autosave of an address book from a background thread.
+"""
+import threading
+import warnings
+
+
+class AutoSaver:
+    """
+    This class saves the changes of an address book from a background thread: after a time interval
+    or after a number of changes, whichever comes first. Unchanged address books are not written.
+    """
+
+    def __init__(self, addressbook, path="", interval=60.0, max_changes=100):
+        """
+        :param addressbook: address book to be saved (AddressBook).
+        :param path: folder for the file of the address book.
+        :param interval: maximum number of seconds between the saves. If None, only the number of changes is checked.
+        :param max_changes: number of changes which triggers a save at once. If None, only the time is checked.
+        """
+        self.addressbook = addressbook
+        self.path = path
+        self.interval = interval
+        self.max_changes = max_changes
+        self.changes = 0                    # number of changes since the last save
+        self.wakeup = threading.Event()     # set when the thread has to save (or stop) before the interval ends
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name=f"autosave-{addressbook.get_username()}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def notify_change(self):
+        """
+        Counts a change of the address book and wakes the thread up if the number of changes reached the threshold.
+        :return: None.
+        """
+        self.changes += 1
+        if self.max_changes and self.changes >= self.max_changes:
+            self.wakeup.set()
+
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if not self.stopped:
+                self.save()
+
+    def save(self):
+        with self.addressbook.lock:
+            self.changes = 0
+            try:
+                self.addressbook.flush(self.path)
+            except OSError as e:
+                warnings.warn(f"WARNING: the address book for the user '{self.addressbook.get_username()}' "
+                              f"could not be saved automatically: {e}")
+
+    def stop(self):
+        """
+        Stops the thread and waits until it finishes a save which is in progress. Nothing is saved on stopping.
+        :return: None.
+        """
+        self.stopped = True
+        self.wakeup.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
@@ -0,0 +1,396 @@
+"""
+Benchmarks for the address book.
+
+Usage:
+    python3 benchmark.py memory (<number_of_contacts>) (--baseline <commit>)
+        compares the memory used by the records with the memory used by the records of the baseline commit
+        (__dict__-based fields in deques), whose modules are taken from git
+    python3 benchmark.py suite (--sizes 1000,100000,1000000) (--sample <n>) (--trace-memory) (--output <file>)
+        times the hot paths of the address book on synthetic books of the given sizes and reports
+        the throughput (operations per second) and the memory of every benchmark as JSON
+    python3 benchmark.py dispatch (--sizes 15,100,1000,10000)
+        compares the cost of command_parcer per input line with the previous linear scan over all commands
+        as the number of registered commands grows
+    python3 benchmark.py import (--rows 200000) (--workers 1,2,4,8)
+        compares the import of a synthetic CSV file validated in this process with the import
+        validated in a pool of the given numbers of worker processes
+    python3 benchmark.py load (--sizes 10000,100000)
+        compares the time to open an address book and to show its first record for the storage backends
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from itertools import islice
+from addressbook import *
+from importexport import import_records, CSV_COLUMNS
+from storage import STORAGES
+import csv
+import main
+from main import command_parcer, register_command
+
+
+# commit with the original representation of records and fields (__dict__-based objects in deques)
+BASELINE_COMMIT = "6fd7233"
+BASELINE_MODULES = ("record", "fields", "myexception")
+
+
+def load_baseline_record(folder: str, commit=BASELINE_COMMIT):
+    """
+    Imports the class Record of the given commit: its modules are taken from git into the folder and imported
+    in place of the current ones, which are restored afterwards.
+    :param folder: folder for the modules of the commit.
+    :param commit: commit of the repository.
+    :return: class Record of the commit.
+    """
+    repository = os.path.dirname(os.path.abspath(__file__))
+    for module in BASELINE_MODULES:
+        source = subprocess.run(["git", "show", f"{commit}:{module}.py"], cwd=repository, check=True,
+                                capture_output=True).stdout
+        with open(os.path.join(folder, f"{module}.py"), "wb") as fh:
+            fh.write(source)
+    current_modules = {module: sys.modules.pop(module) for module in BASELINE_MODULES if module in sys.modules}
+    sys.path.insert(0, folder)
+    try:
+        return importlib.import_module("record").Record
+    finally:
+        sys.path.remove(folder)
+        for module in BASELINE_MODULES:
+            sys.modules.pop(module, None)
+        sys.modules.update(current_modules)
+
+
+def generate_contact(i: int):
+    """
+    Generates the raw data of a synthetic contact.
+    :param i: number of the contact.
+    :return: name, phone number, e-mail and birthday date of the contact.
+    """
+    return f"contact{i}", f"+380{i:09d}", f"contact{i}@example.com", f"{i % 28 + 1:02d}/{i % 12 + 1:02d}"
+
+
+def measure_memory(factory, n: int):
+    """
+    Measures the memory allocated for n objects created by the factory.
+    :param factory: callable which creates an object from the raw contact data.
+    :param n: number of objects.
+    :return: allocated memory in bytes.
+    """
+    contacts = [generate_contact(i) for i in range(n)]
+    tracemalloc.start()
+    objects = [factory(*contact) for contact in contacts]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return allocated
+
+
+def memory_benchmark(n: int, commit=BASELINE_COMMIT):
+    """
+    Compares the memory used by the current records and by the records of the baseline commit.
+    :param n: number of contacts.
+    :param commit: baseline commit.
+    :return: dict with the results.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        baseline = measure_memory(load_baseline_record(folder, commit), n)
+    current = measure_memory(Record, n)
+    return {
+        "benchmark": "memory",
+        "contacts": n,
+        "baseline_commit": commit,
+        "baseline_bytes": baseline,
+        "current_bytes": current,
+        "baseline_bytes_per_contact": round(baseline / n, 1),
+        "current_bytes_per_contact": round(current / n, 1),
+        "ratio": round(current / baseline, 3),
+    }
+
+
+def run_timed(results: list, size: int, name: str, ops: int, func, trace_memory=False):
+    """
+    Runs one benchmark and appends its result.
+    :param results: list for the results.
+    :param size: number of contacts in the address book.
+    :param name: name of the benchmark.
+    :param ops: number of operations performed by func.
+    :param func: function which performs the operations.
+    :param trace_memory: if True, the peak of the memory allocated during the benchmark is traced (slower).
+    :return: value returned by func.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    res = func()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    results.append({
+        "size": size,
+        "benchmark": name,
+        "ops": ops,
+        "seconds": round(elapsed, 6),
+        "ops_per_sec": round(ops / elapsed, 1) if elapsed else None,
+        "peak_traced_bytes": peak,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    })
+    return res
+
+
+def suite_benchmark(size: int, sample: int, trace_memory=False):
+    """
+    Times the hot paths of the address book on a synthetic book.
+    :param size: number of contacts.
+    :param sample: number of operations for the benchmarks of single lookups and changes.
+    :param trace_memory: if True, the peak of the allocated memory is traced for every benchmark.
+    :return: list with the results.
+    """
+    results = []
+    contacts = [generate_contact(i) for i in range(size)]
+    sample = min(sample, size)
+    sampled = contacts[:sample]
+    ab = AddressBook("benchmark")
+
+    def add_records():
+        for contact in contacts:
+            ab.add_record(Record(*contact))
+
+    run_timed(results, size, "add_record", size, add_records, trace_memory)
+    # lookups which return many records are timed on fewer operations
+    few = min(100, sample)
+    lookups = [
+        ("get_record_by_name", sample, lambda: [ab.get_record_by_name(contact[0]) for contact in sampled]),
+        ("get_record_by_phone", sample, lambda: [ab.get_record_by_phone(contact[1]) for contact in sampled]),
+        ("get_record_by_email", sample, lambda: [ab.get_record_by_email(contact[2]) for contact in sampled]),
+        ("get_record_by_birthday", few, lambda: [ab.get_record_by_birthday(contact[3]) for contact in sampled[:few]]),
+        ("get_record_by_fragment", few, lambda: [ab.get_record_by_fragment(contact[1][-7:])
+                                                 for contact in sampled[:few]]),
+        ("get_upcoming_birthdays", 10, lambda: [ab.get_upcoming_birthdays(7) for _ in range(10)]),
+    ]
+    for name, ops, func in lookups:
+        run_timed(results, size, name, ops, func, trace_memory)
+
+    changes = [
+        (ChangeType.ADD_PHONE, lambda c: {"new_value": "+1" + c[1][1:]}),
+        (ChangeType.EDIT_PHONE, lambda c: {"new_value": "+2" + c[1][1:], "cur_value": "+1" + c[1][1:]}),
+        (ChangeType.REMOVE_PHONE, lambda c: {"cur_value": "+2" + c[1][1:]}),
+        (ChangeType.ADD_EMAIL, lambda c: {"new_value": "new." + c[2]}),
+        (ChangeType.EDIT_EMAIL, lambda c: {"new_value": "edited." + c[2], "cur_value": "new." + c[2]}),
+        (ChangeType.REMOVE_EMAIL, lambda c: {"cur_value": "edited." + c[2]}),
+        (ChangeType.REMOVE_BIRTHDAY, lambda c: {}),
+        (ChangeType.EDIT_BIRTHDAY, lambda c: {"new_birthday": c[3]}),
+        (ChangeType.EDIT_NAME, lambda c: {"new_name": c[0] + "_renamed"}),
+    ]
+    change_names = {value: key for key, value in vars(ChangeType).items() if not key.startswith("_")}
+    # the same changes of phones and e-mails as one transaction (the records are re-indexed once)
+    batch = [Change(changetype, contact[0], **kwargs(contact)) for contact in sampled for changetype, kwargs in changes[:6]]
+    run_timed(results, size, "edit_records:phones_and_emails", len(batch), lambda: ab.edit_records(batch), trace_memory)
+    for changetype, kwargs in changes:
+        batch = [Change(changetype, contact[0], **kwargs(contact)) for contact in sampled]
+        run_timed(results, size, f"edit_record:{change_names[changetype]}", sample,
+                  lambda: [ab.edit_record(change) for change in batch], trace_memory)
+
+    run_timed(results, size, "display_records", sample,
+              lambda: AddressBook.display_records(islice(ab.data.values(), sample)), trace_memory)
+    run_timed(results, size, "to_string", size, ab.to_string, trace_memory)
+    run_timed(results, size, "ABIterator:pages_of_10", sample,
+              lambda: list(islice(ab.iterator(10), sample // 10)), trace_memory)
+
+    with tempfile.TemporaryDirectory() as folder:
+        run_timed(results, size, "store_to_file", size, lambda: ab.store_to_file(path=folder), trace_memory)
+        loaded = AddressBook()
+        run_timed(results, size, "load_from_file", size,
+                  lambda: loaded.load_from_file(os.path.join(folder, "benchmark.bin")), trace_memory)
+
+    commands = ["hello", "add name 123", "change name +p 456", "find -p 123", "show all 10",
+                "new username user", "good bye", "unknown command"]
+    lines = [commands[i % len(commands)] for i in range(sample * 10)]
+    run_timed(results, size, "command_parcer", len(lines), lambda: [command_parcer(line) for line in lines],
+              trace_memory)
+    return results
+
+
+def linear_command_parcer(commands: dict, raw_str: str):
+    """
+    Previous implementation of command_parcer: a scan over all handlers and all their commands.
+    """
+    case_insensitive = raw_str.lower()
+    for handler, aliases in commands.items():
+        for command in aliases:
+            if case_insensitive == command or case_insensitive.startswith(command + " "):
+                args = raw_str[len(command):].split()
+                return handler, args
+    return None, None
+
+
+def dispatch_benchmark(sizes, lines_cnt=100000):
+    """
+    Measures the cost of dispatching one input line as the number of registered commands grows.
+    Synthetic one- and two-word commands are registered in addition to the commands of the application.
+    They are registered in private copies of the command tables, the tables of the application are restored
+    afterwards.
+    :param sizes: numbers of registered commands.
+    :param lines_cnt: number of dispatched lines per size.
+    :return: list with the results.
+    """
+    results = []
+    lines = ["hello", "add name 123 a@b.c", "change name +p 456", "find -p 123", "show all 10",
+             "new username user", "good bye", "unknown command"]
+    lines = [lines[i % len(lines)] for i in range(lines_cnt)]
+    app_commands, app_trie = main.COMMANDS, main.COMMAND_TRIE
+    main.COMMANDS = {handler: list(aliases) for handler, aliases in app_commands.items()}
+    main.COMMAND_TRIE = {}
+    try:
+        for handler, aliases in list(main.COMMANDS.items()):
+            register_command(handler, *aliases)
+        registered = sum(len(aliases) for aliases in main.COMMANDS.values())
+        for size in sorted(sizes):
+            while registered < size:
+                command = f"command{registered}" if registered % 2 else f"group{registered} command"
+                register_command(lambda args: None, command)
+                registered += 1
+            commands = dict(main.COMMANDS)
+            for name, func in (("command_parcer", command_parcer),
+                               ("linear_scan", lambda line: linear_command_parcer(commands, line))):
+                start = time.perf_counter()
+                for line in lines:
+                    func(line)
+                elapsed = time.perf_counter() - start
+                results.append({
+                    "registered_commands": registered,
+                    "benchmark": name,
+                    "lines": lines_cnt,
+                    "ns_per_line": round(elapsed / lines_cnt * 1e9, 1),
+                })
+    finally:
+        main.COMMANDS, main.COMMAND_TRIE = app_commands, app_trie
+    return results
+
+
+def import_benchmark(rows: int, workers_counts):
+    """
+    Measures how the import of a CSV file scales with the number of worker processes validating the rows.
+    Every 100th row contains a malformed e-mail, so that the warnings are collected as well.
+    :param rows: number of rows in the synthetic file.
+    :param workers_counts: numbers of worker processes (0: validation in this process).
+    :return: list with the results.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "contacts.csv")
+        with open(filename, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            for i in range(rows):
+                name, phone, email, birthday = generate_contact(i)
+                writer.writerow({"name": name, "phones": phone, "emails": email if i % 100 else name,
+                                 "birthday": birthday})
+        serial_time = None
+        for workers in [0] + sorted(workers_counts):
+            ab = AddressBook("benchmark")
+            start = time.perf_counter()
+            report = import_records(ab, filename, workers=workers)
+            elapsed = time.perf_counter() - start
+            if serial_time is None:
+                serial_time = elapsed
+            results.append({
+                "workers": workers,
+                "rows": rows,
+                "imported": report.imported,
+                "warnings": len(report.warnings),
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(rows / elapsed, 1),
+                "speedup": round(serial_time / elapsed, 2),
+            })
+    return results
+
+
+def load_benchmark(size: int):
+    """
+    Measures the time to open an address book stored in every storage backend and to get one record from it.
+    :param size: number of contacts in the synthetic address book.
+    :return: list with the results.
+    """
+    results = []
+    ab = AddressBook("benchmark")
+    ab.add_records(Record(*generate_contact(i)) for i in range(size))
+    with tempfile.TemporaryDirectory() as folder:
+        for storage_name, storage_class in STORAGES.items():
+            storage = storage_class(folder, "benchmark")
+            storage.save(ab).close()
+            start = time.perf_counter()
+            loaded = storage.open()
+            opened = time.perf_counter()
+            loaded.get_record_by_name(generate_contact(size // 2)[0]).to_string()
+            first_record = time.perf_counter()
+            loaded.close()
+            results.append({
+                "storage": storage_name,
+                "size": size,
+                "file_bytes": os.path.getsize(storage.get_filename()),
+                "open_ms": round((opened - start) * 1000, 2),
+                "first_record_ms": round((first_record - start) * 1000, 2),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the address book.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    memory_parser = subparsers.add_parser("memory", help="memory used by records")
+    memory_parser.add_argument("contacts", type=int, nargs="?", default=100000)
+    memory_parser.add_argument("--baseline", default=BASELINE_COMMIT, help="commit to compare the records with")
+    suite_parser = subparsers.add_parser("suite", help="throughput of the hot paths of the address book")
+    suite_parser.add_argument("--sizes", default="1000,100000",
+                              help="comma-separated sizes of the synthetic address books, e.g. 1000,100000,1000000")
+    suite_parser.add_argument("--sample", type=int, default=10000,
+                              help="number of operations for the benchmarks of single lookups and changes")
+    suite_parser.add_argument("--trace-memory", action="store_true",
+                              help="trace the peak of the allocated memory for every benchmark (slower)")
+    suite_parser.add_argument("--output", help="file for the results (default: stdout)")
+    dispatch_parser = subparsers.add_parser("dispatch", help="cost of command dispatch per input line")
+    dispatch_parser.add_argument("--sizes", default="15,100,1000,10000",
+                                 help="comma-separated numbers of registered commands")
+    import_parser = subparsers.add_parser("import", help="scaling of the import with the number of worker processes")
+    import_parser.add_argument("--rows", type=int, default=200000, help="number of rows in the synthetic file")
+    import_parser.add_argument("--workers", default="1,2,4,8", help="comma-separated numbers of worker processes")
+    load_parser = subparsers.add_parser("load", help="time to open an address book in every storage backend")
+    load_parser.add_argument("--sizes", default="10000,100000",
+                             help="comma-separated sizes of the synthetic address books")
+    args = parser.parse_args()
+    if args.benchmark == "memory":
+        print(json.dumps(memory_benchmark(args.contacts, args.baseline), indent=4))
+    elif args.benchmark == "suite":
+        results = []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for size in args.sizes.split(","):
+                results.extend(suite_benchmark(int(size), args.sample, args.trace_memory))
+        report = json.dumps({"benchmark": "suite", "results": results}, indent=4)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(report)
+        else:
+            print(report)
+    elif args.benchmark == "dispatch":
+        results = dispatch_benchmark([int(size) for size in args.sizes.split(",")])
+        print(json.dumps({"benchmark": "dispatch", "results": results}, indent=4))
+    elif args.benchmark == "import":
+        results = import_benchmark(args.rows, [int(workers) for workers in args.workers.split(",")])
+        print(json.dumps({"benchmark": "import", "cpu_count": os.cpu_count(), "results": results}, indent=4))
+    elif args.benchmark == "load":
+        results = []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for size in args.sizes.split(","):
+                results.extend(load_benchmark(int(size)))
+        print(json.dumps({"benchmark": "load", "results": results}, indent=4))
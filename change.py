@@ -1,6 +1,9 @@
 """
 These classes are required to perform editing of records in the address book.
 """
+from myexception import MyException
+
+
 class ChangeType:
     """
     This class represents types of possible changes
@@ -9,6 +12,20 @@ class ChangeType:
     EDIT_NAME, EDIT_PHONE, EDIT_EMAIL, ADD_PHONE, ADD_EMAIL, REMOVE_PHONE, REMOVE_EMAIL, EDIT_BIRTHDAY, REMOVE_BIRTHDAY = range(9)
 
 
+# change type -> (required key word arguments, optional key word arguments)
+CHANGE_ARGUMENTS = {
+    ChangeType.EDIT_NAME: (("new_name",), ()),
+    ChangeType.EDIT_PHONE: (("new_value",), ("cur_value", "idx", "first", "last")),
+    ChangeType.EDIT_EMAIL: (("new_value",), ("cur_value", "idx", "first", "last")),
+    ChangeType.ADD_PHONE: (("new_value",), ("idx", "add_to_beginning")),
+    ChangeType.ADD_EMAIL: (("new_value",), ("idx", "add_to_beginning")),
+    ChangeType.REMOVE_PHONE: ((), ("cur_value", "idx", "first", "last")),
+    ChangeType.REMOVE_EMAIL: ((), ("cur_value", "idx", "first", "last")),
+    ChangeType.EDIT_BIRTHDAY: (("new_birthday",), ()),
+    ChangeType.REMOVE_BIRTHDAY: ((), ()),
+}
+
+
 class Change:
     """
     This class stores information about a change
@@ -40,3 +57,21 @@ class Change:
         :return: key word arguments for the change.
         """
         return self.kwargs
+
+    def validate(self):
+        """
+        Checks that the change is well-formed: the type of the change is known, the contact name is given
+        and the key word arguments fit the type. The values themselves are validated when the change is applied.
+        :return: None.
+        """
+        if self.changetype not in CHANGE_ARGUMENTS:
+            raise MyException(f"Change type is unknown: '{self.changetype}'.")
+        if not self.name or not isinstance(self.name, str):
+            raise MyException("The contact name of the record to be changed is missing.")
+        required, optional = CHANGE_ARGUMENTS[self.changetype]
+        missing = [key for key in required if not self.kwargs.get(key)]
+        if missing:
+            raise MyException(f"Missing parameter(s) of the change: {', '.join(missing)}.")
+        unknown = [key for key in self.kwargs if key not in required and key not in optional]
+        if unknown:
+            raise MyException(f"Unknown parameter(s) of the change: {', '.join(unknown)}.")
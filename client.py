@@ -0,0 +1,138 @@
+"""
+Client for the address book server (see server.py) and a load generator for it.
+
+Usage:
+    python3 client.py (--host <host>) (--port <port>) (--unix <path>)
+        interactive session with the server
+    python3 client.py --load (--clients <n>) (--requests <n>) (--host <host>) (--port <port>) (--unix <path>)
+        opens <clients> concurrent connections, sends <requests> commands through each of them
+        and reports the requests per second and the latency percentiles as JSON
+"""
+import argparse
+import asyncio
+import json
+import time
+from server import read_response, MORE_COMMAND
+
+# commands sent by the load generator: {i} is the number of the client, {j} - the number of the request
+LOAD_COMMANDS = [
+    "add client{i}_{j} +380{j:09d} client{i}_{j}@example.com {day}/{month}",
+    "find -n client{i}_{j}",
+    "change client{i}_{j} +p +381{j:09d}",
+    "find -p +381{j:09d}",
+    "find -s {j:09d}",
+    "phone client{i}_{j}",
+    "upcoming 7",
+]
+
+
+async def open_connection(host: str, port: int, unix_path=None):
+    if unix_path:
+        return await asyncio.open_unix_connection(unix_path)
+    return await asyncio.open_connection(host, port)
+
+
+async def send_command(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, u_input: str):
+    """
+    Sends one command to the server and waits for the response.
+    :param reader: stream from the server.
+    :param writer: stream to the server.
+    :param u_input: command.
+    :return: pair (status, text) of the response.
+    """
+    writer.write(u_input.encode("utf-8") + b"\n")
+    await writer.drain()
+    return await read_response(reader)
+
+
+async def interactive_session(host: str, port: int, unix_path=None):
+    """
+    Reads commands from the terminal, sends them to the server and displays the responses page by page.
+    :return: None.
+    """
+    reader, writer = await open_connection(host, port, unix_path)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            u_input = await loop.run_in_executor(None, input, ">>> ")
+            status, text = await send_command(reader, writer, u_input)
+            print(text)
+            while status == "PAGE":
+                answer = await loop.run_in_executor(None, input, "Show more? ([y/n]): ")
+                if not answer.startswith("y"):
+                    break
+                status, text = await send_command(reader, writer, MORE_COMMAND)
+                print(text)
+            if status == "BYE":
+                break
+    finally:
+        writer.close()
+
+
+async def load_client(host: str, port: int, unix_path, client_id: int, requests: int, latencies: list, errors: list):
+    """
+    Sends the commands of one simulated client and records the latency of every request.
+    :return: None.
+    """
+    reader, writer = await open_connection(host, port, unix_path)
+    try:
+        for j in range(requests):
+            command = LOAD_COMMANDS[j % len(LOAD_COMMANDS)]
+            u_input = command.format(i=client_id, j=j // len(LOAD_COMMANDS), day=j % 28 + 1, month=j % 12 + 1)
+            start = time.perf_counter()
+            status, text = await send_command(reader, writer, u_input)
+            latencies.append(time.perf_counter() - start)
+            if status == "ERROR":
+                errors.append(text)
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values: list, fraction: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def generate_load(host: str, port: int, unix_path=None, clients=10, requests=1000):
+    """
+    Runs the simulated clients concurrently.
+    :param clients: number of concurrent connections.
+    :param requests: number of requests per connection.
+    :return: dict with the throughput and latency percentiles.
+    """
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(load_client(host, port, unix_path, i, requests, latencies, errors) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "latency_ms": {name: round(percentile(latencies, fraction) * 1000, 3)
+                       for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client and load generator for the address book server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="path to the Unix socket of the server")
+    parser.add_argument("--load", action="store_true", help="generate load instead of an interactive session")
+    parser.add_argument("--clients", type=int, default=10, help="number of concurrent connections")
+    parser.add_argument("--requests", type=int, default=1000, help="number of requests per connection")
+    cli_args = parser.parse_args()
+    if cli_args.load:
+        report = asyncio.run(generate_load(cli_args.host, cli_args.port, cli_args.unix,
+                                           cli_args.clients, cli_args.requests))
+        print(json.dumps(report, indent=4))
+    else:
+        try:
+            asyncio.run(interactive_session(cli_args.host, cli_args.port, cli_args.unix))
+        except (KeyboardInterrupt, EOFError):
+            pass
@@ -1,12 +1,16 @@
+import re
 import warnings
-from datetime import datetime
+from calendar import isleap
+from datetime import date
 from myexception import MyException
 
 
 class Field:
     """
     Class representing a fild in a record of an address book.
+    Fields use __slots__ to keep records compact: each subclass declares the slots for its value.
     """
+    __slots__ = ()
     # name of the object type
     name = "field"
 
@@ -19,6 +23,32 @@ class Field:
     def get_value(self):
         return self.value
 
+    @classmethod
+    def from_stored_value(cls, value: str):
+        """
+        Creates the object from a value which was validated before it was stored (e.g. in a database),
+        without validating it again.
+        :param value: stored value.
+        :return: new object.
+        """
+        field = cls.__new__(cls)
+        field.set_stored_value(value)
+        return field
+
+    def set_stored_value(self, value: str):
+        self.value = value
+
+    def get_key(self):
+        """
+        Returns the key of the value used to compare the fields, e.g. to find duplicates in a record.
+        :return: key of the value (the value itself, unless a subclass normalises it).
+        """
+        return self.get_value()
+
+    @staticmethod
+    def get_key_of(value: str) -> str:
+        return value
+
     def get_name(self):
         return self.name
 
@@ -28,27 +58,79 @@ class Field:
     def __repr__(self):
         return f"{self.name}: {self.value}"
 
+    def __setstate__(self, state):
+        """
+        Restores the object from its pickled state. Besides the state of a slotted object ((None, slots) pair),
+        accepts the __dict__ of objects stored by older versions, which also contained the type label "name".
+        :param state: pickled state.
+        :return: None.
+        """
+        if isinstance(state, tuple):
+            dict_state, slots_state = state
+            state = {**(dict_state or {}), **(slots_state or {})}
+        for key, value in state.items():
+            if key != "name":
+                setattr(self, key, value)
+
 
 class Name(Field):
     """
     Class representing the contact name stored in a record of an address book.
     """
-
-    def __init__(self, value: str):
-        super(Name, self).__init__(value)
-        self.name = "name"
+    __slots__ = ("value",)
+    name = "name"
 
 
 class Phone(Field):
     """
     Class representing a phone number within a record of an address book.
+    The phone number is stored as it was written, together with its canonical key (see get_key_of),
+    so that different notations of one number are found and recognised as duplicates.
     """
+    __slots__ = ("__value", "__key")
+    name = "phone"
+    MALFORMED_WARNING = "WARNING: the phone number '{}' is potentially malformed."
+    INVALID_ERROR = "The value {} is not a valid telephone number. Please, provide another value."
+    # country code added to the national numbers written with the trunk prefix (see set_country_code)
+    country_code = "380"
 
     def __init__(self, value: str):
         #super(Phone, self).__init__(None)
         self.__value = None
+        self.__key = None
         self.value = value
-        self.name = "phone"
+
+    @staticmethod
+    def set_country_code(code: str):
+        """
+        Sets the default country code for the keys of the national phone numbers. Must be set before
+        the address books are loaded: the keys of the loaded phone numbers are not updated.
+        :param code: country code, optionally with "+", e.g. "+380". Empty string: national numbers are kept as they are.
+        :return: None.
+        """
+        code = code[1:] if code.startswith("+") else code
+        if code and not (code.isdigit() and len(code) <= 3):
+            raise MyException(f"The country code must consist of 1 to 3 digits, provided: '{code}'.")
+        Phone.country_code = code
+
+    @staticmethod
+    def get_key_of(phone: str) -> str:
+        """
+        Returns the canonical key of a phone number: the digits of the international number without "+"
+        or the international prefix "00". The trunk prefix "0" of a national number is replaced with the default
+        country code, e.g. "+380501234567", "00380501234567", "380501234567" and "0501234567" get the same key
+        "380501234567". Other numbers (e.g. short numbers) are their own keys.
+        :param phone: phone number (not validated).
+        :return: key of the phone number.
+        """
+        first = phone[:1]
+        if first == "+":
+            return phone[1:]
+        if first != "0" or len(phone) < 3:
+            return phone
+        if phone[1:2] == "0":   # international prefix "00"
+            return phone[2:]
+        return Phone.country_code + phone[1:] if Phone.country_code else phone
 
     @property
     def value(self):
@@ -62,10 +144,24 @@ class Phone(Field):
         """
         if self.validate(new_value):
             self.__value = new_value
+            self.__key = self.get_key_of(new_value)
         else:
-            raise MyException(f"The value {new_value} is not a valid telephone number. Please, provide another value.")
+            raise MyException(Phone.INVALID_ERROR.format(new_value))
+
+    def set_stored_value(self, value: str):
+        self.__value = value
+        self.__key = self.get_key_of(value)
+
+    def get_key(self):
+        return self.__key
+
+    def __setstate__(self, state):
+        # the key is computed again: older versions did not store it, and the country code may have changed
+        super(Phone, self).__setstate__(state)
+        self.__key = self.get_key_of(self.__value)
 
-    def validate(self, phone: str):
+    @staticmethod
+    def validate(phone: str):
         """
         Conducts a simple check if the given phone number is well-formed. Raises WARNING if it is not.
         NB: not a full check, only spots some incorrect features.
@@ -75,23 +171,25 @@ class Phone(Field):
         if phone and phone.isdigit() or (len(phone) > 2 and phone[0] == "+" and phone[1:].isdigit()):
             length = len(phone) - 1 if phone[0] == "+" else len(phone)
             if length < 3 or length > 15:
-                warnings.warn(f"WARNING: the phone number '{phone}' is potentially malformed.")
+                warnings.warn(Phone.MALFORMED_WARNING.format(phone))
             return True
         return False
 
 
-
 class Email(Field):
     """
     Class representing an email within a record of an address book.
     """
+    __slots__ = ("value",)
+    name = "e-mail"
+    MALFORMED_WARNING = "WARNING: the email '{}' is malformed."
 
     def __init__(self, value: str):
         super(Email, self).__init__(None)
         self.set_value(value)
-        self.name = "e-mail"
 
-    def validate(self, email: str):
+    @staticmethod
+    def validate(email: str):
         """
         Conducts a simple check if the given e-mail is well-formed. Raises WARNING if it is not.
         NB: not a full check, only spots some incorrect features.
@@ -101,7 +199,7 @@ class Email(Field):
         parts = email.split("@")
         if len(parts) == 2 and len(parts[1].split(".")) == 2:
             return True
-        warnings.warn(f"WARNING: the email '{email}' is malformed.")
+        warnings.warn(Email.MALFORMED_WARNING.format(email))
 
     def set_value(self, new_value):
         """
@@ -117,18 +215,47 @@ class Email(Field):
 class Birthday(Field):
     """
     Class representing birthday info within a record of an address book.
+    The date is stored as a pair of small integers (day, month) together with its day of the year
+    (see day_of_year), the value "dd/mm" is built on request.
     """
+    __slots__ = ("__day", "__month", "__day_of_year")
+    name = "birthday"
+    # number of days before the first day of each month in a leap year: used to number the days of the year
+    DAYS_BEFORE_MONTH = (0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+    DAYS_IN_CALENDAR = 366
+    # maximum day of each month, irrespective of the year
+    MAX_DAYS = {1: 31, 2: 29, 3: 31, 4: 30, 5: 31, 6: 30, 7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31}
+    INVALID_ERROR = "The value {} is not a valid birthday value. Please, provide another value in the format " \
+                    "'day_info/month_info."
 
     @staticmethod
-    def get_padded_number_string(cur_str: str, required_length: int):
-        if len(cur_str) == required_length:
-            return cur_str
-        else:
-            new_str = str(int(cur_str))
-            assert len(new_str) <= required_length
-            if len(new_str) < required_length:
-                new_str = "0" * (required_length - len(new_str)) + new_str
-            return new_str
+    def day_of_year(day: int, month: int) -> int:
+        """
+        Returns the position of the day in the calendar of a leap year: 0 for 01/01, 59 for 29/02, 365 for 31/12.
+        :param day: day of the month.
+        :param month: month.
+        :return: day of the year, from 0 to 365.
+        """
+        return Birthday.DAYS_BEFORE_MONTH[month - 1] + day - 1
+
+    @staticmethod
+    def parse(value: str):
+        """
+        Parses and checks the birthday date. Only the day and the month are used, any further input
+        (e.g. year after one more "/") is ignored.
+        :param value: birthday date "day_info/month_info", optionally: "day_info/month_info/further_input".
+        :return: pair of integers (day, month) or None if the date is not well-formed or not valid.
+        """
+        parts = value.split("/", 2)
+        if len(parts) < 2 or not (parts[0].isdigit() and parts[1].isdigit()):
+            return None
+        try:
+            day, month = int(parts[0]), int(parts[1])
+        except ValueError:  # digits which int does not accept, e.g. superscripts
+            return None
+        if 1 <= month <= 12 and 1 <= day <= Birthday.MAX_DAYS[month]:
+            return day, month
+        return None
 
     @staticmethod
     def reformat_value(value: str) -> str:
@@ -137,24 +264,21 @@ class Birthday(Field):
         :param value: string that has to be reformatted in form "day_info/month_info/further_info"
         :return: reformatted string.
         """
-        try:
-            parts = value.split("/")
-            day, month = parts[:2]
-            day = Birthday.get_padded_number_string(day, 2)
-            month = Birthday.get_padded_number_string(month, 2)
-        except:
+        parsed = Birthday.parse(value)
+        if parsed is None:
             raise MyException(f"The birthday date '{value}' is not well-formed.")
-        return f"{day}/{month}"
+        return f"{parsed[0]:02d}/{parsed[1]:02d}"
 
     def __init__(self, value: str):
         #super(Birthday, self).__init__(None)
-        self.__value = None
+        self.__day = None
+        self.__month = None
+        self.__day_of_year = None
         self.value = value
-        self.name = "birthday"
 
     @property
     def value(self):
-        return self.__value
+        return f"{self.__day:02d}/{self.__month:02d}"
 
     @value.setter
     def value(self, new_value):
@@ -162,14 +286,54 @@ class Birthday(Field):
         Sets a new value for the value of the object if it passes internal validation.
         :param new_value: new value to be set.
         """
-        if self.validate(new_value):
-            self.__value = self.reformat_value(new_value)
+        parsed = self.parse(new_value)
+        if parsed is None:
+            raise MyException(Birthday.INVALID_ERROR.format(new_value))
+        self.set_day_and_month(*parsed)
+
+    def set_stored_value(self, value: str):
+        day, month = value.split("/")
+        self.set_day_and_month(int(day), int(month))
+
+    def set_day_and_month(self, day: int, month: int):
+        self.__day = day
+        self.__month = month
+        self.__day_of_year = Birthday.DAYS_BEFORE_MONTH[month - 1] + day - 1
+
+    def get_day(self):
+        return self.__day
+
+    def get_month(self):
+        return self.__month
+
+    def get_day_of_year(self):
+        return self.__day_of_year
+
+    def days_until_birthday(self, today=None):
+        """
+        Returns the number of days till the next birthday.
+        :param today: context of the current date (Today), shared by many records. By default, the current one.
+        :return: number of days (0 if the birthday is today).
+        """
+        if today is None:
+            today = Today.get()
+        return today.countdowns[self.__day_of_year]
+
+    def __setstate__(self, state):
+        """
+        Restores the object from its pickled state. Birthdays stored by older versions kept the value "dd/mm"
+        as a string, it is converted into the pair (day, month).
+        :param state: pickled state.
+        :return: None.
+        """
+        if isinstance(state, dict) and "_Birthday__value" in state:
+            self.value = state["_Birthday__value"]
         else:
-            raise MyException(
-                f"The value {new_value} is not a valid birthday value. Please, provide another value in the format "
-                f"'day_info/month_info.")
+            super(Birthday, self).__setstate__(state)
+            self.set_day_and_month(self.__day, self.__month)    # older versions did not store the day of the year
 
-    def validate(self, value: str):
+    @staticmethod
+    def validate(value: str):
         """
         Conducts a simple check if the given birthday date is well-formed and valid. Only verifies the day and the month,
         ignores any further input if it is present (e.g. year after one more "/")
@@ -177,14 +341,131 @@ class Birthday(Field):
         :param value: the birthday date as a string to be checked.
         :return: True if the birthday date passes the simple check.
         """
-        date = value.split("/")
-        if len(date) >= 2:
-            max_days = {1: 31, 2: 29, 3: 31, 4: 30, 5: 31, 6: 30, 7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31}
-            day, month = date[:2]
-            if day.isdigit() and month.isdigit() and 1 <= int(month) <= 12 and 1 <= int(day) <= max_days[int(month)]:
-                return True
+        return Birthday.parse(value) is not None
+
+
+class Today:
+    """
+    Context of the current date for the countdowns till the birthdays. The number of days till every day
+    of the calendar (see Birthday.day_of_year) is computed once per date, so the countdown of a record is a lookup:
+    records rendered or searched together share one context instead of building dates for every record.
+    The birthday on 29/02 is celebrated on 01/03 in the years which are not leap years.
+    """
+    __slots__ = ("ordinal", "countdowns", "calendar_order")
+    last = None     # the most recently used context, reused while the date is the same
+
+    def __init__(self, cur_date: date):
+        """
+        :param cur_date: current date.
+        """
+        self.ordinal = cur_date.toordinal()
+        leap_day = Birthday.day_of_year(29, 2)
+        leap_year, next_leap_year = isleap(cur_date.year), isleap(cur_date.year + 1)
+        days_in_year = 366 if leap_year else 365
+        today = Birthday.day_of_year(cur_date.day, cur_date.month)
+        # positions in the actual years: without 29/02 the days after 28/02 move one position back,
+        # and 29/02 gets the position of 01/03
+        position = today if leap_year or today <= leap_day else today - 1
+        countdowns = []
+        for day_of_year in range(Birthday.DAYS_IN_CALENDAR):
+            this_year = day_of_year - (0 if leap_year or day_of_year <= leap_day else 1)
+            if this_year >= position:   # the birthday is still ahead this year (or it is today)
+                countdowns.append(this_year - position)
+            else:
+                countdowns.append(days_in_year - position +
+                                  day_of_year - (0 if next_leap_year or day_of_year <= leap_day else 1))
+        self.countdowns = countdowns    # day of the year -> number of days till it
+        # days of the calendar from the nearest one, 29/02 after the day on which it is celebrated
+        self.calendar_order = sorted(range(Birthday.DAYS_IN_CALENDAR),
+                                     key=lambda day_of_year: (countdowns[day_of_year], day_of_year == leap_day))
+
+    @staticmethod
+    def get(cur_date=None):
+        """
+        Returns the context of the given date, reusing the last one if the date is the same.
+        :param cur_date: current date, by default: today.
+        :return: Today.
+        """
+        if cur_date is None:
+            cur_date = date.today()
+        context = Today.last
+        if context is None or context.ordinal != cur_date.toordinal():
+            context = Today.last = Today(cur_date)
+        return context
+
+    def days_until(self, day_of_year: int) -> int:
+        return self.countdowns[day_of_year]
+
+
+# patterns of the batch validators: values which do not match them are checked with the rules of single values
+# (e.g. digits other than 0-9, which str.isdigit accepts as well).
+# The patterns are matched value by value: a single match over the joined batch would need a separator which
+# cannot occur in the values, but the imported values may contain any character (also line breaks).
+PHONE_PATTERN = re.compile(r"[0-9]+|\+[0-9]{2,}")
+EMAIL_PATTERN = re.compile(r"[^@]*@[^@.]*\.[^@.]*")
+
+
+def validate_phones(values):
+    """
+    Validates many phone numbers in one pass, with the same rules as Phone, but without raising warnings.
+    :param values: sequence of raw phone numbers.
+    :return: three lists of the length of values: validity mask, normalised phone numbers (None for invalid ones)
+            and mask of the valid phone numbers which are potentially malformed (Phone would warn about them).
+    """
+    valid, normalized, warned = [], [], []
+    for value in values:
+        if PHONE_PATTERN.fullmatch(value):
+            ok = True
+            length = len(value) - 1 if value[0] == "+" else len(value)
+            warn = length < 3 or length > 15
         else:
-            return False
+            with warnings.catch_warnings(record=True) as warning_list:
+                warnings.simplefilter("always")
+                ok = Phone.validate(value)
+            warn = bool(warning_list)
+        valid.append(ok)
+        normalized.append(value if ok else None)
+        warned.append(warn)
+    return valid, normalized, warned
+
+
+def validate_emails(values):
+    """
+    Validates many e-mails in one pass, with the same rules as Email, but without raising warnings.
+    E-mails are accepted even if they are malformed.
+    :param values: sequence of raw e-mails.
+    :return: three lists of the length of values: validity mask (always True), normalised e-mails
+            and mask of the malformed e-mails (Email would warn about them).
+    """
+    warned = [EMAIL_PATTERN.fullmatch(value) is None for value in values]
+    return [True] * len(warned), list(values), warned
+
+
+def validate_birthdays(values):
+    """
+    Validates and normalises many birthday dates in one pass, with the same rules as Birthday.
+    :param values: sequence of raw birthday dates ("day_info/month_info", optionally followed by "/further_info").
+    :return: three lists of the length of values: validity mask, normalised dates "dd/mm" (None for invalid ones)
+            and mask of warnings (always False: invalid dates are rejected without warnings).
+    """
+    valid, normalized = [], []
+    for value in values:
+        parsed = Birthday.parse(value)
+        valid.append(parsed is not None)
+        normalized.append(None if parsed is None else f"{parsed[0]:02d}/{parsed[1]:02d}")
+    return valid, normalized, [False] * len(valid)
+
+
+def normalize_birthday(value: str) -> str:
+    """
+    Normalises a birthday date, e.g. to look it up in the address book.
+    :param value: birthday date ("day_info/month_info").
+    :return: date in the format "dd/mm".
+    """
+    parsed = Birthday.parse(value)
+    if parsed is None:
+        raise MyException(f"The birthday date '{value}' is not a valid date (format: day/month).")
+    return f"{parsed[0]:02d}/{parsed[1]:02d}"
 
 
 if __name__ == "__main__":
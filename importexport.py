@@ -0,0 +1,367 @@
+"""
+Import of records into the address book from CSV and JSON Lines files and export of records into them.
+
+CSV files have the columns "name", "phones", "emails", "birthday"; several phone numbers or e-mails
+are separated with ";". In JSON Lines files, each line is an object with the keys "name", "phones" (list),
+"emails" (list) and "birthday".
+"""
+import csv
+import json
+import os
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from addressbook import *
+
+CSV_COLUMNS = ["name", "phones", "emails", "birthday"]
+CSV_LIST_SEPARATOR = ";"
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl"}
+# number of rows sent to a worker process at once by the parallel import
+IMPORT_CHUNK_SIZE = 5000
+
+
+class ImportReport:
+    """
+    This class collects the results of an import: numbers of imported and skipped rows, warnings and errors
+    together with the numbers of the rows which caused them.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.warnings = []  # pairs (row number, message)
+        self.errors = []    # pairs (row number, message)
+
+    def add_warning(self, row_number: int, message: str):
+        self.warnings.append((row_number, message))
+
+    def add_error(self, row_number: int, message: str):
+        self.skipped += 1
+        self.errors.append((row_number, message))
+
+    def to_string(self, max_messages=10):
+        """
+        Returns the summary of the import.
+        :param max_messages: maximum number of warnings and errors to be listed.
+        :return: string with the summary.
+        """
+        lines = [f"Imported records: {self.imported}, skipped rows: {self.skipped}, "
+                 f"warnings: {len(self.warnings)}, errors: {len(self.errors)}."]
+        for title, messages in (("Errors", self.errors), ("Warnings", self.warnings)):
+            if messages:
+                lines.append(f"{title}:")
+                lines.extend(f"\trow {row_number}: {message}" for row_number, message in messages[:max_messages])
+                if len(messages) > max_messages:
+                    lines.append(f"\t... and {len(messages) - max_messages} more.")
+        return "\n".join(lines)
+
+
+def get_format(filename: str, file_format=None):
+    """
+    Determines the format of a file by its extension.
+    :param filename: name of the file.
+    :param file_format: explicitly specified format ("csv" or "jsonl"), has priority over the extension.
+    :return: "csv" or "jsonl".
+    """
+    if file_format:
+        file_format = file_format.lower()
+    else:
+        file_format = FORMATS.get(os.path.splitext(filename)[1].lower())
+    if file_format not in FORMATS.values():
+        raise MyException(f"Unknown format of the file '{filename}': only CSV (.csv) and JSON Lines (.jsonl) are supported.")
+    return file_format
+
+
+def read_rows(f, file_format: str):
+    """
+    Reads raw rows from a file, one by one.
+    :param f: file opened for reading.
+    :param file_format: "csv" or "jsonl".
+    :return: generator of pairs (row number, dict with the keys "name", "phones", "emails", "birthday").
+    """
+    if file_format == "csv":
+        for row_number, row in enumerate(csv.DictReader(f), 1):
+            yield row_number, {
+                "name": row.get("name") or "",
+                "phones": [phone for phone in (row.get("phones") or "").split(CSV_LIST_SEPARATOR) if phone],
+                "emails": [email for email in (row.get("emails") or "").split(CSV_LIST_SEPARATOR) if email],
+                "birthday": row.get("birthday") or "",
+            }
+    else:
+        for row_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            yield row_number, row
+
+
+def record_from_row(row: dict):
+    """
+    Creates a record from a raw row. All values are validated with the rules of the fields.
+    :param row: dict with the keys "name", "phones", "emails", "birthday".
+    :return: new record.
+    """
+    if not isinstance(row, dict):
+        raise MyException("The row is not well-formed.")
+    name = row.get("name")
+    if not name or not isinstance(name, str):
+        raise MyException("The contact name is missing.")
+    record = Record(name)
+    for phone in row.get("phones") or []:
+        record.add_phone_number(str(phone))
+    for email in row.get("emails") or []:
+        record.add_email(str(email))
+    if row.get("birthday"):
+        record.edit_birthday(str(row["birthday"]))
+    return record
+
+
+def record_to_row(record: Record):
+    return {
+        "name": record.get_name(),
+        "phones": record.get_phones(),
+        "emails": record.get_emails(),
+        "birthday": record.get_birthday(),
+    }
+
+
+def parse_row(row):
+    """
+    Extracts the raw values from a row.
+    :param row: dict with the keys "name", "phones", "emails", "birthday".
+    :return: tuple (name, phones, emails, birthday) of strings and lists of strings.
+    """
+    if not isinstance(row, dict):
+        raise MyException("The row is not well-formed.")
+    name = row.get("name")
+    if not name or not isinstance(name, str):
+        raise MyException("The contact name is missing.")
+    return name, [str(phone) for phone in row.get("phones") or []], \
+        [str(email) for email in row.get("emails") or []], str(row["birthday"]) if row.get("birthday") else ""
+
+
+def validate_rows(rows: list):
+    """
+    Validates and normalises a chunk of raw rows in a worker process of the parallel import, with the same rules
+    as record_from_row. The values of all rows are validated at once with the batch validators of the fields,
+    then the results are assigned to the rows in the order in which a record would check them: the first invalid
+    or repeated value makes the row fail.
+    :param rows: list of pairs (row number, raw row).
+    :return: list of tuples (row number, values, error, warnings): values are (name, phones, emails, birthday)
+            of the validated and normalised record or None if the row cannot be imported, error is the reason
+            in that case, warnings is the list of the messages of the warnings of the row.
+    """
+    parsed = []
+    for row_number, row in rows:
+        try:
+            parsed.append((row_number, parse_row(row), None))
+        except MyException as e:
+            parsed.append((row_number, None, str(e)))
+    values = [fields for _, fields, _ in parsed if fields is not None]
+    phone_results = validate_phones([phone for fields in values for phone in fields[1]])
+    email_results = validate_emails([email for fields in values for email in fields[2]])
+    birthday_results = validate_birthdays([fields[3] for fields in values if fields[3]])
+    phone_position = email_position = birthday_position = 0   # positions of the results of the current row
+    res = []
+    for row_number, fields, error in parsed:
+        if fields is None:
+            res.append((row_number, None, error, ()))
+            continue
+        name, raw_phones, raw_emails, raw_birthday = fields
+        messages = []
+        row_phones, error = check_values(raw_phones, phone_results, phone_position, Phone, messages)
+        phone_position += len(raw_phones)
+        row_emails, email_error = check_values(raw_emails, email_results, email_position, Email, messages, error)
+        email_position += len(raw_emails)
+        error = error or email_error
+        birthday = ""
+        if raw_birthday:
+            if not error and not birthday_results[0][birthday_position]:
+                error = Birthday.INVALID_ERROR.format(raw_birthday)
+            birthday = birthday_results[1][birthday_position]
+            birthday_position += 1
+        if error:
+            res.append((row_number, None, error, messages))
+        else:
+            res.append((row_number, (name, row_phones, row_emails, birthday), None, messages))
+    return res
+
+
+def check_values(raw_values: list, results: tuple, start: int, cls, messages: list, error=None):
+    """
+    Checks the values of one row with the results of a batch validator, in the order in which a record would add them.
+    :param raw_values: raw values of the row (phone numbers or e-mails).
+    :param results: results of the batch validator (validity mask, normalised values, warning mask) for all rows.
+    :param start: position of the results of the first value of the row.
+    :param cls: class of the field (Phone or Email).
+    :param messages: list for the warnings of the row.
+    :param error: error which happened earlier in the row: if given, the values are not checked.
+    :return: pair (normalised values, error or None).
+    """
+    row_values = []
+    row_keys = set()    # duplicates are found by the keys of the values, like in a record (see Field.get_key)
+    if error:
+        return row_values, error
+    valid, normalized, warned = results
+    for position, raw_value in enumerate(raw_values, start):
+        if warned[position]:
+            messages.append(cls.MALFORMED_WARNING.format(raw_value))
+        if not valid[position]:
+            return row_values, cls.INVALID_ERROR.format(raw_value)
+        value = normalized[position]
+        key = cls.get_key_of(value)
+        if key in row_keys:
+            return row_values, f"{cls.name.title()} '{value}' is already present."
+        row_keys.add(key)
+        row_values.append(value)
+    return row_values, None
+
+
+def iterate_chunks(rows, chunk_size: int):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_in_workers(rows, workers=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Validates raw rows in a pool of worker processes, chunk by chunk. At most two chunks per worker are
+    in progress at once, so the rows are read lazily even from a large file. The workers use the country code
+    of the phone keys of this process (see Phone.set_country_code), also when they are not forked from it.
+    :param rows: iterable with pairs (row number, raw row).
+    :param workers: number of worker processes, by default: the number of CPUs.
+    :param chunk_size: number of rows sent to a worker at once.
+    :return: generator of the results of validate_rows for single rows, in the order of the rows.
+    """
+    chunks = iterate_chunks(rows, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=Phone.set_country_code,
+                             initargs=(Phone.country_code,)) as executor:
+        pending = deque()
+        while True:
+            for chunk in islice(chunks, 2 * workers - len(pending)):
+                pending.append(executor.submit(validate_rows, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def import_records(addressbook: AddressBook, filename: str, file_format=None, workers=0):
+    """
+    Imports records from a file into the address book. The whole file is read and validated first, the records
+    are added only after that: if the file cannot be read (e.g. it is not UTF-8 or not a well-formed CSV file),
+    nothing is imported. Warnings of the validation are collected into the report instead of being raised,
+    rows which cannot be converted into records are skipped.
+    With workers, the rows are validated and normalised in chunks in parallel worker processes (see validate_rows
+    and validate_in_workers), the records are created from the validated values without validating them again.
+    :param addressbook: address book for the records.
+    :param filename: path to the CSV or JSON Lines file.
+    :param file_format: "csv" or "jsonl". By default, the format is determined by the extension of the file.
+    :param workers: number of worker processes for the validation, None for the number of CPUs.
+                    If 0, the rows are validated in this process.
+    :return: ImportReport.
+    """
+    file_format = get_format(filename, file_format)
+    report = ImportReport()
+
+    def collect_warnings(warning_list, row_number):
+        for w in warning_list:
+            report.add_warning(row_number, str(w.message))
+        warning_list.clear()
+
+    def read_records(f, warning_list):
+        records = []    # pairs (row number, record): only references to the records which are added anyway
+        for row_number, row in read_rows(f, file_format):
+            try:
+                records.append((row_number, record_from_row(row)))
+                report.imported += 1
+            except MyException as e:
+                report.add_error(row_number, str(e))
+            collect_warnings(warning_list, row_number)
+        return records
+
+    def generate_records(records, warning_list):
+        for row_number, record in records:
+            yield record
+            collect_warnings(warning_list, row_number)  # e.g. the warning about an overwritten record
+
+    with warnings.catch_warnings(record=True) as warning_list:
+        warnings.simplefilter("always")
+        try:
+            with open(filename, encoding="utf-8", newline="") as f:
+                if workers != 0:
+                    results = list(validate_in_workers(read_rows(f, file_format), workers))
+                else:
+                    records = read_records(f, warning_list)
+        except FileNotFoundError:
+            raise MyException(f"Records cannot be imported from the file '{filename}': the file does not exist.")
+        except OSError as e:
+            raise MyException(f"Records cannot be imported from the file '{filename}': {e.strerror}.")
+        except UnicodeDecodeError:
+            raise MyException(f"Records cannot be imported from the file '{filename}': it is not a UTF-8 text file.")
+        except csv.Error as e:
+            raise MyException(f"Records cannot be imported from the file '{filename}': {e}.")
+        if workers != 0:
+            addressbook.add_records(merge_validated_rows(report, results, warning_list))
+        else:
+            addressbook.add_records(generate_records(records, warning_list))
+    return report
+
+
+def merge_validated_rows(report: ImportReport, results, warning_list: list):
+    """
+    Creates records from the results of the validation in the worker processes and collects the errors and warnings.
+    :param report: ImportReport.
+    :param results: iterable with the results of validate_rows for single rows.
+    :param warning_list: list where the warnings raised in this process are recorded (e.g. about overwritten records).
+    :return: generator of the records.
+    """
+    for row_number, values, error, messages in results:
+        for message in messages:
+            report.add_warning(row_number, message)
+        if values is None:
+            report.add_error(row_number, error)
+            continue
+        report.imported += 1
+        yield Record.from_stored_values(*values)
+        for w in warning_list:
+            report.add_warning(row_number, str(w.message))
+        warning_list.clear()
+
+
+def export_records(addressbook: AddressBook, filename: str, file_format=None):
+    """
+    Exports all records of the address book into a file, writing them one by one.
+    :param addressbook: address book with the records.
+    :param filename: path to the CSV or JSON Lines file.
+    :param file_format: "csv" or "jsonl". By default, the format is determined by the extension of the file.
+    :return: number of exported records.
+    """
+    file_format = get_format(filename, file_format)
+    cnt = 0
+    try:
+        with open(filename, "w", encoding="utf-8", newline="") as f:
+            if file_format == "csv":
+                writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+                writer.writeheader()
+                for record in addressbook.data.values():
+                    row = record_to_row(record)
+                    row["phones"] = CSV_LIST_SEPARATOR.join(row["phones"])
+                    row["emails"] = CSV_LIST_SEPARATOR.join(row["emails"])
+                    writer.writerow(row)
+                    cnt += 1
+            else:
+                for record in addressbook.data.values():
+                    f.write(json.dumps(record_to_row(record), ensure_ascii=False))
+                    f.write("\n")
+                    cnt += 1
+    except OSError as e:
+        raise MyException(f"Records cannot be exported into the file '{filename}': {e.strerror}.")
+    return cnt
@@ -0,0 +1,233 @@
+"""
+Opt-in instrumentation of the command handlers: numbers of calls and errors, latency histograms and,
+optionally, the profile of the called functions (cProfile) and the allocated memory (tracemalloc).
+"""
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from myexception import MyException
+
+# upper bounds of the buckets of the latency histograms, in milliseconds (the last bucket has no bound)
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+
+class CommandMetrics:
+    """
+    This class collects the metrics of the calls of one command.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)    # number of calls per latency bucket
+        self.allocated = 0      # memory allocated by the calls and not released after them, in bytes
+        self.peak = 0           # maximum of the memory allocated during one call, in bytes
+
+    def add_call(self, elapsed: float, failed: bool, allocated=0, peak=0):
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        elapsed_ms = elapsed * 1000
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+        self.allocated += allocated
+        self.peak = max(self.peak, peak)
+
+    def percentile(self, fraction: float):
+        """
+        Estimates a percentile of the latency from the histogram.
+        :param fraction: fraction of the calls, e.g. 0.99.
+        :return: upper bound of the bucket containing the percentile in milliseconds, at most the maximum latency.
+        """
+        max_ms = self.max_time * 1000
+        cnt = 0
+        for bound, bucket_cnt in zip(LATENCY_BUCKETS_MS, self.histogram):
+            cnt += bucket_cnt
+            if cnt and cnt >= fraction * self.calls:
+                return min(bound, round(max_ms, 4))
+        return round(max_ms, 4)
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_time * 1000, 3),
+            "mean_ms": round(self.total_time / self.calls * 1000, 4) if self.calls else 0.0,
+            "max_ms": round(self.max_time * 1000, 4),
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "histogram_ms": {f"<={bound}": cnt for bound, cnt in zip(LATENCY_BUCKETS_MS, self.histogram)} |
+                            {f">{LATENCY_BUCKETS_MS[-1]}": self.histogram[-1]},
+            "allocated_bytes": self.allocated,
+            "peak_bytes": self.peak,
+        }
+
+
+class Instrumentation:
+    """
+    This class collects the metrics of the command handlers called through it (see call).
+    Nothing is measured until the instrumentation is enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics = {}           # command -> CommandMetrics
+        self.profiler = None        # cProfile.Profile if the handlers are profiled
+        self.trace_memory = False   # True if the memory allocated by the handlers is traced
+        self.started_tracemalloc = False
+
+    def enable(self, profile=False, trace_memory=False):
+        """
+        Starts measuring the calls of the handlers.
+        :param profile: if True, the functions called by the handlers are profiled with cProfile (slower).
+        :param trace_memory: if True, the memory allocated by the handlers is traced with tracemalloc (slower).
+        :return: None.
+        """
+        self.enabled = True
+        if profile and self.profiler is None:
+            self.profiler = cProfile.Profile()
+        if trace_memory and not self.trace_memory:
+            self.trace_memory = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracemalloc = True
+
+    def disable(self):
+        """
+        Stops measuring the calls of the handlers. The collected metrics are kept.
+        :return: None.
+        """
+        self.enabled = False
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        self.trace_memory = False
+
+    def reset(self):
+        self.metrics.clear()
+        if self.profiler is not None:
+            self.profiler = cProfile.Profile()
+
+    def call(self, command: str, handler: callable, args):
+        """
+        Calls the handler and records the metrics of the call if the instrumentation is enabled.
+        The time of showing the pages of a result returned as an iterator is not included.
+        :param command: command of the handler.
+        :param handler: command handler.
+        :param args: arguments for the handler.
+        :return: result of the handler.
+        """
+        if not self.enabled:
+            return handler(args)
+        profiler = self.profiler
+        trace_memory = self.trace_memory
+        if trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        failed = False
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            return handler(args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            allocated = peak = 0
+            if trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                allocated = current - memory_before
+                peak -= memory_before
+            if command not in self.metrics:
+                self.metrics[command] = CommandMetrics()
+            self.metrics[command].add_call(elapsed, failed, allocated, peak)
+
+    def to_string(self):
+        """
+        Returns the table with the metrics of the commands.
+        :return: string with the table.
+        """
+        if not self.metrics:
+            state = "enabled" if self.enabled else "disabled (use 'stats on')"
+            return f"No commands were measured yet. The instrumentation is {state}."
+        header = f"{'COMMAND':<16}{'CALLS':>8}{'ERRORS':>8}{'TOTAL, ms':>12}{'MEAN, ms':>10}" \
+                 f"{'P50, ms':>10}{'P99, ms':>10}{'MAX, ms':>10}"
+        if self.trace_memory:
+            header += f"{'PEAK, KB':>10}"
+        lines = [header]
+        for command, metrics in sorted(self.metrics.items(), key=lambda item: -item[1].total_time):
+            values = metrics.to_dict()
+            line = f"{command:<16}{values['calls']:>8}{values['errors']:>8}{values['total_ms']:>12.2f}" \
+                   f"{values['mean_ms']:>10.4f}{values['p50_ms']:>10}{values['p99_ms']:>10}{values['max_ms']:>10.4f}"
+            if self.trace_memory:
+                line += f"{metrics.peak / 1024:>10.1f}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def get_profile_stats(self, n=20):
+        """
+        Returns the functions which took the most time in the profiled handlers.
+        :param n: number of functions.
+        :return: list of dicts with the location of the function, the number of calls, own and cumulative time.
+        """
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler)
+        res = []
+        for (filename, line, function), (_, calls, own_time, cumulative_time, _) in stats.stats.items():
+            res.append({"function": f"{filename}:{line}({function})", "calls": calls,
+                        "own_ms": round(own_time * 1000, 3), "cumulative_ms": round(cumulative_time * 1000, 3)})
+        res.sort(key=lambda entry: -entry["cumulative_ms"])
+        return res[:n]
+
+    def profile_to_string(self, n=20):
+        if self.profiler is None:
+            return "The handlers are not profiled (use 'stats on profile')."
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats("cumulative").print_stats(n)
+        return output.getvalue()
+
+    def memory_to_string(self, n=10):
+        """
+        Returns the lines of code which hold the most of the traced memory.
+        :param n: number of lines of code.
+        :return: string with the lines and the sizes of the memory.
+        """
+        if not tracemalloc.is_tracing():
+            return "The memory is not traced (use 'stats on memory')."
+        top = tracemalloc.take_snapshot().statistics("lineno")[:n]
+        return "\n".join(str(stat) for stat in top)
+
+    def to_dict(self):
+        return {
+            "enabled": self.enabled,
+            "commands": {command: metrics.to_dict() for command, metrics in self.metrics.items()},
+            "profile": self.get_profile_stats(),
+        }
+
+    def dump(self, filename: str):
+        """
+        Writes the metrics (and the top of the profile) into a JSON file.
+        If the handlers are profiled, the full profile is written next to it as "<filename>.prof" (see pstats).
+        :param filename: path to the JSON file.
+        :return: None.
+        """
+        try:
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=4)
+            if self.profiler is not None:
+                self.profiler.dump_stats(filename + ".prof")
+        except OSError as e:
+            raise MyException(f"The statistics cannot be written into the file '{e.filename}': {e.strerror}.")
@@ -0,0 +1,89 @@
+"""
+These classes are required to store changes of the address book in an append-only journal.
+"""
+import os
+import pickle
+from myexception import MyException
+
+
+class JournalOp:
+    """
+    This class represents types of operations which can be stored in the journal.
+    """
+    ADD_RECORD, DELETE_RECORD, RENAME_RECORD, EDIT_RECORD = range(4)
+
+
+class Journal:
+    """
+    This class represents an append-only log file with the operations performed on an address book
+    since its last snapshot was stored.
+    """
+
+    def __init__(self, filename: str):
+        """
+        Initializes the journal.
+        :param filename: path to the log file. The file is created on the first append.
+        """
+        self.filename = filename
+        self.file = None
+
+    def get_filename(self):
+        return self.filename
+
+    def append(self, op: JournalOp, payload):
+        """
+        Appends a new entry to the end of the journal.
+        :param op: type of the operation.
+        :param payload: data needed to repeat the operation (record, name, pair of names or Change object).
+        :return: None.
+        """
+        if self.file is None:
+            self.file = open(self.filename, "ab")
+        pickle.dump((op, payload), self.file, pickle.HIGHEST_PROTOCOL)
+
+    def flush(self):
+        """
+        Writes all appended entries to the disk.
+        :return: None.
+        """
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def clear(self):
+        """
+        Removes all entries from the journal, e.g. after they were folded into a new snapshot.
+        :return: None.
+        """
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def read(self):
+        """
+        Reads all entries stored in the journal.
+        An incomplete entry at the end of the file (e.g. after a crash during writing) is ignored and cut off,
+        so that the entries appended later follow the last complete one.
+        :return: generator of (operation type, payload) pairs.
+        """
+        self.flush()
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "rb") as f:
+            while True:
+                end = f.tell()  # end of the last complete entry
+                try:
+                    entry = pickle.load(f)
+                except EOFError:
+                    return
+                except pickle.UnpicklingError as e:
+                    if "truncated" in str(e):
+                        os.truncate(self.filename, end)
+                        return
+                    raise MyException(f"The journal '{self.filename}' is corrupted.")
+                yield entry
@@ -7,6 +7,8 @@ Notes:
         simple strategy, warnings can appear if the input does not pass validation
     Phone validation: phone has to consist of digits, optionally preceded with one "+";
                       additionally, a warning appears if the number of digits < 3 or > 15
+    Phone search: numbers are compared in the international form, e.g. "+380501234567", "00380501234567"
+                  and "0501234567" (with the default country code 380, see "--country-code") are the same number
     Birthday: year of the birthday is ignored even if provided, only day_info/month_info is stored
     Birthday validation: it is checked if the combination day/month (provided in a correct format)
                         is generally possible, irrespective of the year
@@ -38,14 +40,25 @@ Possible improvements:
 """
 
 from addressbook import *
+from importexport import import_records, export_records
+from instrumentation import Instrumentation
+from registry import BookRegistry
+from storage import *
+import argparse
 import os
+import sys
+import time
 import warnings
 
 ADDRESSBOOK = AddressBook()
+REGISTRY = BookRegistry("users")  # address books of the users which were stored or loaded, kept open in memory
+INSTRUMENTATION = Instrumentation()  # metrics of the command handlers, collected after 'stats on'
+SHOW_UPDATED_RECORDS = True  # if False, commands confirm changes without displaying the whole updated record
 WARNING_COLOR = '\033[93m'  # '\033[92m' #'\033[93m'
 RESET_COLOR = '\033[0m'
 
 IDX_STRING = "idx="
+DISTANCE_STRING = "dist="
 WARNING_WRONG_N_PER_PAGE = f"Parameter for the number of records per page should be a positive integer. Parameter " \
                            f"which was given: "
 INSTRUCTION_CHANGE = "\t<name> -n <new_name>\t-\tto change the contact name from its current value\n" \
@@ -79,6 +92,12 @@ INSTRUCTION_FIND = "\t-n <name> (<n>)\t\t-\tto find the record with the contact
                    "\t-p <phone> (<n>)\t-\tto find the record(s) with the phone number <phone>\n" \
                    "\t-e <email> (<n>)\t-\tto find the record(s) with the e-mail <email>\n" \
                    "\t-b <birthday> (<n>)\t-\tto find the record(s) with the birthday <birthday> (format: day/month)\n" \
+                   "\t-s <fragment> (<n>)\t-\tto find the record(s) with the name, phone number or e-mail\n" \
+                   "\t\t\t\t\t\t\t\tcontaining <fragment> (case-insensitive)\n" \
+                   f"\t-f <name> (<n>) ({DISTANCE_STRING}<distance>)\t-\tto find the record(s) with the name similar to\n" \
+                   "\t\t\t\t\t\t\t\t<name>: with at most <distance> typos (default and maximum: " \
+                   f"{AddressBook.FUZZY_MAX_DISTANCE}),\n" \
+                   "\t\t\t\t\t\t\t\tfrom the closest names (case-insensitive)\n" \
                    "\t(The optional parameter <n> specifies the maximum number of records to be displayed at once.)"
 
 HELP_STRING = "This programme supports the following commands\n" \
@@ -97,23 +116,51 @@ HELP_STRING = "This programme supports the following commands\n" \
               "\temail <name>\n" \
               "8.\tShowing birthday info saved for a given contact:\n" \
               "\tbirthday <name>\n" \
+              "\tupcoming <days> (<n>)\t-\tto show the contacts with the birthday within the next <days> days\n" \
+              "\t(The optional parameter <n> specifies the maximum number of records to be displayed at once.)\n" \
               "9.\tShowing all records in the address book:\n" \
               "\tshow all (<n>)\n" \
               "\t(The optional parameter <n> specifies the maximum number of records to be displayed at once.)\n"\
+              "\tshow sorted (<n>) (from <name>) (to <name>) (after <name>)\t-\tto show the records sorted\n" \
+              "\t\t\t\t\t\t\t\tby the contact name, OPTIONALLY: only the names from <name> (inclusive)\n" \
+              "\t\t\t\t\t\t\t\tto <name> (exclusive) or after <name>, e.g. the last name shown before\n" \
               "10.\tShowing the username in the address book (the name of the owner):\n" \
               "\tusername\n" \
               "11.\tChanging the username in the address book:\n" \
               "\tnew username <username>\n" \
               "12.\tStoring current address book into a file (under the current username):\n" \
-              "\tstore\n" \
-              "13.\tLoading an address book from a file:\n" \
+              "\tstore (journal|sqlite|snapshot|pickle)\n" \
+              "\t(With the option 'journal', every further change is appended to a journal next to the file,\n" \
+              "\tthe following 'store' commands only save the journal.\n" \
+              "\tWith the option 'sqlite', the address book is moved into an SQLite database,\n" \
+              "\tall further changes are saved in the database at once.\n" \
+              "\tWith the option 'snapshot', the address book is moved into a memory-mapped snapshot which is\n" \
+              "\tloaded at once, even if it is large: the records are read only when they are needed.\n" \
+              "\tWith the option 'pickle', the address book is moved back into a binary file.)\n" \
+              "\tcompact\t-\tto fold the journal into a new file with the whole address book\n" \
+              "13.\tLoading an address book from a file (a database or a snapshot is preferred if there is one):\n" \
               "\tload <username>\n" \
+              "\t(Recently loaded or stored address books are kept in memory; unsaved changes of an address book\n" \
+              "\tare saved when it is closed to free memory or when the programme exits,\n" \
+              "\tor in the background if the programme is started with '--autosave <seconds>'.)\n" \
+              "\timport <file> (<workers>)\t-\tto import records from a CSV (.csv) or JSON Lines (.jsonl) file\n" \
+              "\t(The optional parameter <workers> specifies the number of processes validating the rows in parallel.)\n" \
+              "\texport <file>\t-\tto export all records into a CSV (.csv) or JSON Lines (.jsonl) file\n" \
               "14.\tExiting the programme:\n" \
               "\tgood bye\n" \
               "\tclose\n" \
               "\texit\n" \
               "15.\tGetting help:\n" \
               "\thelp\n" \
+              "16.\tShowing the statistics of the commands (numbers of calls, errors and latencies):\n" \
+              "\tstats\n" \
+              "\tstats on (profile) (memory)\t-\tto start collecting the statistics, OPTIONALLY: with the profile\n" \
+              "\t\t\t\t\t\t\t\tof the called functions (profile) and the allocated memory (memory)\n" \
+              "\tstats off\t-\tto stop collecting the statistics\n" \
+              "\tstats reset\t-\tto clear the collected statistics\n" \
+              "\tstats profile (<n>)\t-\tto show <n> functions which took the most time\n" \
+              "\tstats memory (<n>)\t-\tto show <n> lines of code which hold the most memory\n" \
+              "\tstats dump <file>\t-\tto write the statistics into a JSON file\n" \
               "\nAll commands are case insensitive."
 
 
@@ -213,16 +260,27 @@ def change_handler(args):
                             cur_value=cur_value, idx=idx, first=first,
                             last=last)  # self, new_value: str, cur_value="", idx=None, first=False, last=False
     record = ADDRESSBOOK.edit_record(change)
+    if not SHOW_UPDATED_RECORDS:
+        return f"The record for the name '{record.get_name()}' was successfully edited."
     return f"The record was successfully edited. Updated record:\n{record.to_string()}"
 
 def find_handler(args):
     """
-    Finds a record/records in the address book: by name, phone number, e-mail or birthday date.
+    Finds a record/records in the address book: by name, phone number, e-mail, birthday date,
+    a fragment of name, phone number or e-mail, or a name similar to the given one.
     :param args: parameters to find the record(s).
     :return: the string representing the record(s).
     """
-    if len(args) < 2 or args[0].lower() not in ["-n", "-p", "-e", "-b"]:
+    if len(args) < 2 or args[0].lower() not in ["-n", "-p", "-e", "-b", "-s", "-f"]:
         raise MyException(f"Please, specify the search parameter, e.g.:\n{INSTRUCTION_FIND}")
+    max_distance = None
+    for arg in args[2:]:
+        if arg.startswith(DISTANCE_STRING):
+            try:
+                max_distance = int(arg[len(DISTANCE_STRING):])
+            except ValueError:
+                raise MyException(f"Integer edit distance is expected, provided: '{arg}'.")
+    args = args[:2] + [arg for arg in args[2:] if not arg.startswith(DISTANCE_STRING)]
     match args[0].lower():
         case "-n":
             param = "name"
@@ -236,6 +294,12 @@ def find_handler(args):
         case "-b":
             param = "birthday date"
             res = ADDRESSBOOK.get_record_by_birthday(args[1])
+        case "-s":
+            param = "fragment"
+            res = ADDRESSBOOK.get_record_by_fragment(args[1])
+        case "-f":
+            param = "name similar to"
+            res = ADDRESSBOOK.get_record_by_fuzzy_name(args[1], max_distance)
     if not res:
         return f"No record with the {param} '{args[1]}' found."
     elif type(res) == Record:
@@ -246,7 +310,8 @@ def find_handler(args):
             return iterator
         except MyIteratorNException:
             warnings.warn(WARNING_WRONG_N_PER_PAGE + f"'{args[2]}' (ignored).")
-    return "\n\n".join(record.to_string() for record in res)
+    today = Today.get()
+    return "\n\n".join(record.to_string(today) for record in res)
 
 
 def delete_handler(args):
@@ -314,6 +379,28 @@ def birthday_handler(args):
         res = f"No birthday information stored for {name}."
     return res
 
+def upcoming_handler(args):
+    """
+    Displays the records of the contacts with the birthday within the given number of days,
+    sorted by the number of days till the birthday.
+    :param args: number of days, optionally: the maximum number of records to be displayed at once.
+    :return: the string representing the record(s).
+    """
+    if not args:
+        raise MyException("Please, specify the number of days.")
+    res = [record for days, record in ADDRESSBOOK.get_upcoming_birthdays(args[0])]
+    if not res:
+        return f"No birthdays within the next {args[0]} days."
+    if len(args) > 1:
+        try:
+            iterator = ABIterator(res, args[1])
+            return iterator
+        except MyIteratorNException:
+            warnings.warn(WARNING_WRONG_N_PER_PAGE + f"'{args[1]}' (ignored).")
+    today = Today.get()
+    return "\n\n".join(record.to_string(today) for record in res)
+
+
 def show_all_handler(args):
     """
     Handles showing all records in the address book.
@@ -332,6 +419,36 @@ def show_all_handler(args):
     return res
 
 
+def show_sorted_handler(args):
+    """
+    Handles showing the records sorted by the contact name, optionally only the names within a range
+    or after the last name shown earlier (cursor).
+    :param args: optional: <n> - number of records per page, "from" <name> - first name of the range,
+                "to" <name> - end of the range (not included), "after" <name> - name after which the listing starts.
+    :return: iterator over the pages of the sorted records or a message if no record was found.
+    """
+    bounds = {"from": None, "to": None, "after": None}
+    n = None
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg.lower() in bounds:
+            if not args:
+                raise MyException(f"Please, specify the name after '{arg}'.")
+            bounds[arg.lower()] = args.pop(0)
+        elif n is None:
+            n = arg
+        else:
+            raise MyException(f"Unexpected parameter of the command 'show sorted': '{arg}'.")
+    if not ADDRESSBOOK.get_names_in_range(bounds["from"], bounds["to"], bounds["after"], 1):
+        return "No records found."
+    try:
+        return ADDRESSBOOK.sorted_iterator(n, bounds["from"], bounds["to"], bounds["after"])
+    except MyIteratorNException:
+        warnings.warn(WARNING_WRONG_N_PER_PAGE + f"'{n}' (ignored).")
+        return ADDRESSBOOK.sorted_iterator(None, bounds["from"], bounds["to"], bounds["after"])
+
+
 def get_username_handler(args):
     """
     Gets current username in the address book (name of the address book owner).
@@ -354,10 +471,68 @@ def set_username_handler(args):
     return f"The username successfully changed to '{name}'."
 
 
+def switch_addressbook(addressbook: AddressBook):
+    """
+    Replaces the current address book, e.g. after another one was loaded.
+    :param addressbook: new current address book.
+    :return: None.
+    """
+    global ADDRESSBOOK
+    if addressbook is ADDRESSBOOK:
+        return
+    if not REGISTRY.is_registered(ADDRESSBOOK):
+        ADDRESSBOOK.close()  # the address books in the registry stay open until they are evicted
+    ADDRESSBOOK = addressbook
+
+
 def store_handler(args):
     """
     Stores current address book into a binary file in the folder "users".
     By default, the current username will be used as the filename.
+    In the journaled mode, only the journal with the changes since the last full storage is saved.
+    :param args: optional parameter "journal" to switch the journaled mode on,
+                "sqlite" to move the address book into an SQLite database or "snapshot" - into a memory-mapped
+                snapshot.
+    :return: confirmation of the storage.
+    """
+    folder = "users"
+    if folder not in os.listdir():
+        os.makedirs(folder)
+    if isinstance(ADDRESSBOOK, SQLiteAddressBook) and not (args and args[0].lower() in ("pickle", "snapshot")):
+        return f"The address book for the user '{ADDRESSBOOK.get_username()}' is stored in a database, " \
+               f"all changes are saved automatically."
+    if args and args[0].lower() in STORAGES:
+        old_addressbook = ADDRESSBOOK
+        addressbook = STORAGES[args[0].lower()](folder, ADDRESSBOOK.get_username()).save(ADDRESSBOOK)
+        REGISTRY.add(addressbook)
+        switch_addressbook(addressbook)
+        if isinstance(old_addressbook, (SQLiteAddressBook, SnapshotAddressBook)) and \
+                old_addressbook is not ADDRESSBOOK:
+            # the database or the snapshot is replaced, otherwise it would be loaded instead
+            os.remove(old_addressbook.filename)
+        return f"The address book for the user '{ADDRESSBOOK.get_username()}' was successfully stored " \
+               f"({args[0].lower()})."
+    REGISTRY.add(ADDRESSBOOK)
+    if args and args[0].lower() == "journal":
+        ADDRESSBOOK.store_to_file(path=folder)
+        ADDRESSBOOK.enable_journal(path=folder)
+        return f"The address book for the user '{ADDRESSBOOK.get_username()}' was successfully stored. " \
+               f"Further changes will be journaled."
+    if ADDRESSBOOK.is_journaled_to(path=folder):
+        ADDRESSBOOK.flush_journal()
+        return f"The changes in the address book for the user '{ADDRESSBOOK.get_username()}' were successfully " \
+               f"stored in the journal."
+    if not ADDRESSBOOK.dirty and os.path.exists(ADDRESSBOOK.get_snapshot_filename(path=folder)):
+        return f"The address book for the user '{ADDRESSBOOK.get_username()}' has no unsaved changes."
+    changed_cnt = len(ADDRESSBOOK.get_changed_records())
+    ADDRESSBOOK.store_to_file(path=folder)
+    return f"The address book for the user '{ADDRESSBOOK.get_username()}' was successfully stored " \
+           f"(changed records: {changed_cnt})."
+
+
+def compact_handler(args):
+    """
+    Folds the journal into a new binary file with the whole address book in the folder "users".
     :param args: not needed.
     :return: confirmation of the storage.
     """
@@ -365,26 +540,93 @@ def store_handler(args):
     if folder not in os.listdir():
         os.makedirs(folder)
     ADDRESSBOOK.store_to_file(path=folder)
-    return f"The address book for the user '{ADDRESSBOOK.get_username()}' was successfully stored."
+    return f"The journal for the user '{ADDRESSBOOK.get_username()}' was successfully compacted."
 
 
 def load_handler(args):
     """
     Loads an address book from a file. The must be in the folder "users" in the current directory.
+    Address books which were used recently are kept in memory and are not read from the file again.
     :param args: username whose address book has to be loaded.
     :return: confirmation of the loading.
     """
     if len(args) < 1:
         raise MyException("Please, specify the username.")
     name = args[0]
-    filename = name + ".bin"
-    folder = "users"
-    if folder not in os.listdir() or filename not in os.listdir(folder):
-        raise MyException(f"No address book stored for the user '{name}'")
-    ADDRESSBOOK.load_from_file(os.path.join(folder, filename))
+    switch_addressbook(REGISTRY.open(name))
     return f"Address book for the user '{name}' successfully loaded."
 
 
+def import_handler(args):
+    """
+    Imports records from a CSV or JSON Lines file into the address book.
+    :param args: path to the file, optionally: the number of worker processes to validate the rows in parallel.
+    :return: report of the import.
+    """
+    if len(args) < 1:
+        raise MyException("Please, specify the file to import records from.")
+    workers = 0
+    if len(args) > 1:
+        try:
+            workers = int(args[1])
+            if workers < 0:
+                raise ValueError()
+        except ValueError:
+            raise MyException(f"Non-negative integer number of worker processes is expected, provided: '{args[1]}'.")
+    report = import_records(ADDRESSBOOK, args[0], workers=workers)
+    return report.to_string()
+
+
+def export_handler(args):
+    """
+    Exports all records of the address book into a CSV or JSON Lines file.
+    :param args: path to the file.
+    :return: confirmation of the export.
+    """
+    if len(args) < 1:
+        raise MyException("Please, specify the file to export records to.")
+    cnt = export_records(ADDRESSBOOK, args[0])
+    return f"{cnt} records were successfully exported into the file '{args[0]}'."
+
+
+def stats_handler(args):
+    """
+    Shows the statistics of the commands collected by the instrumentation or controls the instrumentation.
+    :param args: not needed to show the statistics, otherwise: "on" (optionally with "profile" and/or "memory"),
+                "off", "reset", "profile" (<n>), "memory" (<n>) or "dump" <file>.
+    :return: statistics or confirmation of the action.
+    """
+    if not args:
+        return INSTRUMENTATION.to_string()
+    action = args[0].lower()
+    if action == "on":
+        options = {option.lower() for option in args[1:]}
+        INSTRUMENTATION.enable(profile="profile" in options, trace_memory="memory" in options)
+        return "Collecting the statistics of the commands."
+    if action == "off":
+        INSTRUMENTATION.disable()
+        return "Stopped collecting the statistics of the commands."
+    if action == "reset":
+        INSTRUMENTATION.reset()
+        return "The statistics of the commands were cleared."
+    if action in ("profile", "memory"):
+        n = 20
+        if len(args) > 1:
+            try:
+                n = int(args[1])
+                if n < 1:
+                    raise ValueError()
+            except ValueError:
+                raise MyException(f"Positive integer number of entries is expected, provided: '{args[1]}'.")
+        return INSTRUMENTATION.profile_to_string(n) if action == "profile" else INSTRUMENTATION.memory_to_string(n)
+    if action == "dump":
+        if len(args) < 2:
+            raise MyException("Please, specify the file to write the statistics to.")
+        INSTRUMENTATION.dump(args[1])
+        return f"The statistics of the commands were written into the file '{args[1]}'."
+    raise MyException(f"Unknown option of the command 'stats': '{args[0]}'.")
+
+
 def help_handler(args):
     return HELP_STRING
 
@@ -398,24 +640,80 @@ COMMANDS = {
     phone_handler: ["phone"],  # showing all phone numbers saved for a given contact
     email_handler: ["email"],  # showing all e-mails saved for a given contact
     birthday_handler: ["birthday"], # ! showing the birthday info stored for a given contact
+    upcoming_handler: ["upcoming"],  # showing the contacts with the birthday within the next days
     show_all_handler: ["show all"],  # showing all records in the address book
+    show_sorted_handler: ["show sorted"],  # showing the records sorted by the contact name
     get_username_handler: ["username"],  # showing the username in the address book
     set_username_handler: ["new username"],  # changing the username in the address book
     store_handler: ["store"],  # storing current address book into a file
+    compact_handler: ["compact"],  # folding the journal into a new file with the address book
     load_handler: ["load"],  # loading an address book from a file
+    import_handler: ["import"],  # importing records from a CSV or JSON Lines file
+    export_handler: ["export"],  # exporting records into a CSV or JSON Lines file
     exit_handler: ["good bye", "close", "exit"],  # exiting the programme
-    help_handler: ["help"]  # getting help
+    help_handler: ["help"],  # getting help
+    stats_handler: ["stats"]  # showing the statistics of the commands
 }
 
 
+# dispatch table compiled from COMMANDS: a trie keyed on the lowercased words of the commands,
+# the key None of a node holds the handler of the command which ends at this node
+COMMAND_TRIE = {}
+
+
+def register_command(handler: callable, *commands: str):
+    """
+    Registers a handler for the given commands, so that command_parcer dispatches them to it.
+    :param handler: function which handles the commands.
+    :param commands: commands (one or more words each, case-insensitive).
+    :return: None.
+    """
+    aliases = COMMANDS.setdefault(handler, [])
+    for command in commands:
+        if command not in aliases:
+            aliases.append(command)
+    for command in commands:
+        node = COMMAND_TRIE
+        for word in command.lower().split():
+            node = node.setdefault(word, {})
+        node[None] = handler
+
+
+for registered_handler, registered_commands in list(COMMANDS.items()):
+    register_command(registered_handler, *registered_commands)
+
+
 def command_parcer(raw_str: str) -> (callable, list):
-    case_insensitive = raw_str.lower()
-    for handler, commands in COMMANDS.items():
-        for command in commands:
-            if case_insensitive == command or case_insensitive.startswith(command + " "):
-                args = raw_str[len(command):].split()
-                return handler, args
-    return None, None
+    """
+    Finds the handler of the command in the input string: the longest registered command
+    matching the first words of the input (case-insensitive).
+    :param raw_str: input string.
+    :return: the handler and the list of the arguments for it, (None, None) if the command is not defined.
+    """
+    words = raw_str.split()
+    node = COMMAND_TRIE
+    handler = None
+    n_words = 0
+    for position, word in enumerate(words):
+        node = node.get(word.lower())
+        if node is None:
+            break
+        if None in node:
+            handler = node[None]
+            n_words = position + 1
+    if handler is None:
+        return None, None
+    return handler, words[n_words:]
+
+
+def call_handler(handler: callable, args: list):
+    """
+    Calls the handler of a command, measured by the instrumentation if it is enabled.
+    :param handler: handler found by command_parcer.
+    :param args: arguments for the handler.
+    :return: result of the handler.
+    """
+    return INSTRUMENTATION.call(COMMANDS[handler][0], handler, args)
 
 
 def input_error(fnc):
@@ -439,7 +737,7 @@ def main():
                 print("The command is not defined. Please, use a valid command")
                 u_input = input(">>> ")
                 func, data = command_parcer(u_input)
-            result = func(data)
+            result = call_handler(func, data)
         for w in warning_list:
             print(f"\t{WARNING_COLOR}{w.message}{RESET_COLOR}")
         if isinstance(result, ABIterator):
@@ -459,5 +757,134 @@ def main():
             break
 
 
+class CommandStats:
+    """
+    Statistics of the executions of one command in the batch mode.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.warnings = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add_call(self, elapsed: float, failed: bool, warnings_cnt: int):
+        self.calls += 1
+        self.errors += int(failed)
+        self.warnings += warnings_cnt
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def to_string(self, command: str):
+        mean_time = self.total_time / self.calls if self.calls else 0.0
+        return f"{command:<16}{self.calls:>10}{self.errors:>10}{self.warnings:>10}" \
+               f"{self.total_time * 1000:>14.2f}{mean_time * 1000:>12.4f}{self.max_time * 1000:>12.4f}"
+
+
+def run_batch(lines, output=None):
+    """
+    Executes commands non-interactively, e.g. from a script file. Empty lines and lines starting with "#" are skipped.
+    Updated records are not displayed after changes, all pages of the results are taken at once.
+    :param lines: iterable with the commands, one command per line.
+    :param output: stream for the results of the commands. If None, the results are not displayed.
+    :return: summary with the number of calls, errors, warnings and timings per command.
+    """
+    global SHOW_UPDATED_RECORDS
+    show_updated_records, SHOW_UPDATED_RECORDS = SHOW_UPDATED_RECORDS, False
+    stats = {}
+    batch_start = time.perf_counter()
+    try:
+        for line_number, u_input in enumerate(lines, 1):
+            u_input = u_input.strip()
+            if not u_input or u_input.startswith("#"):
+                continue
+            func, data = command_parcer(u_input)
+            command = COMMANDS[func][0] if func else "<unknown>"
+            start = time.perf_counter()
+            failed = False
+            result = None
+            with warnings.catch_warnings(record=True) as warning_list:
+                warnings.simplefilter("always")
+                try:
+                    if not func:
+                        raise MyException("The command is not defined.")
+                    result = call_handler(func, data)
+                    if isinstance(result, ABIterator):
+                        result = "\n\n".join(result)   # the pages are rendered even if they are not displayed
+                except MyException as e:
+                    failed = True
+                    print(f"Line {line_number}: {u_input}\n\t{e}", file=sys.stderr)
+                except Exception as e:
+                    # an unexpected error fails only its command, the batch goes on
+                    failed = True
+                    print(f"Line {line_number}: {u_input}\n\t{type(e).__name__}: {e}", file=sys.stderr)
+            elapsed = time.perf_counter() - start
+            stats.setdefault(command, CommandStats()).add_call(elapsed, failed, len(warning_list))
+            if output is not None and result is not None:
+                print(result, file=output)
+            if func == exit_handler:
+                break
+    finally:
+        SHOW_UPDATED_RECORDS = show_updated_records
+    total_time = time.perf_counter() - batch_start
+    total = CommandStats()
+    for command_stats in stats.values():
+        total.calls += command_stats.calls
+        total.errors += command_stats.errors
+        total.warnings += command_stats.warnings
+        total.total_time += command_stats.total_time
+        total.max_time = max(total.max_time, command_stats.max_time)
+    header = f"{'COMMAND':<16}{'CALLS':>10}{'ERRORS':>10}{'WARNINGS':>10}{'TOTAL, ms':>14}{'MEAN, ms':>12}{'MAX, ms':>12}"
+    lines = [header] + [command_stats.to_string(command) for command, command_stats in stats.items()]
+    lines.append(total.to_string("TOTAL"))
+    lines.append(f"Batch finished in {total_time:.3f} s.")
+    return "\n".join(lines)
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Address book with a command line interface.")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="execute the commands from the file non-interactively ('-' to read from stdin)")
+    parser.add_argument("--verbose", action="store_true", help="display the results of the commands in the batch mode")
+    parser.add_argument("--max-open-books", type=int, default=REGISTRY.capacity,
+                        help="maximum number of address books kept in memory")
+    parser.add_argument("--autosave", type=float, metavar="SECONDS",
+                        help="save the changes of the loaded or stored address books in the background")
+    parser.add_argument("--autosave-changes", type=int, metavar="N",
+                        help="save the changes in the background after every N changes")
+    parser.add_argument("--stats", action="store_true",
+                        help="collect the statistics of the commands from the start (see the command 'stats')")
+    parser.add_argument("--profile", action="store_true",
+                        help="collect the statistics with the profile of the called functions (cProfile)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="collect the statistics with the memory allocated by the commands (tracemalloc)")
+    parser.add_argument("--stats-file", metavar="FILE",
+                        help="write the statistics of the commands into the JSON file on exit")
+    parser.add_argument("--country-code", default=Phone.country_code, metavar="CODE",
+                        help="country code of the phone numbers written with the leading 0 (empty: no country code)")
+    cli_args = parser.parse_args()
+    try:
+        Phone.set_country_code(cli_args.country_code)
+    except MyException as e:
+        parser.error(str(e))
+    REGISTRY = BookRegistry("users", cli_args.max_open_books, cli_args.autosave, cli_args.autosave_changes)
+    if cli_args.stats or cli_args.profile or cli_args.trace_memory or cli_args.stats_file:
+        INSTRUMENTATION.enable(profile=cli_args.profile, trace_memory=cli_args.trace_memory)
+    try:
+        if cli_args.batch:
+            output = sys.stdout if cli_args.verbose else None
+            if cli_args.batch == "-":
+                print(run_batch(sys.stdin, output))
+            else:
+                with open(cli_args.batch, encoding="utf-8") as f:
+                    print(run_batch(f, output))
+        else:
+            main()
+    finally:
+        REGISTRY.close_all()
+        if cli_args.stats_file:
+            try:
+                INSTRUMENTATION.dump(cli_args.stats_file)
+            except MyException as e:
+                print(e, file=sys.stderr)
@@ -1,20 +1,161 @@
 from fields import *
-from collections import deque
 from myexception import *
-from datetime import datetime
 import warnings
 
 
+class FieldList(list):
+    """
+    Class representing a list of Field objects (phone numbers or e-mails of a record) which finds the position
+    of a value by its key (see Field.get_key). The keys of the values in the list are expected to be unique.
+    Short lists, i.e. almost all of them, are scanned; a list longer than INDEX_THRESHOLD keeps a side index
+    key -> position, so that checking if a value is in the list and finding its position take O(1).
+    Single elements are appended, inserted, removed and replaced with an update of the index; the other
+    mutators (slices, remove, sort, reverse, +=, *=) build it again.
+    """
+    __slots__ = ("positions",)
+    # maximum length of a list without the index: a dict would take more memory than all values of a short list
+    INDEX_THRESHOLD = 8
+
+    def __init__(self, elements=()):
+        super(FieldList, self).__init__(elements)
+        self.positions = None   # key -> position, only if the list is longer than INDEX_THRESHOLD
+        self.update_index()
+
+    def __reduce__(self):
+        return FieldList, (list(self),)
+
+    def update_index(self):
+        """
+        Builds the index of the positions if the list got longer than INDEX_THRESHOLD,
+        drops it if the list got short again.
+        :return: None.
+        """
+        if len(self) > self.INDEX_THRESHOLD:
+            if self.positions is None:
+                self.positions = {el.get_key(): position for position, el in enumerate(self)}
+        else:
+            self.positions = None
+
+    def rebuild_index(self):
+        self.positions = None
+        self.update_index()
+
+    def renumber(self, start: int):
+        """
+        Updates the positions of the elements starting from the given position, e.g. after an insertion.
+        :param start: first position to be updated.
+        :return: None.
+        """
+        if self.positions is not None:
+            for position in range(start, len(self)):
+                self.positions[self[position].get_key()] = position
+
+    def normalize_index(self, idx: int):
+        length = len(self)
+        if idx < -length or idx >= length:
+            raise IndexError("list index out of range")
+        return idx + length if idx < 0 else idx
+
+    def contains_key(self, key: str):
+        return self.get_position(key) is not None
+
+    def get_position(self, key: str):
+        """
+        Returns the position of the element with the given key of the value.
+        :param key: key of the value of the element (see Field.get_key).
+        :return: position of the element or None if there is no element with such value.
+        """
+        if self.positions is not None:
+            return self.positions.get(key)
+        for position, el in enumerate(self):
+            if el.get_key() == key:
+                return position
+        return None
+
+    def append(self, el: Field):
+        if self.positions is not None:
+            self.positions[el.get_key()] = len(self)
+        super(FieldList, self).append(el)
+        self.update_index()
+
+    def extend(self, elements):
+        for el in elements:
+            self.append(el)
+
+    def insert(self, idx: int, el: Field):
+        length = len(self)
+        idx = min(max(idx + length, 0) if idx < 0 else idx, length)
+        super(FieldList, self).insert(idx, el)
+        self.renumber(idx)
+        self.update_index()
+
+    def pop(self, idx=-1):
+        idx = self.normalize_index(idx)
+        el = super(FieldList, self).pop(idx)
+        if self.positions is not None:
+            del self.positions[el.get_key()]
+            self.renumber(idx)
+        self.update_index()
+        return el
+
+    def __delitem__(self, idx):
+        if isinstance(idx, slice):
+            super(FieldList, self).__delitem__(idx)
+            self.rebuild_index()
+        else:
+            self.pop(idx)
+
+    def __setitem__(self, idx, el):
+        if isinstance(idx, slice):
+            super(FieldList, self).__setitem__(idx, el)
+            self.rebuild_index()
+            return
+        idx = self.normalize_index(idx)
+        if self.positions is not None:
+            del self.positions[self[idx].get_key()]
+            self.positions[el.get_key()] = idx
+        super(FieldList, self).__setitem__(idx, el)
+
+    def __iadd__(self, elements):
+        self.extend(elements)
+        return self
+
+    def __imul__(self, n: int):
+        super(FieldList, self).__imul__(n)
+        self.rebuild_index()
+        return self
+
+    def remove(self, el: Field):
+        super(FieldList, self).remove(el)
+        self.rebuild_index()
+
+    def sort(self, *args, **kwargs):
+        super(FieldList, self).sort(*args, **kwargs)
+        self.rebuild_index()
+
+    def reverse(self):
+        super(FieldList, self).reverse()
+        self.rebuild_index()
+
+    def clear(self):
+        super(FieldList, self).clear()
+        self.positions = None
+
+
 class Record:
     """
     Class representing a single record in an address book.
+    The rendered record (see to_string) is cached until the record is changed by one of its methods.
     """
+    __slots__ = ("name", "phones", "emails", "birthday", "render_cache")
+    LINE = "----------------------------------------------------------------"
 
     def __init__(self, name: str, phone=None, email=None, birthday=None):
         self.name = Name(name)
-        self.phones = deque()
-        self.emails = deque()
+        self.phones = FieldList()   # lists instead of deques: a deque takes ~600 bytes even with one element
+        self.emails = FieldList()
         self.birthday = None
+        self.render_cache = None    # (text before the birthday, text after it, day of the countdown, birthday text)
         if phone:
             self.add_phone_number(phone)
         if email:
@@ -22,13 +163,69 @@ class Record:
         if birthday:
             self.edit_birthday(birthday)
 
+    @staticmethod
+    def from_stored_values(name: str, phones=(), emails=(), birthday=""):
+        """
+        Creates a record from values which were validated before they were stored (e.g. in a database),
+        without validating them again.
+        :param name: contact name.
+        :param phones: phone numbers.
+        :param emails: e-mails.
+        :param birthday: birthday date in the format "dd/mm" or an empty string.
+        :return: new record.
+        """
+        record = Record.__new__(Record)
+        record.name = Name.from_stored_value(name)
+        record.phones = FieldList([Phone.from_stored_value(phone) for phone in phones])
+        record.emails = FieldList([Email.from_stored_value(email) for email in emails])
+        record.birthday = Birthday.from_stored_value(birthday) if birthday else None
+        record.render_cache = None
+        return record
+
+    def copy(self):
+        """
+        Returns a copy of the record which can be changed without affecting the record itself.
+        Phone and e-mail objects are shared: the methods of the record replace them instead of changing them.
+        :return: new record.
+        """
+        record = Record.__new__(Record)
+        record.name = Name.from_stored_value(self.get_name())
+        record.phones = FieldList(self.phones)
+        record.emails = FieldList(self.emails)
+        record.birthday = Birthday.from_stored_value(self.birthday.get_value()) if self.birthday else None
+        record.render_cache = self.render_cache
+        return record
+
+    def __getstate__(self):
+        # the cached rendering is not stored
+        return None, {slot: getattr(self, slot) for slot in self.__slots__ if slot != "render_cache"}
+
+    def __setstate__(self, state):
+        """
+        Restores the record from its pickled state: either the state of a slotted object ((None, slots) pair)
+        or the __dict__ of a record stored by an older version.
+        :param state: pickled state.
+        :return: None.
+        """
+        if isinstance(state, tuple):
+            state = state[1]
+        self.render_cache = None
+        for key, value in state.items():
+            if key in ("phones", "emails") and not isinstance(value, FieldList):
+                value = FieldList(value)    # older versions stored phones and e-mails in deques
+            setattr(self, key, value)
+
+    def invalidate_rendering(self):
+        self.render_cache = None
+
     def set_name(self, new_name: str):
+        self.invalidate_rendering()
         self.name.set_value(new_name)
 
     def get_name(self):
         return self.name.get_value()
 
-    def get_all_values(self, el_list: deque):
+    def get_all_values(self, el_list: FieldList):
         """
         Returns list of values stored in a collection of Field objects.
         :param el_list: collection of Field objects.
@@ -43,6 +240,13 @@ class Record:
         '''
         return self.get_all_values(self.phones)
 
+    def get_phone_keys(self):
+        """
+        Returns the canonical keys of the stored phones (see Phone.get_key_of), e.g. to index them.
+        :return: keys as a list of strings.
+        """
+        return [phone.get_key() for phone in self.phones]
+
     def get_emails(self):
         return self.get_all_values(self.emails)
 
@@ -53,9 +257,11 @@ class Record:
             return ""
 
     def edit_name(self, new_name):
+        self.invalidate_rendering()
         self.name.set_value(new_name)
 
     def edit_birthday(self, new_birthday):
+        self.invalidate_rendering()
         if not self.birthday:
             self.birthday = Birthday(new_birthday)
         else:
@@ -63,18 +269,17 @@ class Record:
             self.birthday.set_value(new_birthday)
 
     def remove_birthday(self):
+        self.invalidate_rendering()
         self.birthday = None
 
-    def is_in_list(self, el: Field, el_list: deque):
-        el_value = el.get_value()
-        list_values = self.get_all_values(el_list)
-        return el_value in list_values
+    def is_in_list(self, el: Field, el_list: FieldList):
+        return el_list.contains_key(el.get_key())
 
-    def add_field_element(self, el_list: deque, el: Field, idx=None, add_to_beginning=False):
+    def add_field_element(self, el_list: FieldList, el: Field, idx=None, add_to_beginning=False):
         """
          Adds element 'el' to the list 'el_list'.
          Raises an exception if the element is already in the list or the adding is not possible.
-         :param el_list: list to which the new element has to be added, e.g. self.phones or self.emails
+         :param el_list: FieldList to which the new element has to be added, e.g. self.phones or self.emails
          :param el: new element which has to be added to el_list
          :param idx: index of the position to insert the new element.
                      Must be None, integer or another type convertible to integer.
@@ -84,7 +289,7 @@ class Record:
                                  If 'idx' is provided, add_to_beginning will be ignored
          :return: None
          """
-
+        self.invalidate_rendering()
         if self.is_in_list(el, el_list):
             raise MyException(f"{el.get_name().title()} '{el.get_value()}' is already present.")
         elif idx:
@@ -100,7 +305,7 @@ class Record:
             except:
                 raise MyException(f"Provided index '{idx+1}' is out of range.")
         elif add_to_beginning:
-            el_list.appendleft(el)
+            el_list.insert(0, el)
         else:
             el_list.append(el)
 
@@ -114,11 +319,12 @@ class Record:
         self.add_field_element(el_list=self.emails,
                                el=email, idx=idx, add_to_beginning=add_to_beginning)
 
-    def remove_field_element(self, el_list: deque, el=None, idx=None, first=False, last=False):
+    def remove_field_element(self, el_list: FieldList, el_name: str, el=None, idx=None, first=False, last=False):
         """
         Removes an element from the list 'el_list'.
         Raises an exception if the list is empty the element is not in the list or the specified index is out of range.
-        :param el_list: list from which the specified element has to be removed, e.g. self.phones or self.emails
+        :param el_list: FieldList from which the specified element has to be removed, e.g. self.phones or self.emails
+        :param el_name: name of the type of the elements for the messages, e.g. Phone.name.
         :param el: specific element which has to be removed.
                     If provided, this element will be sought for and removed if found. Other parameters will be ignored.
                     If None, further parameters will be considered.
@@ -131,11 +337,10 @@ class Record:
                      If 'el', 'idx' or 'first' is provided, this parameter will be ignored.
         :return: None.
         """
+        self.invalidate_rendering()
         if el:
-            el_value = el.get_value()
-            cur_values2ids = {element.get_value(): position for position, element in enumerate(el_list)}
-            if el_value in cur_values2ids:
-                idx = cur_values2ids[el_value]
+            idx = el_list.get_position(el.get_key())
+            if idx is not None:
                 del el_list[idx]
             else:
                 raise MyException(f"{el.get_name()} '{el.get_value()}' cannot be deleted: it is not in the list.")
@@ -151,36 +356,36 @@ class Record:
                 raise MyException(f"Provided index '{idx}' is out of range.")
         elif first:
             try:
-                el_list.popleft()
+                el_list.pop(0)
             except IndexError:
-                raise MyException(f"First {el.get_name()} can't be removed: the list is empty.")
+                raise MyException(f"First {el_name} can't be removed: the list is empty.")
         elif last:
             try:
                 el_list.pop()
             except IndexError:
-                raise MyException(f"Last {el.get_name()} can't be removed: the list is empty.")
+                raise MyException(f"Last {el_name} can't be removed: the list is empty.")
         else:
-            raise MyException(f"Please specify the {el.get_name()} which has to be removed.")
+            raise MyException(f"Please specify the {el_name} which has to be removed.")
 
     def remove_phone_number(self, cur_value="", idx=None, first=False, last=False):
         if cur_value:
             phone = Phone(cur_value)
         else:
             phone = None
-        self.remove_field_element(el_list=self.phones, el=phone, idx=idx, first=first, last=last)
+        self.remove_field_element(el_list=self.phones, el_name=Phone.name, el=phone, idx=idx, first=first, last=last)
 
     def remove_email(self, cur_value="", idx=None, first=False, last=False):
         if cur_value:
             email = Email(cur_value)
         else:
             email = None
-        self.remove_field_element(el_list=self.emails, el=email, idx=idx, first=first, last=last)
+        self.remove_field_element(el_list=self.emails, el_name=Email.name, el=email, idx=idx, first=first, last=last)
 
-    def edit_field_element(self, el_list: deque, new_el: Field, old_el=None, idx=None, first=False, last=False):
+    def edit_field_element(self, el_list: FieldList, new_el: Field, old_el=None, idx=None, first=False, last=False):
         """
         Edits an element in the list 'el_list'.
         Raises an exception if the list is empty, the element is not in the list or the specified index is out of range.
-        :param el_list: list in which the specified element has to be edited, e.g. self.phones or self.emails
+        :param el_list: FieldList in which the specified element has to be edited, e.g. self.phones or self.emails
         :param new_el: new value for the element which has to be edited.
         :param old_el: specific element which has to be edited.
                     If provided, this element will be sought for and edited if found. Other parameters will be ignored.
@@ -194,13 +399,12 @@ class Record:
                      If 'old_el', 'idx' or 'first' is provided, this parameter will be ignored.
         :return: None.
         """
+        self.invalidate_rendering()
         if self.is_in_list(new_el, el_list):
             raise MyException(f"{new_el.get_name().title()} '{new_el.get_value()}' is already present.")
         if old_el:
-            el_value = old_el.get_value()
-            cur_values2ids = {element.get_value(): position for position, element in enumerate(el_list)}
-            if el_value in cur_values2ids:
-                idx = cur_values2ids[el_value]
+            idx = el_list.get_position(old_el.get_key())
+            if idx is not None:
                 el_list[idx] = new_el
             else:
                 raise MyException(f"{old_el.get_name()} '{old_el.get_value()}' cannot be edited: it is not in the list.")
@@ -218,14 +422,14 @@ class Record:
             try:
                 el_list[0] = new_el
             except IndexError:
-                raise MyException(f"First {old_el.get_name()} can't be edited: the list is empty.")
+                raise MyException(f"First {new_el.get_name()} can't be edited: the list is empty.")
         elif last:
             try:
                 el_list[-1] = new_el
             except IndexError:
-                raise MyException(f"Last {old_el.get_name()} can't be edited: the list is empty.")
+                raise MyException(f"Last {new_el.get_name()} can't be edited: the list is empty.")
         else:
-            raise MyException(f"Please specify the {old_el.get_name()} which has to be edited.")
+            raise MyException(f"Please specify the {new_el.get_name()} which has to be edited.")
 
     def edit_phone_number(self, new_value: str, cur_value="", idx=None, first=False, last=False):
         new_el = Phone(new_value)
@@ -243,39 +447,29 @@ class Record:
             old_el = None
         self.edit_field_element(el_list=self.emails, new_el=new_el, old_el=old_el, idx=idx, first=first, last=last)
 
-    def days_to_birthday(self):
+    def days_to_birthday(self, today=None):
+        """
+        Returns the number of days till the birthday of the contact.
+        :param today: context of the current date (Today), shared by many records. By default, the current one.
+        :return: number of days or a message if the birthday is unknown.
+        """
         if not self.birthday:
             return "unknown (no information about birthday)"
-        cur_date = datetime.now().replace(minute=0, hour=0, second=0, microsecond=0)
-        cur_year = cur_date.year
-        birthday_day, birthday_month = self.birthday.get_value().split("/")
-        birthday_day = int(birthday_day)
-        birthday_month = int(birthday_month)
-        if birthday_month > cur_date.month or (birthday_month == cur_date.month and birthday_day >= cur_date.day):
-            birthday_year = cur_year
-        else:
-            birthday_year = cur_year + 1
-        try:
-            birthday_date = datetime(day=birthday_day, month=birthday_month, year=birthday_year)
-        except ValueError:
-            if birthday_day == 29 and birthday_month == 2:
-                birthday_date = datetime(day=1, month=3, year=birthday_year)
-            else:
-                raise MyException(f"Unknown problem with the birthday date ('{self.get_birthday()}') of the contact '{self.get_name()}, days till birthday cannot be calculated.")
+        return self.birthday.days_until_birthday(today)
 
-        delta_time = birthday_date - cur_date
-        return delta_time.days
-
-    def display_birthday_info(self):
+    def display_birthday_info(self, today=None):
         if self.birthday is None:
             return ""
         else:
-            days_till_birthday = self.days_to_birthday()
+            days_till_birthday = self.days_to_birthday(today)
             days = "days" if days_till_birthday != 1 else "day"
             return f"{self.birthday.get_value()} ({days_till_birthday} {days} till birthday)"
 
-    def to_string(self):
-
+    def render(self):
+        """
+        Renders the parts of the record which do not depend on the current date.
+        :return: pair (text before the birthday info, text after it).
+        """
         if len(self.phones) == 1:
             phones = [self.phones[0].get_value()]
         else:
@@ -284,12 +478,28 @@ class Record:
             emails = [self.emails[0].get_value()]
         else:
             emails = [f"{position + 1}. {email.get_value()}" for position, email in enumerate(self.emails)]
-        line = "----------------------------------------------------------------"
+        line = Record.LINE
         phones = "\n\t\t\t".join(phones)
         emails = "\n\t\t\t".join(emails)
-        birthday = self.display_birthday_info()
-        res = f"CONTACT INFO\nNAME:\t\t{self.get_name()}\n{line}\nBIRTHDAY:\t{birthday}\n{line}\nPHONE(S):\t{phones}\n{line}\nEMAIL(S):\t{emails}"
-        return res
+        return f"CONTACT INFO\nNAME:\t\t{self.get_name()}\n{line}\nBIRTHDAY:\t", \
+            f"\n{line}\nPHONE(S):\t{phones}\n{line}\nEMAIL(S):\t{emails}"
+
+    def to_string(self, today=None):
+        """
+        Returns the rendered record. The rendering is cached: the record is rendered again only after it was changed,
+        the countdown till the birthday - only when the date changes.
+        :param today: context of the current date (Today), shared by many records. By default, the current one.
+        :return: string with the record.
+        """
+        if today is None:
+            today = Today.get()
+        cache = self.render_cache
+        if cache is None:
+            head, tail = self.render()
+            cache = self.render_cache = (head, tail, today.ordinal, self.display_birthday_info(today))
+        elif cache[2] != today.ordinal:
+            cache = self.render_cache = (cache[0], cache[1], today.ordinal, self.display_birthday_info(today))
+        return cache[0] + cache[3] + cache[1]
 
 
 if __name__ == "__main__":
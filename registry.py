@@ -0,0 +1,109 @@
+"""
+Registry of the address books of many users.
+
+Address books are opened lazily, when they are requested for the first time, and the most recently used ones
+are kept in memory, so switching between users does not read the files again. The number of open address books
+is bounded: when it is exceeded, the least recently used address book is saved (if it was changed) and closed.
+"""
+from collections import OrderedDict
+from addressbook import *
+from storage import *
+
+
+class BookRegistry:
+    """
+    This class keeps a bounded LRU cache of open address books, keyed by the username.
+    """
+
+    def __init__(self, path="users", capacity=16, autosave_interval=None, autosave_changes=None):
+        """
+        :param path: folder with the stored address books.
+        :param capacity: maximum number of address books kept in memory.
+        :param autosave_interval: if given, the open address books are saved from a background thread
+                    at least every <autosave_interval> seconds (see AddressBook.enable_autosave).
+        :param autosave_changes: if given, the open address books are saved from a background thread
+                    after <autosave_changes> changes.
+        """
+        if capacity < 1:
+            raise MyException("At least one address book has to be kept in memory.")
+        self.path = path
+        self.capacity = capacity
+        self.autosave_interval = autosave_interval
+        self.autosave_changes = autosave_changes
+        self.books = OrderedDict()  # username -> AddressBook, from the least to the most recently used
+
+    def __len__(self):
+        return len(self.books)
+
+    def __contains__(self, username):
+        return username in self.books
+
+    def is_registered(self, addressbook: AddressBook):
+        return any(book is addressbook for book in self.books.values())
+
+    def open(self, username: str):
+        """
+        Returns the address book of the user: from memory if it is open, otherwise from the stored file.
+        The database is preferred over the snapshot, the snapshot - over the pickle file.
+        :param username: username whose address book is requested.
+        :return: address book.
+        """
+        addressbook = self.books.get(username)
+        if addressbook is not None:
+            self.books.move_to_end(username)
+            return addressbook
+        for storage in (SQLiteStorage(self.path, username), SnapshotStorage(self.path, username),
+                        PickleStorage(self.path, username)):
+            if storage.exists():
+                addressbook = storage.open()
+                break
+        else:
+            raise MyException(f"No address book stored for the user '{username}'")
+        self.books[username] = addressbook
+        self.start_autosave(addressbook)
+        self.evict()
+        return addressbook
+
+    def add(self, addressbook: AddressBook):
+        """
+        Registers an address book which was just stored, e.g. a new one or one moved into another storage.
+        The address book replaces the one registered for the same user (without saving the replaced one,
+        whose file was overwritten) and the entry of the same object under its previous username.
+        :param addressbook: address book.
+        :return: None.
+        """
+        for username, book in list(self.books.items()):
+            if book is addressbook:
+                del self.books[username]
+        replaced = self.books.pop(addressbook.get_username(), None)
+        if replaced is not None:
+            replaced.close()
+        self.books[addressbook.get_username()] = addressbook
+        self.start_autosave(addressbook)
+        self.evict()
+
+    def start_autosave(self, addressbook: AddressBook):
+        if (self.autosave_interval or self.autosave_changes) and addressbook.autosave is None:
+            addressbook.enable_autosave(self.path, self.autosave_interval, self.autosave_changes)
+
+    def evict(self):
+        """
+        Saves and closes the least recently used address books while there are more of them than the capacity.
+        :return: None.
+        """
+        while len(self.books) > self.capacity:
+            _, addressbook = self.books.popitem(last=False)
+            self.release(addressbook)
+
+    def release(self, addressbook: AddressBook):
+        addressbook.flush(self.path)
+        addressbook.close()
+
+    def close_all(self):
+        """
+        Saves and closes all open address books.
+        :return: None.
+        """
+        while self.books:
+            _, addressbook = self.books.popitem(last=False)
+            self.release(addressbook)
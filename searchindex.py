@@ -0,0 +1,348 @@
+"""
+These classes are required to search for records in the address book by a part of a name, phone number or e-mail
+and to list the records sorted by the contact name.
+"""
+from bisect import bisect_left, bisect_right
+
+
+class SubstringIndex:
+    """
+    This class represents a trigram index which maps fragments of values (names, phone numbers, e-mails)
+    to the contact names of the records containing them. The search is case-insensitive.
+
+    Each value is padded with two end markers, so that every position of the value starts a trigram.
+    Fragments of 3 or more characters are found by intersecting the sets of values of their trigrams,
+    shorter fragments - by joining the sets of values of all trigrams which start with the fragment.
+    """
+    END = "\0"
+
+    def __init__(self):
+        self.grams = {}     # trigram -> set of indexed values containing it
+        self.prefixes = {}  # first one or two characters of a trigram -> set of such trigrams
+        self.values = {}    # indexed value -> {contact name: number of fields of the record with this value}
+
+    @staticmethod
+    def get_grams(value: str):
+        """
+        Splits the value into trigrams.
+        :param value: value in lower case.
+        :return: set of trigrams.
+        """
+        padded = value + SubstringIndex.END * 2
+        return {padded[i:i + 3] for i in range(len(value))}
+
+    def add(self, value: str, name: str):
+        """
+        Registers the value of a record in the index.
+        :param value: indexed value (name, phone number or e-mail).
+        :param name: contact name of the record containing the value.
+        :return: None.
+        """
+        value = value.lower()
+        if not value:
+            return
+        names = self.values.get(value)
+        if names is None:
+            self.values[value] = {name: 1}
+            for gram in self.get_grams(value):
+                if gram not in self.grams:
+                    self.grams[gram] = set()
+                    for prefix in (gram[:1], gram[:2]):
+                        self.prefixes.setdefault(prefix, set()).add(gram)
+                self.grams[gram].add(value)
+        else:
+            names[name] = names.get(name, 0) + 1
+
+    def remove(self, value: str, name: str):
+        """
+        Removes the value of a record from the index.
+        :param value: indexed value (name, phone number or e-mail).
+        :param name: contact name of the record which contained the value.
+        :return: None.
+        """
+        value = value.lower()
+        names = self.values.get(value)
+        if names is None or name not in names:
+            return
+        names[name] -= 1
+        if names[name] > 0:
+            return
+        del names[name]
+        if names:
+            return
+        del self.values[value]
+        for gram in self.get_grams(value):
+            values = self.grams[gram]
+            values.discard(value)
+            if not values:
+                del self.grams[gram]
+                for prefix in (gram[:1], gram[:2]):
+                    grams = self.prefixes[prefix]
+                    grams.discard(gram)
+                    if not grams:
+                        del self.prefixes[prefix]
+
+    def find(self, fragment: str):
+        """
+        Finds the contact names of the records with values containing the fragment.
+        :param fragment: part of a name, phone number or e-mail.
+        :return: set of contact names.
+        """
+        fragment = fragment.lower()
+        if not fragment:
+            return set()
+        if len(fragment) < 3:
+            values = set()
+            for gram in self.prefixes.get(fragment, ()):
+                values.update(self.grams[gram])
+        else:
+            grams = sorted((self.grams.get(fragment[i:i + 3], set()) for i in range(len(fragment) - 2)), key=len)
+            values = set(value for value in grams[0] if fragment in value)
+        res = set()
+        for value in values:
+            res.update(self.values[value])
+        return res
+
+
+class SortedNameIndex:
+    """
+    This class represents the contact names of the address book in sorted order, for range queries
+    and alphabetical pagination. The names are compared as strings (case-sensitive, like in the database).
+
+    The names are kept in sorted chunks of bounded size together with the list of the last name of every chunk,
+    so adding or removing a name shifts the names of one chunk instead of all names.
+    """
+    CHUNK_SIZE = 1000   # a chunk is split in two when it grows to twice this size
+
+    def __init__(self, names=()):
+        names = sorted(set(names))
+        self.chunks = [names[i:i + self.CHUNK_SIZE] for i in range(0, len(names), self.CHUNK_SIZE)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]   # last name of every chunk
+        self.size = len(names)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, name):
+        i = bisect_left(self.maxes, name)
+        return i < len(self.maxes) and self.chunks[i][bisect_left(self.chunks[i], name)] == name
+
+    def add(self, name: str):
+        """
+        Registers a contact name in the index (nothing happens if it is already there).
+        :param name: contact name.
+        :return: None.
+        """
+        if not self.chunks:
+            self.chunks.append([name])
+            self.maxes.append(name)
+            self.size += 1
+            return
+        i = min(bisect_left(self.maxes, name), len(self.maxes) - 1)
+        chunk = self.chunks[i]
+        position = bisect_left(chunk, name)
+        if position < len(chunk) and chunk[position] == name:
+            return
+        chunk.insert(position, name)
+        self.maxes[i] = chunk[-1]
+        self.size += 1
+        if len(chunk) >= 2 * self.CHUNK_SIZE:
+            self.chunks[i:i + 1] = [chunk[:self.CHUNK_SIZE], chunk[self.CHUNK_SIZE:]]
+            self.maxes[i:i + 1] = [chunk[self.CHUNK_SIZE - 1], chunk[-1]]
+
+    def remove(self, name: str):
+        """
+        Removes a contact name from the index (nothing happens if it is not there).
+        :param name: contact name.
+        :return: None.
+        """
+        i = bisect_left(self.maxes, name)
+        if i == len(self.maxes):
+            return
+        chunk = self.chunks[i]
+        position = bisect_left(chunk, name)
+        if chunk[position] != name:
+            return
+        del chunk[position]
+        self.size -= 1
+        if chunk:
+            self.maxes[i] = chunk[-1]
+        else:
+            del self.chunks[i]
+            del self.maxes[i]
+
+    def rank(self, name: str, inclusive=False):
+        """
+        Returns the number of the names which come before the given name in sorted order.
+        :param name: name (it does not have to be in the index).
+        :param inclusive: if True, the name itself is counted as well.
+        :return: number of names.
+        """
+        find = bisect_right if inclusive else bisect_left
+        i = find(self.maxes, name)
+        res = sum(len(chunk) for chunk in self.chunks[:i])
+        if i < len(self.chunks):
+            res += find(self.chunks[i], name)
+        return res
+
+    def range(self, start=None, stop=None, after=None, limit=None):
+        """
+        Returns the contact names within a range in sorted order.
+        :param start: first name of the range (inclusive). If None, the range starts with the first name.
+        :param stop: end of the range (exclusive). If None, the range ends with the last name.
+        :param after: cursor: only the names after it are returned, e.g. the last name of the previous page.
+        :param limit: maximum number of names. If None, all names within the range are returned.
+        :return: list of names.
+        """
+        if after is not None and (start is None or after >= start):
+            i = bisect_right(self.maxes, after)
+            position = bisect_right(self.chunks[i], after) if i < len(self.chunks) else 0
+        elif start is not None:
+            i = bisect_left(self.maxes, start)
+            position = bisect_left(self.chunks[i], start) if i < len(self.chunks) else 0
+        else:
+            i = position = 0
+        res = []
+        while i < len(self.chunks) and (limit is None or len(res) < limit):
+            chunk = self.chunks[i]
+            end = len(chunk) if limit is None else min(len(chunk), position + limit - len(res))
+            if stop is not None and chunk[end - 1] >= stop:
+                res.extend(chunk[position:bisect_left(chunk, stop, position, end)])
+                break
+            res.extend(chunk[position:end])
+            i += 1
+            position = 0
+        return res
+
+
+class FuzzyNameIndex:
+    """
+    This class represents a symmetric-delete index for finding contact names with typos (case-insensitive).
+
+    Every name is registered under all strings obtained by deleting up to max_distance characters from its prefix.
+    A query generates the same deletions of its own prefix: the names within the edit distance are registered
+    under at least one of them, so only these candidates are checked with the exact distance.
+    Only the first prefix_length characters are used for the deletions, which bounds the size of the index.
+    """
+
+    def __init__(self, names=(), max_distance=2, prefix_length=6):
+        """
+        :param names: contact names to be indexed.
+        :param max_distance: maximum edit distance supported by the index.
+        :param prefix_length: number of the first characters of the names used for the deletions.
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.names = {}     # name in lower case -> set of contact names
+        self.deletes = {}   # prefix with deleted characters -> name in lower case (or a list of them if there are many)
+        for name in names:
+            self.add(name)
+
+    def get_deletes(self, key: str, max_distance: int):
+        """
+        Returns the strings obtained by deleting up to max_distance characters from the prefix of the key.
+        :param key: name in lower case.
+        :param max_distance: maximum number of deleted characters.
+        :return: set of strings (including the prefix itself).
+        """
+        level = {key[:self.prefix_length]}
+        res = set(level)
+        for _ in range(max_distance):
+            level = {value[:i] + value[i + 1:] for value in level for i in range(len(value))}
+            res.update(level)
+        return res
+
+    def add(self, name: str):
+        """
+        Registers a contact name in the index.
+        :param name: contact name.
+        :return: None.
+        """
+        key = name.lower()
+        names = self.names.get(key)
+        if names is not None:
+            names.add(name)
+            return
+        self.names[key] = {name}
+        for value in self.get_deletes(key, self.max_distance):
+            keys = self.deletes.get(value)
+            if keys is None:
+                self.deletes[value] = key
+            elif isinstance(keys, str):
+                self.deletes[value] = [keys, key]
+            else:
+                keys.append(key)
+
+    def remove(self, name: str):
+        """
+        Removes a contact name from the index.
+        :param name: contact name.
+        :return: None.
+        """
+        key = name.lower()
+        names = self.names.get(key)
+        if names is None or name not in names:
+            return
+        names.discard(name)
+        if names:
+            return
+        del self.names[key]
+        for value in self.get_deletes(key, self.max_distance):
+            keys = self.deletes.get(value)
+            if isinstance(keys, str):
+                del self.deletes[value]
+            elif keys is not None:
+                keys.remove(key)
+                if len(keys) == 1:
+                    self.deletes[value] = keys[0]
+
+    @staticmethod
+    def distance(first: str, second: str, max_distance: int):
+        """
+        Calculates the edit distance between two strings: the number of insertions, deletions, substitutions
+        and transpositions of two adjacent characters needed to turn one string into the other.
+        :param first: first string.
+        :param second: second string.
+        :param max_distance: the calculation stops as soon as the distance exceeds this value.
+        :return: the distance, or max_distance + 1 if it is greater than max_distance.
+        """
+        if abs(len(first) - len(second)) > max_distance:
+            return max_distance + 1
+        previous_row = before_previous_row = None
+        row = list(range(len(second) + 1))
+        for i in range(1, len(first) + 1):
+            previous_row, row = row, [i] + [0] * len(second)
+            for j in range(1, len(second) + 1):
+                cost = 0 if first[i - 1] == second[j - 1] else 1
+                row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+                if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                    row[j] = min(row[j], before_previous_row[j - 2] + 1)
+            if min(row) > max_distance:
+                return max_distance + 1
+            before_previous_row = previous_row
+        return min(row[-1], max_distance + 1)
+
+    def find(self, name: str, max_distance=None):
+        """
+        Finds the contact names within the edit distance of the name (case-insensitive).
+        :param name: name to look for, possibly with typos.
+        :param max_distance: maximum edit distance, at most the one of the index. By default, the one of the index.
+        :return: list of pairs (distance, contact name), sorted from the closest names.
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        key = name.lower()
+        candidates = set()
+        for value in self.get_deletes(key, max_distance):
+            keys = self.deletes.get(value)
+            if isinstance(keys, str):
+                candidates.add(keys)
+            elif keys is not None:
+                candidates.update(keys)
+        res = []
+        for candidate in candidates:
+            distance = self.distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                res.extend((distance, contact_name) for contact_name in self.names[candidate])
+        res.sort()
+        return res
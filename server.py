@@ -0,0 +1,220 @@
+"""
+Network server which gives many clients access to one shared address book.
+
+Usage:
+    python3 server.py (--host <host>) (--port <port>) (--unix <path>) (--load <username>)
+
+Clients send the same commands as in the interactive mode, one command per line (see "help").
+Every response is framed as a header line "<STATUS> <length>" followed by <length> bytes of UTF-8 text:
+    OK      - result of the command
+    ERROR   - the command failed, the text explains why
+    PAGE    - one page of a result with several pages, send "more" to get the next one
+    BYE     - the server closes the connection (after "exit", "close" or "good bye")
+Commands which switch the address book or read and write files on the server ("load", "store", "compact",
+"import", "export", "new username", "stats dump") are not available to the clients.
+"""
+import argparse
+import asyncio
+import logging
+import warnings
+import main
+from main import call_handler, command_parcer, exit_handler, load_handler, ABIterator, MyException, MyIteratorNException
+
+MORE_COMMAND = "more"
+NO_MORE_RESULTS = "No more results found."
+INTERNAL_ERROR = "The command failed because of an internal error: {}: {}"
+NOT_AVAILABLE = "The command '{}' is not available over the network."
+
+# handlers which the clients may call, the other commands are reserved for the operator of the server
+REMOTE_COMMANDS = {main.hello_handler, main.add_handler, main.change_handler, main.find_handler, main.delete_handler,
+                   main.phone_handler, main.email_handler, main.birthday_handler, main.upcoming_handler,
+                   main.show_all_handler, main.show_sorted_handler, main.get_username_handler, main.help_handler,
+                   main.stats_handler, exit_handler}
+REMOTE_DENIED_ACTIONS = {main.stats_handler: {"dump"}}     # first arguments which are refused for a handler
+
+# the commands and the rendering of the pages run in the threads of the default executor, one at a time
+BOOK_LOCK = asyncio.Lock()
+
+
+async def send_response(writer: asyncio.StreamWriter, status: str, text: str):
+    """
+    Sends one framed response to the client.
+    :param writer: stream of the client.
+    :param status: status of the response (OK, ERROR, PAGE, BYE).
+    :param text: text of the response.
+    :return: None.
+    """
+    payload = text.encode("utf-8")
+    writer.write(f"{status} {len(payload)}\n".encode("ascii") + payload)
+    await writer.drain()
+
+
+async def read_response(reader: asyncio.StreamReader):
+    """
+    Reads one framed response from the server.
+    :param reader: stream of the server.
+    :return: pair (status, text).
+    """
+    header = await reader.readline()
+    if not header:
+        raise ConnectionError("The server closed the connection.")
+    status, length = header.decode("ascii").split()
+    payload = await reader.readexactly(int(length))
+    return status, payload.decode("utf-8")
+
+
+class PrefixedIterator:
+    """
+    Iterator over the pages of an ABIterator which prepends a text to the first page.
+    """
+
+    def __init__(self, prefix: str, iterator: ABIterator):
+        self.prefix = prefix
+        self.iterator = iterator
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        page = next(self.iterator)
+        if self.prefix:
+            page = f"{self.prefix}\n{page}"
+            self.prefix = ""
+        return page
+
+
+def execute_command(u_input: str):
+    """
+    Executes one command against the shared address book (see run_locked).
+    :param u_input: command line sent by the client.
+    :return: pair (handler or None, result: string or ABIterator).
+    """
+    with warnings.catch_warnings(record=True) as warning_list:
+        warnings.simplefilter("always")
+        func, data = command_parcer(u_input)
+        if not func:
+            raise MyException("The command is not defined. Please, use a valid command")
+        if func not in REMOTE_COMMANDS:
+            raise MyException(NOT_AVAILABLE.format(main.COMMANDS[func][0]))
+        if data and data[0].lower() in REMOTE_DENIED_ACTIONS.get(func, ()):
+            raise MyException(NOT_AVAILABLE.format(f"{main.COMMANDS[func][0]} {data[0].lower()}"))
+        result = call_handler(func, data)
+    if warning_list:
+        text = "\n".join(f"\t{w.message}" for w in warning_list)
+        if isinstance(result, ABIterator):
+            # the warnings are shown before the first page
+            result = PrefixedIterator(text, result)
+        else:
+            result = f"{text}\n{result}"
+    return func, result
+
+
+async def run_locked(function: callable, *args):
+    """
+    Runs a blocking function on the shared address book in a thread of the default executor.
+    The book lock lets one command or page run at a time, so the changes of the address book are serialised
+    while the event loop keeps serving the other clients.
+    :param function: function to run.
+    :param args: arguments for the function.
+    :return: result of the function.
+    """
+    async with BOOK_LOCK:
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+async def send_next_page(writer: asyncio.StreamWriter, pages):
+    """
+    Sends the next page of a result with several pages to the client.
+    :param writer: stream of the client.
+    :param pages: iterator over the pages of the result.
+    :return: the iterator if it can have more pages, otherwise None.
+    """
+    try:
+        page = await run_locked(next, pages, None)
+    except Exception as e:
+        logging.exception("A page of the result cannot be rendered.")
+        await send_response(writer, "ERROR", INTERNAL_ERROR.format(type(e).__name__, e))
+        return None
+    if page is None:
+        await send_response(writer, "OK", NO_MORE_RESULTS)
+        return None
+    await send_response(writer, "PAGE", page)
+    return pages
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Serves one client connection: executes its commands and streams the pages of the results on request.
+    :param reader: stream from the client.
+    :param writer: stream to the client.
+    :return: None.
+    """
+    pages = None    # iterator over the pages of the last result, if it has more than one page
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            u_input = line.decode("utf-8").strip()
+            if not u_input:
+                continue
+            if u_input.lower() == MORE_COMMAND and pages is not None:
+                pages = await send_next_page(writer, pages)
+                continue
+            pages = None
+            try:
+                func, result = await run_locked(execute_command, u_input)
+            except (MyException, MyIteratorNException) as e:
+                await send_response(writer, "ERROR", str(e).replace('"', ""))
+                continue
+            except Exception as e:
+                # the connection stays usable: the client gets the error instead of a closed connection
+                logging.exception("The command '%s' failed.", u_input)
+                await send_response(writer, "ERROR", INTERNAL_ERROR.format(type(e).__name__, e))
+                continue
+            if func == exit_handler:
+                await send_response(writer, "BYE", result)
+                break
+            if isinstance(result, (ABIterator, PrefixedIterator)):
+                pages = await send_next_page(writer, result)
+            else:
+                await send_response(writer, "OK", str(result))
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8765, unix_path=None):
+    """
+    Starts the server and serves the clients until the process is stopped.
+    :param host: host for the TCP server.
+    :param port: port for the TCP server.
+    :param unix_path: path for a Unix socket. If given, the server listens on it instead of TCP.
+    :return: None.
+    """
+    if unix_path:
+        server = await asyncio.start_unix_server(handle_client, path=unix_path)
+    else:
+        server = await asyncio.start_server(handle_client, host=host, port=port)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Address book of the user '{main.ADDRESSBOOK.get_username()}' is served on {addresses}.")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Network server for the address book.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="path to a Unix socket to listen on instead of TCP")
+    parser.add_argument("--load", metavar="USERNAME", help="load the address book of the user before serving")
+    cli_args = parser.parse_args()
+    if cli_args.load:
+        print(load_handler([cli_args.load]))
+    try:
+        asyncio.run(serve(cli_args.host, cli_args.port, cli_args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        main.REGISTRY.close_all()
@@ -0,0 +1,718 @@
+"""
+Storage backends for the address book: a pickle file with the whole address book,
+an SQLite database which is queried directly, without loading all records into memory,
+or a memory-mapped snapshot whose records are decoded only when they are accessed.
+"""
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from addressbook import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    birthday TEXT,
+    day_of_year INTEGER
+);
+CREATE INDEX IF NOT EXISTS records_birthday ON records (birthday);
+CREATE INDEX IF NOT EXISTS records_day_of_year ON records (day_of_year);
+CREATE TABLE IF NOT EXISTS phones (
+    record_id INTEGER NOT NULL REFERENCES records (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    phone TEXT NOT NULL,
+    phone_key TEXT,
+    PRIMARY KEY (record_id, position)
+);
+CREATE TABLE IF NOT EXISTS emails (
+    record_id INTEGER NOT NULL REFERENCES records (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    PRIMARY KEY (record_id, position)
+);
+CREATE INDEX IF NOT EXISTS emails_email ON emails (email);
+"""
+
+
+class SQLiteRecords(MutableMapping):
+    """
+    This class represents the records of an address book stored in an SQLite database
+    as a mapping (contact name -> record). Records are read from the database on access,
+    every assignment or deletion is written to the database at once.
+    """
+    # number of names fetched from the database at once during the iteration
+    FETCH_SIZE = 500
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def get_record_id(self, name: str):
+        row = self.connection.execute("SELECT id FROM records WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def load_record(self, record_id: int, name: str, birthday: str):
+        """
+        Creates a record from the rows stored in the database.
+        :param record_id: id of the record in the database.
+        :param name: contact name.
+        :param birthday: birthday date ("dd/mm") or None.
+        :return: record.
+        """
+        phones = self.connection.execute("SELECT phone FROM phones WHERE record_id = ? ORDER BY position",
+                                         (record_id,))
+        emails = self.connection.execute("SELECT email FROM emails WHERE record_id = ? ORDER BY position",
+                                         (record_id,))
+        return Record.from_stored_values(name, [row[0] for row in phones], [row[0] for row in emails], birthday)
+
+    def load_records(self, query: str, params=()):
+        """
+        Loads the records found by a query.
+        :param query: SQL query which returns the columns id, name, birthday of the table "records".
+        :param params: parameters of the query.
+        :return: list of records.
+        """
+        return [self.load_record(*row) for row in self.connection.execute(query, params).fetchall()]
+
+    def write_record(self, record: Record):
+        """
+        Inserts or replaces a record in the database (without committing the transaction).
+        :param record: record to be stored.
+        :return: None.
+        """
+        birthday = record.birthday.get_value() if record.birthday else None
+        day_of_year = record.birthday.get_day_of_year() if record.birthday else None
+        self.connection.execute("INSERT INTO records (name, birthday, day_of_year) VALUES (?, ?, ?) "
+                                "ON CONFLICT (name) DO UPDATE SET birthday = excluded.birthday, "
+                                "day_of_year = excluded.day_of_year",
+                                (record.get_name(), birthday, day_of_year))
+        record_id = self.get_record_id(record.get_name())
+        self.connection.execute("DELETE FROM phones WHERE record_id = ?", (record_id,))
+        self.connection.execute("DELETE FROM emails WHERE record_id = ?", (record_id,))
+        self.connection.executemany("INSERT INTO phones (record_id, position, phone, phone_key) VALUES (?, ?, ?, ?)",
+                                    ((record_id, position, phone.get_value(), phone.get_key())
+                                     for position, phone in enumerate(record.phones)))
+        self.connection.executemany("INSERT INTO emails (record_id, position, email) VALUES (?, ?, ?)",
+                                    ((record_id, position, email) for position, email in enumerate(record.get_emails())))
+
+    def __getitem__(self, name: str):
+        row = self.connection.execute("SELECT id, name, birthday FROM records WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return self.load_record(*row)
+
+    def __setitem__(self, name: str, record: Record):
+        with self.connection:
+            self.write_record(record)
+
+    def __delitem__(self, name: str):
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM records WHERE name = ?", (name,))
+        if cursor.rowcount == 0:
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        return self.connection.execute("SELECT 1 FROM records WHERE name = ?", (name,)).fetchone() is not None
+
+    def __iter__(self):
+        # names are fetched in portions, so that the records can be changed during the iteration
+        last_id = 0
+        while True:
+            rows = self.connection.execute("SELECT id, name FROM records WHERE id > ? ORDER BY id LIMIT ?",
+                                           (last_id, self.FETCH_SIZE)).fetchall()
+            if not rows:
+                return
+            for record_id, name in rows:
+                yield name
+            last_id = rows[-1][0]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+
+class SQLiteAddressBook(AddressBook):
+    """
+    Class representing the address book stored in an SQLite database.
+    Lookups and changes are performed directly in the database, the in-memory indexes are not used.
+    """
+
+    def __init__(self, filename: str, username=None):
+        """
+        Opens (or creates) the address book in an SQLite database.
+        :param filename: path to the database file.
+        :param username: name of the owner of the address book. If None, the name stored in the database is used.
+        """
+        super(SQLiteAddressBook, self).__init__()
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self.update_phone_keys()
+        self.data = SQLiteRecords(self.connection)
+        self.fuzzy_changes = 0  # total number of changes of the database when the fuzzy index was built
+        stored_username = self.connection.execute("SELECT value FROM meta WHERE key = 'username'").fetchone()
+        if username is not None or stored_username is None:
+            self.set_username(username or self.username)
+        else:
+            self.username = stored_username[0]
+
+    def __getstate__(self):
+        raise MyException("The address book stored in a database cannot be pickled, use 'export' instead.")
+
+    def update_phone_keys(self):
+        """
+        Adds the column of the phone keys (see Phone.get_key_of) to the databases created by older versions
+        and computes the keys again if they were computed with another default country code.
+        :return: None.
+        """
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(phones)")]
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'country_code'").fetchone()
+        with self.connection:
+            if "phone_key" not in columns:
+                self.connection.execute("ALTER TABLE phones ADD COLUMN phone_key TEXT")
+                row = None
+            self.connection.execute("CREATE INDEX IF NOT EXISTS phones_phone_key ON phones (phone_key)")
+            if row is None or row[0] != Phone.country_code:
+                phones = self.connection.execute("SELECT rowid, phone FROM phones").fetchall()
+                self.connection.executemany("UPDATE phones SET phone_key = ? WHERE rowid = ?",
+                                            ((Phone.get_key_of(phone), rowid) for rowid, phone in phones))
+                self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('country_code', ?)",
+                                        (Phone.country_code,))
+
+    def close(self):
+        self.connection.close()
+
+    def flush(self, path=""):
+        # every change is committed to the database at once
+        self.mark_saved()
+
+    def enable_autosave(self, path="", interval=60.0, max_changes=100):
+        pass  # every change is committed to the database at once
+
+    def set_username(self, new_name):
+        self.username = new_name
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('username', ?)", (new_name,))
+
+    def index_record(self, record: Record):
+        # the database indexes are maintained by SQLite: the record only has to be written back after a change
+        self.data[record.get_name()] = record
+
+    def unindex_record(self, record: Record):
+        pass
+
+    def rebuild_indexes(self):
+        pass
+
+    def put_record(self, record: Record):
+        if record.get_name() in self.data:
+            warnings.warn(f"WARNING: the record for the contact '{record.get_name()}' gets overwritten.")
+        self.data[record.get_name()] = record
+
+    @synchronized
+    def edit_record_name(self, old_name: str, new_name: str):
+        # renaming is one UPDATE, so that the record cannot get lost between deletion and insertion
+        if old_name not in self.data:
+            raise MyException(f"Cannot change the name of a record: the name '{old_name}' is not in the address book.")
+        with self.connection:
+            if new_name != old_name and new_name in self.data:
+                warnings.warn(f"WARNING: the record for the contact '{new_name}' gets overwritten.")
+                self.connection.execute("DELETE FROM records WHERE name = ?", (new_name,))
+            self.connection.execute("UPDATE records SET name = ? WHERE name = ?", (new_name, old_name))
+        self.log_operation(JournalOp.RENAME_RECORD, (old_name, new_name))
+        return self.data[new_name]
+
+    def commit_records(self, working: dict):
+        # all records changed in a transaction are replaced in one database transaction; changed records are
+        # updated in place (see write_record), so they keep their ids and their positions in the listings
+        with self.connection:
+            self.connection.executemany("DELETE FROM records WHERE name = ?",
+                                        ((name,) for name, record in working.items() if record is None))
+            for record in working.values():
+                if record is not None:
+                    self.data.write_record(record)
+
+    def add_records(self, records):
+        cnt = 0
+        with self.connection:
+            for record in records:
+                if record.get_name() in self.data:
+                    warnings.warn(f"WARNING: the record for the contact '{record.get_name()}' gets overwritten.")
+                self.data.write_record(record)
+                cnt += 1
+        return cnt
+
+    def get_record_by_phone(self, phone: str):
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        res = self.data.load_records("SELECT id, name, birthday FROM records WHERE id IN "
+                                     "(SELECT record_id FROM phones WHERE phone_key = ?) ORDER BY id",
+                                     (Phone.get_key_of(phone),))
+        if not res:
+            raise MyException(f"No record with the phone number '{phone}' in the address book.")
+        return res
+
+    def get_record_by_email(self, email: str):
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        res = self.data.load_records("SELECT id, name, birthday FROM records WHERE id IN "
+                                     "(SELECT record_id FROM emails WHERE email = ?) ORDER BY id", (email,))
+        if not res:
+            raise MyException(f"No record with the e-mail '{email}' in the address book.")
+        return res
+
+    def get_record_by_birthday(self, birthday: str):
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        birthday = normalize_birthday(birthday)
+        res = self.data.load_records("SELECT id, name, birthday FROM records WHERE birthday = ? ORDER BY id",
+                                     (birthday,))
+        if not res:
+            raise MyException(f"No record with the birthday date '{birthday}' in the address book.")
+        return res
+
+    def get_record_by_fragment(self, fragment: str):
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        pattern = "%" + fragment.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        res = self.data.load_records(
+            "SELECT id, name, birthday FROM records WHERE name LIKE ?1 ESCAPE '\\' "
+            "OR id IN (SELECT record_id FROM phones WHERE phone LIKE ?1 ESCAPE '\\') "
+            "OR id IN (SELECT record_id FROM emails WHERE email LIKE ?1 ESCAPE '\\') ORDER BY name", (pattern,))
+        if not res:
+            raise MyException(f"No record with a name, phone number or e-mail containing '{fragment}' in the address book.")
+        return res
+
+    def get_records_by_day_of_year(self, day_of_year: int):
+        return self.data.load_records("SELECT id, name, birthday FROM records WHERE day_of_year = ? ORDER BY id",
+                                      (day_of_year,))
+
+    def get_fuzzy_index(self):
+        # the names are not indexed on changes: the index is built again at the first search after the database changed
+        with self.lock:
+            if self.fuzzy_index is None or self.fuzzy_changes != self.connection.total_changes:
+                self.fuzzy_index = FuzzyNameIndex(self.data, self.FUZZY_MAX_DISTANCE)
+                self.fuzzy_changes = self.connection.total_changes
+            return self.fuzzy_index
+
+    def get_names_in_range(self, start=None, stop=None, after=None, limit=None):
+        # the names are sorted with the index of the UNIQUE constraint on the column "name"
+        conditions, params = [], []
+        for condition, value in (("name >= ?", start), ("name < ?", stop), ("name > ?", after)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        query = "SELECT name FROM records"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY name LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        return [row[0] for row in self.connection.execute(query, params)]
+
+    def count_names(self, start=None, stop=None, last=None):
+        conditions, params = [], []
+        for condition, value in (("name >= ?", start), ("name < ?", stop), ("name <= ?", last)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        query = "SELECT COUNT(*) FROM records"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.connection.execute(query, params).fetchone()[0]
+
+    def store_to_file(self, path="", filename=""):
+        raise MyException("The address book is stored in a database: all changes are saved automatically.")
+
+    def enable_journal(self, path="", filename=""):
+        raise MyException("The address book is stored in a database: all changes are saved automatically.")
+
+    def load_from_file(self, filename):
+        raise MyException("The address book is stored in a database, it cannot be replaced from a file.")
+
+
+class SnapshotRecords(MutableMapping):
+    """
+    This class represents the records of an address book stored in a snapshot file as a mapping
+    (contact name -> record). The file is mapped into memory: opening it reads only the header and the directory
+    (contact name -> offset of the record), a record is decoded when it is accessed.
+    Assigned records are kept in memory until they are written into the file when the snapshot is stored;
+    of the decoded records, only the DECODED_CACHE_SIZE most recently used ones are kept.
+
+    Layout of the file: header (magic bytes, offset and length of the directory), records (each: length
+    of the payload and the pickled record), directory (pickled pair of the username and the dict with the offsets).
+    """
+    MAGIC = b"ABSNAP01"
+    HEADER = struct.Struct("<8sQQ")     # magic bytes, offset of the directory, length of the directory
+    LENGTH = struct.Struct("<I")        # length of the payload of a record
+    DECODED_CACHE_SIZE = 1000           # maximum number of decoded records kept in memory
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.mmap = None
+        self.changed = {}   # contact name -> record assigned since the file was written
+        self.decoded = OrderedDict()    # contact name -> record decoded from the file, from the least recently used
+        self.lock = threading.Lock()  # guards the decoding from the file against the replacement of the file
+        self.username, self.offsets = self.open(filename)  # offsets: contact name -> offset (None: not in the file)
+
+    def open(self, filename: str):
+        """
+        Maps the snapshot file into memory and reads its directory.
+        :param filename: path to the snapshot file.
+        :return: the username and the dict (contact name -> offset of the record) stored in the file.
+        """
+        try:
+            with open(filename, "rb") as f:
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise MyException(f"Address book cannot be loaded from the file '{filename}': the file does not exist.")
+        except ValueError:  # the file is empty
+            raise MyException(f"The file '{filename}' is not an address book snapshot.")
+        if len(self.mmap) < self.HEADER.size:
+            self.close()
+            raise MyException(f"The file '{filename}' is not an address book snapshot.")
+        magic, directory_offset, directory_length = self.HEADER.unpack_from(self.mmap)
+        if magic != self.MAGIC or directory_offset + directory_length > len(self.mmap):
+            self.close()
+            raise MyException(f"The file '{filename}' is not an address book snapshot.")
+        return pickle.loads(self.mmap[directory_offset:directory_offset + directory_length])
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+    @classmethod
+    def write(cls, filename: str, username: str, payloads):
+        """
+        Writes a snapshot file and forces it to the disk.
+        :param filename: path to the file.
+        :param username: name of the owner of the address book.
+        :param payloads: iterable with pairs (contact name, pickled record).
+        :return: None.
+        """
+        offsets = {}
+        with open(filename, "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, 0, 0))
+            position = cls.HEADER.size
+            for name, payload in payloads:
+                offsets[name] = position
+                f.write(cls.LENGTH.pack(len(payload)))
+                f.write(payload)
+                position += cls.LENGTH.size + len(payload)
+            directory = pickle.dumps((username, offsets), pickle.HIGHEST_PROTOCOL)
+            f.write(directory)
+            f.seek(0)
+            f.write(cls.HEADER.pack(cls.MAGIC, position, len(directory)))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iterate_payloads(self):
+        """
+        Generates the pickled records for a new snapshot. Records which were not changed are copied from the file
+        without encoding them again.
+        :return: generator of pairs (contact name, pickled record).
+        """
+        for name, offset in self.offsets.items():
+            record = self.changed.get(name)
+            if record is not None:
+                yield name, pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+            else:
+                (length,) = self.LENGTH.unpack_from(self.mmap, offset)
+                yield name, self.mmap[offset + self.LENGTH.size:offset + self.LENGTH.size + length]
+
+    def replace_file(self, new_filename: str, filename: str):
+        """
+        Moves a new snapshot (see write) to its place and maps it instead of the current file.
+        :param new_filename: path to the new snapshot, e.g. a temporary file.
+        :param filename: final path to the new snapshot.
+        :return: None.
+        """
+        with self.lock:
+            self.close()    # a mapped file cannot be replaced on every platform
+            try:
+                os.replace(new_filename, filename)
+            except OSError:
+                self.open(self.filename)    # the old file is unchanged: the offsets stay valid
+                raise
+            self.filename = filename
+            _, self.offsets = self.open(filename)
+            self.changed.clear()    # the changed records are in the new file now
+
+    def __getitem__(self, name: str):
+        record = self.changed.get(name)
+        if record is not None:
+            return record
+        with self.lock:
+            record = self.decoded.get(name)
+            if record is not None:
+                self.decoded.move_to_end(name)
+                return record
+            offset = self.offsets[name]
+            (length,) = self.LENGTH.unpack_from(self.mmap, offset)
+            start = offset + self.LENGTH.size
+            record = pickle.loads(self.mmap[start:start + length])
+            self.decoded[name] = record
+            if len(self.decoded) > self.DECODED_CACHE_SIZE:
+                self.decoded.popitem(last=False)
+        return record
+
+    def __setitem__(self, name: str, record: Record):
+        if name not in self.offsets:
+            self.offsets[name] = None
+        self.changed[name] = record
+        with self.lock:
+            self.decoded.pop(name, None)
+
+    def __delitem__(self, name: str):
+        del self.offsets[name]
+        self.changed.pop(name, None)
+        with self.lock:
+            self.decoded.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+class SnapshotAddressBook(AddressBook):
+    """
+    Class representing the address book stored in a memory-mapped snapshot (see SnapshotRecords).
+    Opening the address book does not decode the records, the indexes are built at the first search which needs them
+    (the indexes of the contact names - without decoding the records).
+    """
+
+    def __init__(self, filename: str, username=None):
+        """
+        Opens the address book stored in a snapshot file.
+        :param filename: path to the snapshot file.
+        :param username: name of the owner of the address book. If None, the name stored in the file is used.
+        """
+        super(SnapshotAddressBook, self).__init__()
+        self.filename = filename
+        self.data = SnapshotRecords(filename)
+        self.username = username or self.data.username
+        self.indexed = False    # True when the indexes are built
+        self.names_indexed = False  # True when the sorted name index is built (it is built alone if possible)
+
+    def __getstate__(self):
+        raise MyException("The address book stored in a snapshot cannot be pickled, use 'export' instead.")
+
+    def close(self):
+        super(SnapshotAddressBook, self).close()
+        self.data.close()
+
+    def ensure_indexes(self):
+        with self.lock:
+            if not self.indexed:
+                self.indexed = self.names_indexed = True
+                fuzzy_index = self.fuzzy_index  # it is kept up to date, there is no need to build it again
+                super(SnapshotAddressBook, self).rebuild_indexes()
+                self.fuzzy_index = fuzzy_index
+
+    def ensure_name_index(self):
+        with self.lock:
+            if not self.names_indexed:
+                self.names_indexed = True
+                self.name_index = SortedNameIndex(self.data)
+
+    def index_name(self, name: str):
+        if self.names_indexed:
+            self.name_index.add(name)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.add(name)
+
+    def unindex_name(self, name: str):
+        if self.names_indexed:
+            self.name_index.remove(name)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.remove(name)
+
+    def index_record(self, record: Record):
+        # changes made before the indexes are built need no bookkeeping: the indexes are built from the records
+        if self.indexed:
+            super(SnapshotAddressBook, self).index_record(record)
+        else:
+            self.index_name(record.get_name())
+
+    def unindex_record(self, record: Record):
+        if self.indexed:
+            super(SnapshotAddressBook, self).unindex_record(record)
+        else:
+            self.unindex_name(record.get_name())
+
+    def reindex_record(self, old_record: Record, new_record: Record):
+        if self.indexed:
+            super(SnapshotAddressBook, self).reindex_record(old_record, new_record)
+
+    def rebuild_indexes(self):
+        self.indexed = self.names_indexed = False
+        self.fuzzy_index = None
+
+    def get_record_by_phone(self, phone: str):
+        self.ensure_indexes()
+        return super(SnapshotAddressBook, self).get_record_by_phone(phone)
+
+    def get_record_by_email(self, email: str):
+        self.ensure_indexes()
+        return super(SnapshotAddressBook, self).get_record_by_email(email)
+
+    def get_record_by_birthday(self, birthday: str):
+        self.ensure_indexes()
+        return super(SnapshotAddressBook, self).get_record_by_birthday(birthday)
+
+    def get_record_by_fragment(self, fragment: str):
+        self.ensure_indexes()
+        return super(SnapshotAddressBook, self).get_record_by_fragment(fragment)
+
+    def get_records_by_day_of_year(self, day_of_year: int):
+        self.ensure_indexes()
+        return super(SnapshotAddressBook, self).get_records_by_day_of_year(day_of_year)
+
+    def get_names_in_range(self, start=None, stop=None, after=None, limit=None):
+        self.ensure_name_index()
+        return super(SnapshotAddressBook, self).get_names_in_range(start, stop, after, limit)
+
+    def count_names(self, start=None, stop=None, last=None):
+        self.ensure_name_index()
+        return super(SnapshotAddressBook, self).count_names(start, stop, last)
+
+    def get_snapshot_filename(self, path="", filename=""):
+        return os.path.join(path, (filename or self.username) + SnapshotStorage.extension)
+
+    @synchronized
+    def store_to_file(self, path="", filename=""):
+        """
+        Stores the address book as a new snapshot and maps it instead of the current file.
+        Records which were not changed are copied into the new snapshot as they are.
+        :param path: folder for the snapshot.
+        :param filename: name of the snapshot file without the extension. By default, the username is used.
+        :return: None.
+        """
+        filename = self.get_snapshot_filename(path, filename)
+        tmp_filename = filename + ".tmp"
+        SnapshotRecords.write(tmp_filename, self.username, self.data.iterate_payloads())
+        self.data.replace_file(tmp_filename, filename)
+        self.filename = filename
+        self.mark_saved()
+
+    def enable_journal(self, path="", filename=""):
+        raise MyException("The address book is stored in a snapshot: the changes are saved with 'store'.")
+
+    def load_from_file(self, filename):
+        raise MyException("The address book is stored in a snapshot, it cannot be replaced from a file.")
+
+
+class Storage:
+    """
+    Base class of the storage backends: each backend stores the address book of one user in one file.
+    """
+    extension = ""
+
+    def __init__(self, path: str, username: str):
+        self.path = path
+        self.username = username
+
+    def get_filename(self):
+        return os.path.join(self.path, self.username + self.extension)
+
+    def exists(self):
+        return os.path.exists(self.get_filename())
+
+    def open(self) -> AddressBook:
+        """
+        Opens the stored address book.
+        :return: address book.
+        """
+        raise NotImplementedError
+
+    def save(self, addressbook: AddressBook) -> AddressBook:
+        """
+        Stores the address book.
+        :param addressbook: address book to be stored.
+        :return: the address book which has to be used for further changes.
+        """
+        raise NotImplementedError
+
+
+class PickleStorage(Storage):
+    """
+    Stores the whole address book in a pickle file (optionally with a journal of changes, see AddressBook).
+    """
+    extension = ".bin"
+
+    def open(self):
+        addressbook = AddressBook()
+        addressbook.load_from_file(self.get_filename())
+        return addressbook
+
+    def save(self, addressbook: AddressBook):
+        if isinstance(addressbook, (SQLiteAddressBook, SnapshotAddressBook)):
+            copy = AddressBook(self.username)
+            copy.add_records(addressbook.data.values())
+            addressbook = copy
+        addressbook.store_to_file(self.path, self.username)
+        return addressbook
+
+
+class SQLiteStorage(Storage):
+    """
+    Stores the address book in an SQLite database which is queried directly.
+    """
+    extension = ".db"
+
+    def open(self):
+        if not self.exists():
+            raise MyException(f"Address book cannot be loaded from the file '{self.get_filename()}': "
+                              f"the file does not exist.")
+        return SQLiteAddressBook(self.get_filename())
+
+    def save(self, addressbook: AddressBook):
+        if isinstance(addressbook, SQLiteAddressBook) and \
+                os.path.abspath(addressbook.filename) == os.path.abspath(self.get_filename()):
+            return addressbook
+        filename = self.get_filename()
+        if os.path.exists(filename):
+            os.remove(filename)
+        database = SQLiteAddressBook(filename, self.username)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            database.add_records(addressbook.data.values())
+        return database
+
+
+class SnapshotStorage(Storage):
+    """
+    Stores the address book in a memory-mapped snapshot whose records are decoded lazily (see SnapshotRecords).
+    """
+    extension = ".snap"
+
+    def open(self):
+        return SnapshotAddressBook(self.get_filename())
+
+    def save(self, addressbook: AddressBook):
+        if isinstance(addressbook, SnapshotAddressBook):
+            addressbook.store_to_file(self.path, self.username)
+            return addressbook
+        filename = self.get_filename()
+        tmp_filename = filename + ".tmp"
+        SnapshotRecords.write(tmp_filename, self.username,
+                              ((name, pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+                               for name, record in addressbook.data.items()))
+        os.replace(tmp_filename, filename)
+        return SnapshotAddressBook(filename)
+
+
+STORAGES = {"pickle": PickleStorage, "sqlite": SQLiteStorage, "snapshot": SnapshotStorage}
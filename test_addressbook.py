@@ -0,0 +1,72 @@
+import re
+from calendar import isleap
+from datetime import date
+import pytest
+from storage import *
+
+
+def make_addressbook(kind: str, tmp_path, names):
+    if kind == "sqlite":
+        addressbook = SQLiteAddressBook(str(tmp_path / "test.db"), "test")
+    else:
+        addressbook = AddressBook("test")
+    addressbook.add_records(Record(name) for name in names)
+    return addressbook
+
+
+def get_numbers(page: str):
+    return [int(number) for number in re.findall(r"^(\d+)\. CONTACT INFO", page, re.MULTILINE)]
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_resumed_sorted_listing_continues_the_numbering(kind, tmp_path):
+    names = [f"Name{i:02d}" for i in range(25)]
+    addressbook = make_addressbook(kind, tmp_path, reversed(names))
+    iterator = addressbook.sorted_iterator(10)
+    assert get_numbers(next(iterator)) == list(range(1, 11))
+    resumed = addressbook.sorted_iterator(10, cursor=iterator.cursor)
+    assert iterator.cursor == "Name09"
+    assert get_numbers(next(resumed)) == list(range(11, 21))
+    assert get_numbers(next(resumed)) == list(range(21, 26))
+    ranged = addressbook.sorted_iterator(4, start="Name05", stop="Name15", cursor="Name08")
+    assert get_numbers(next(ranged)) == [5, 6, 7, 8]
+
+
+def test_lookups_return_the_records_in_the_order_of_adding(tmp_path):
+    names = [f"Contact{i}" for i in (7, 3, 19, 0, 12, 5, 28, 1, 16, 9, 22, 14)]
+    addressbook = make_addressbook("memory", tmp_path, ())
+    for name in names:
+        addressbook.add_record(Record(name, "0501234567", "shared@mail.com", "29/02"))
+    for records in (addressbook.get_record_by_phone("+380501234567"),
+                    addressbook.get_record_by_email("shared@mail.com"),
+                    addressbook.get_record_by_birthday("29/02"),
+                    [record for _, record in addressbook.get_upcoming_birthdays(366)]):
+        assert [record.get_name() for record in records] == names
+
+
+def next_birthday(day: int, month: int, cur_date: date):
+    """
+    Reference countdown: the next birthday on or after the date, 29/02 is celebrated on 01/03 in the common years.
+    """
+    for year in (cur_date.year, cur_date.year + 1):
+        if (day, month) == (29, 2) and not isleap(year):
+            birthday = date(year, 3, 1)
+        else:
+            birthday = date(year, month, day)
+        if birthday >= cur_date:
+            return (birthday - cur_date).days
+
+
+@pytest.mark.parametrize("cur_date", [date(2023, 2, 27), date(2023, 2, 28), date(2023, 3, 1), date(2024, 2, 28),
+                                      date(2024, 2, 29), date(2024, 3, 1), date(2023, 12, 30), date(2023, 12, 31),
+                                      date(2024, 12, 31), date(2027, 12, 31), date(2028, 1, 1)])
+def test_upcoming_birthdays_across_29_02_and_the_year_end(tmp_path, cur_date):
+    birthdays = [(1, 1), (2, 1), (28, 2), (29, 2), (1, 3), (2, 3), (30, 12), (31, 12), (15, 6)]
+    addressbook = make_addressbook("memory", tmp_path, ())
+    for day, month in birthdays:
+        addressbook.add_record(Record(f"Born{day:02d}{month:02d}", birthday=f"{day}/{month}"))
+    for days in (0, 1, 2, 3, 366):
+        upcoming = [(offset, record.get_name()) for offset, record in addressbook.get_upcoming_birthdays(days, cur_date)]
+        expected = [(next_birthday(day, month, cur_date), f"Born{day:02d}{month:02d}") for day, month in birthdays]
+        assert sorted(upcoming) == sorted(entry for entry in expected if entry[0] <= days)
+        assert [offset for offset, _ in upcoming] == sorted(offset for offset, _ in upcoming)
@@ -0,0 +1,82 @@
+import threading
+import time
+import pytest
+from change import Change, ChangeType
+from storage import *
+
+
+@pytest.fixture
+def saves(monkeypatch):
+    """
+    Counts the writes of the pickle files and lets the tests wait for them.
+    """
+    counter = {"saves": 0}
+    condition = threading.Condition()
+    store_to_file = AddressBook.store_to_file
+
+    def counting_store_to_file(self, path="", filename=""):
+        store_to_file(self, path, filename)
+        with condition:
+            counter["saves"] += 1
+            condition.notify_all()
+
+    def wait_for(n: int, timeout=5.0):
+        with condition:
+            condition.wait_for(lambda: counter["saves"] >= n, timeout)
+        return counter["saves"]
+
+    monkeypatch.setattr(AddressBook, "store_to_file", counting_store_to_file)
+    counter["wait_for"] = wait_for
+    return counter
+
+
+def test_changes_are_tracked_until_the_book_is_saved(tmp_path):
+    addressbook = AddressBook("test")
+    assert not addressbook.dirty
+    addressbook.add_record(Record("Ann"))
+    addressbook.add_record(Record("Bob"))
+    addressbook.edit_record(Change(ChangeType.ADD_PHONE, "Ann", new_value="0501234567"))
+    addressbook.edit_record(Change(ChangeType.EDIT_NAME, "Bob", new_name="Eve"))
+    addressbook.delete_record("Ann")
+    assert addressbook.dirty and addressbook.get_changed_records() == {"Ann", "Bob", "Eve"}
+    addressbook.store_to_file(path=str(tmp_path))
+    assert not addressbook.dirty and not addressbook.get_changed_records()
+
+
+def test_autosave_after_the_number_of_changes(tmp_path, saves):
+    addressbook = AddressBook("test")
+    addressbook.enable_autosave(str(tmp_path), interval=None, max_changes=3)
+    try:
+        for i in range(2):
+            addressbook.add_record(Record(f"Name{i}"))
+        time.sleep(0.1)
+        assert saves["saves"] == 0
+        addressbook.add_record(Record("Name2"))
+        assert saves["wait_for"](1) == 1
+        for i in range(3, 5):
+            addressbook.add_record(Record(f"Name{i}"))
+        time.sleep(0.1)
+        assert saves["saves"] == 1 and addressbook.dirty
+        addressbook.delete_record("Name0")
+        assert saves["wait_for"](2) == 2
+        addressbook.add_record(Record("Name5"))
+    finally:
+        addressbook.close()
+    assert saves["saves"] == 2
+
+
+def test_autosave_after_the_interval_skips_unchanged_books(tmp_path, saves):
+    addressbook = AddressBook("test")
+    addressbook.enable_autosave(str(tmp_path), interval=0.05, max_changes=None)
+    try:
+        time.sleep(0.2)
+        assert saves["saves"] == 0
+        addressbook.add_record(Record("Ann"))
+        assert saves["wait_for"](1) == 1
+        time.sleep(0.2)
+        assert saves["saves"] == 1
+    finally:
+        addressbook.close()
+    loaded = AddressBook()
+    loaded.load_from_file(str(tmp_path / "test.bin"))
+    assert list(loaded.data) == ["Ann"]
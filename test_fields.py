@@ -0,0 +1,32 @@
+import warnings
+import pytest
+from fields import *
+
+PHONES = ["0501234567", "+380501234567", "00380501234567", "12", "+12", "+1", "+", "", "1234567890123456",
+          "+1234567890123456", "050 123", "050-123", "+38a", "٠٥٠١٢٣٤", "+٣٨٠٥٠", "²³⁴", "123\n", "++123", "1+23"]
+EMAILS = ["ann@mail.com", "ann.b@mail.com", "ann@mail.co.uk", "ann@mail", "ann", "", "@.", "a@b@c.d", "a@b.c\n",
+          "a\n@b.c", "ann@mail..com"]
+BIRTHDAYS = ["29/02", "1/1", "01/01/1990", "31/04", "30/02", "0008/9", "000024/0001/54", "32/01", "00/01", "1/13",
+             "", "1", "a/b", "1/1/", " 1/2", "١/٢"]
+
+
+def validate_one(cls, value):
+    """
+    Returns (valid, normalised value, warned) of a single field created with the value.
+    """
+    with warnings.catch_warnings(record=True) as warning_list:
+        warnings.simplefilter("always")
+        try:
+            field = cls(value)
+        except MyException:
+            return False, None, bool(warning_list)
+    return True, field.value, bool(warning_list)
+
+
+@pytest.mark.parametrize("cls, validator, values", [(Phone, validate_phones, PHONES), (Email, validate_emails, EMAILS),
+                                                    (Birthday, validate_birthdays, BIRTHDAYS)])
+def test_batch_validators_agree_with_the_fields(cls, validator, values):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        batch = validator(values)
+    assert list(zip(*batch)) == [validate_one(cls, value) for value in values]
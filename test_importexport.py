@@ -0,0 +1,85 @@
+import multiprocessing
+import warnings
+from functools import partial
+import pytest
+import importexport
+from importexport import *
+
+
+def import_with(tmp_path, content: str, workers: int):
+    filename = tmp_path / "contacts.csv"
+    filename.write_text(content, encoding="utf-8")
+    addressbook = AddressBook("test")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        report = import_records(addressbook, str(filename), workers=workers)
+    return addressbook, report
+
+
+def test_serial_and_parallel_imports_give_identical_reports(tmp_path):
+    content = "name,phones,emails,birthday\n" \
+              "Ann,+380501234567;0501234567,,\n" \
+              "Bob,00380671112233;+380501234567,bob@mail.com,01/02\n" \
+              "Eve,12;abc,,\n" \
+              "Ann,0931112233,ann@mail.com;ann@mail.com,\n" \
+              ",0931112233,,\n"
+    serial_book, serial_report = import_with(tmp_path, content, workers=0)
+    parallel_book, parallel_report = import_with(tmp_path, content, workers=1)
+    assert serial_report.to_string() == parallel_report.to_string()
+    assert serial_report.errors[0] == (1, "Phone '0501234567' is already present.")
+    assert sorted(serial_book.data) == sorted(parallel_book.data) == ["Bob"]
+    bob = parallel_book.data["Bob"]
+    assert bob.get_phones() == ["00380671112233", "+380501234567"]
+    assert bob.phones.get_position("380501234567") == 1
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_import_of_a_directory_is_reported(tmp_path, workers):
+    folder = tmp_path / "contacts.csv"
+    folder.mkdir()
+    with pytest.raises(MyException, match="cannot be imported"):
+        import_records(AddressBook("test"), str(folder), workers=workers)
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_import_of_a_missing_file_is_reported(tmp_path, workers):
+    with pytest.raises(MyException, match="does not exist"):
+        import_records(AddressBook("test"), str(tmp_path / "missing.csv"), workers=workers)
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_failed_import_adds_nothing(tmp_path, workers):
+    rows = "".join(f"Name{i},050{i:07d},,\n" for i in range(100))
+    not_utf8 = tmp_path / "latin1.csv"
+    not_utf8.write_bytes(("name,phones,emails,birthday\n" + rows).encode("utf-8") + "Zoë,,,\n".encode("latin-1"))
+    broken_csv = tmp_path / "broken.csv"
+    broken_csv.write_text("name,phones,emails,birthday\n" + rows + "Ann,,\"" + "x" * 200000 + "\",\n", encoding="utf-8")
+    for filename in (not_utf8, broken_csv):
+        addressbook = AddressBook("test")
+        with pytest.raises(MyException, match="cannot be imported"):
+            import_records(addressbook, str(filename), workers=workers)
+        assert len(addressbook.data) == 0
+
+
+def test_malformed_json_lines_are_skipped(tmp_path):
+    filename = tmp_path / "contacts.jsonl"
+    filename.write_text('{"name": "Ann", "phones": ["0501234567"]}\n{"name": \n[1, 2]\n', encoding="utf-8")
+    addressbook = AddressBook("test")
+    report = import_records(addressbook, str(filename))
+    assert (report.imported, report.skipped) == (1, 2)
+    assert list(addressbook.data) == ["Ann"]
+
+
+def test_spawned_workers_use_the_country_code(tmp_path, monkeypatch):
+    spawn_context = multiprocessing.get_context("spawn")
+    monkeypatch.setattr(importexport, "ProcessPoolExecutor", partial(ProcessPoolExecutor, mp_context=spawn_context))
+    monkeypatch.setattr(Phone, "country_code", Phone.country_code)
+    Phone.set_country_code("+44")
+    content = "name,phones,emails,birthday\n" \
+              "Ann,+447700900123;07700900123,,\n" \
+              "Bob,+447700900456;0380671112233,,\n"
+    serial_book, serial_report = import_with(tmp_path, content, workers=0)
+    parallel_book, parallel_report = import_with(tmp_path, content, workers=1)
+    assert serial_report.to_string() == parallel_report.to_string()
+    assert serial_report.errors == [(1, "Phone '07700900123' is already present.")]
+    assert sorted(parallel_book.data) == ["Bob"]
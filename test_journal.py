@@ -0,0 +1,44 @@
+import os
+import pytest
+from storage import *
+
+
+def journaled_book(folder: str):
+    addressbook = AddressBook("test")
+    addressbook.add_record(Record("Ann", "0501234567"))
+    addressbook.store_to_file(path=folder)
+    addressbook.enable_journal(path=folder)
+    addressbook.add_record(Record("Bob", "0671112233", "bob@mail.com"))
+    addressbook.delete_record("Ann")
+    addressbook.add_record(Record("Eve", "0931112233", "eve@mail.com", "29/02"))
+    addressbook.flush_journal()
+    addressbook.close()
+    return os.path.join(folder, "test.bin")
+
+
+def load(filename: str):
+    addressbook = AddressBook()
+    addressbook.load_from_file(filename)
+    return addressbook
+
+
+@pytest.mark.parametrize("cut", [1, 10, 40, 75])
+def test_journal_with_a_truncated_tail_is_replayed_and_appended_to(tmp_path, cut):
+    filename = journaled_book(str(tmp_path))
+    journal = AddressBook.get_journal_filename(filename)
+    os.truncate(journal, os.path.getsize(journal) - cut)
+    addressbook = load(filename)
+    assert list(addressbook.data) == ["Bob"]
+    assert addressbook.get_record_by_phone("0671112233")[0].get_name() == "Bob"
+    addressbook.add_record(Record("Zed", "0501234567"))
+    addressbook.flush_journal()
+    addressbook.close()
+    addressbook = load(filename)
+    assert list(addressbook.data) == ["Bob", "Zed"]
+    assert addressbook.get_record_by_phone("+380501234567")[0].get_name() == "Zed"
+
+
+def test_complete_journal_is_replayed(tmp_path):
+    addressbook = load(journaled_book(str(tmp_path)))
+    assert list(addressbook.data) == ["Bob", "Eve"]
+    assert [record.get_name() for record in addressbook.get_record_by_birthday("29/02")] == ["Eve"]
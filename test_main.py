@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import pytest
+import main as app
+from main import *
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(app, "ADDRESSBOOK", AddressBook("test"))
+    monkeypatch.setattr(app, "INSTRUMENTATION", Instrumentation())
+
+
+def test_trie_holds_the_registered_handlers():
+    assert command_parcer("exit")[0] is exit_handler
+    assert command_parcer("Good bye now") == (exit_handler, ["now"])
+    assert command_parcer("show sorted 5") == (show_sorted_handler, ["5"])
+    assert command_parcer("show all") == (show_all_handler, [])
+    assert command_parcer("show") == (None, None)
+
+
+def test_instrumented_calls_are_counted_per_command():
+    run_batch(["stats on", "add Ann 0501234567", "add Bob", "show all", "change Nobody -n X", "stats off",
+               "add Carl"])
+    metrics = app.INSTRUMENTATION.metrics
+    assert metrics["add"].calls == 2
+    assert metrics["show all"].calls == 1
+    assert metrics["change"].calls == 1 and metrics["change"].errors == 1
+    assert "exit" not in metrics
+    assert len(app.ADDRESSBOOK) == 3
+
+
+def test_dispatch_takes_the_longest_overlapping_command(monkeypatch):
+    monkeypatch.setattr(app, "COMMANDS", {})
+    monkeypatch.setattr(app, "COMMAND_TRIE", {})
+
+    def handler(name):
+        return lambda args: (name, args)
+
+    show, show_all, show_all_sorted, new = handler("show"), handler("show all"), handler("show all sorted"), handler("new")
+    register_command(show, "show")
+    register_command(show_all, "show all", "all")
+    register_command(show_all_sorted, "show all sorted")
+    register_command(new, "new", "New Contact")
+    assert command_parcer("show") == (show, [])
+    assert command_parcer("SHOW  All 10") == (show_all, ["10"])
+    assert command_parcer("show all sorted 10") == (show_all_sorted, ["10"])
+    assert command_parcer("show allsorted") == (show, ["allsorted"])
+    assert command_parcer("show sorted all") == (show, ["sorted", "all"])
+    assert command_parcer("all") == (show_all, [])
+    assert command_parcer("new contact Ann") == (new, ["Ann"])
+    assert command_parcer("new Ann") == (new, ["Ann"])
+    assert command_parcer("contact") == (None, None)
+    assert command_parcer("") == (None, None)
+    assert app.COMMANDS[show_all] == ["show all", "all"]
+
+
+@pytest.mark.parametrize("country_code, duplicate", [("44", True), ("+380", False)])
+def test_country_code_option_sets_the_phone_keys(tmp_path, country_code, duplicate):
+    commands = "add Ann 07700900123\nchange Ann +p +447700900123\nfind -p 00447700900123\n"
+    completed = subprocess.run([sys.executable, os.path.abspath(app.__file__), "--country-code", country_code,
+                                "--batch", "-", "--verbose"], input=commands, capture_output=True, text=True,
+                               cwd=tmp_path, timeout=60)
+    assert completed.returncode == 0
+    assert ("Phone '+447700900123' is already present." in completed.stderr) == duplicate
+    assert "Ann" in completed.stdout and "No record with the phone" not in completed.stderr
@@ -0,0 +1,78 @@
+from datetime import date
+import pytest
+from record import *
+
+
+@pytest.mark.parametrize("position", ["first", "last"])
+def test_changes_of_the_first_or_last_value_of_an_empty_list_are_refused(position):
+    record = Record("Ann")
+    with pytest.raises(MyException, match=f"{position.title()} phone can't be removed: the list is empty."):
+        record.remove_phone_number(**{position: True})
+    with pytest.raises(MyException, match=f"{position.title()} e-mail can't be edited: the list is empty."):
+        record.edit_email("ann@mail.com", **{position: True})
+    with pytest.raises(MyException, match="Please specify the e-mail which has to be removed."):
+        record.remove_email()
+
+
+def check_positions(phones: FieldList):
+    assert [phones.get_position(phone.get_key()) for phone in phones] == list(range(len(phones)))
+    assert phones.positions is None or len(phones.positions) == len(phones)
+
+
+@pytest.mark.parametrize("length", [5, 12])
+def test_all_list_mutators_keep_the_positions(length):
+    phones = FieldList(Phone(f"+3805012345{i:02d}") for i in range(length))
+    extra = [Phone(f"+3806712345{i:02d}") for i in range(8)]
+    mutations = [
+        lambda: phones.append(extra[0]),
+        lambda: phones.insert(1, extra[1]),
+        lambda: phones.pop(2),
+        lambda: phones.__delitem__(0),
+        lambda: phones.__setitem__(-1, extra[2]),
+        lambda: phones.remove(phones[1]),
+        lambda: phones.sort(key=lambda phone: phone.get_value()),
+        lambda: phones.reverse(),
+        lambda: phones.__setitem__(slice(0, 2), extra[3:5]),
+        lambda: phones.__delitem__(slice(1, 3)),
+        lambda: phones.__iadd__(extra[5:]),
+        lambda: phones.extend([]),
+    ]
+    for mutate in mutations:
+        mutate()
+        check_positions(phones)
+    del phones[:]
+    assert phones.positions is None and not phones.contains_key(extra[5].get_key())
+
+
+@pytest.mark.filterwarnings("ignore:.*you are overwriting existing birthday info")
+@pytest.mark.parametrize("mutate", [
+    lambda record: record.set_name("Bob"),
+    lambda record: record.edit_name("Bob"),
+    lambda record: record.edit_birthday("31/12"),
+    lambda record: record.remove_birthday(),
+    lambda record: record.add_phone_number("0931112233"),
+    lambda record: record.add_phone_number("0931112233", idx=1),
+    lambda record: record.add_email("ann@work.com", add_to_beginning=True),
+    lambda record: record.remove_phone_number("0501234567"),
+    lambda record: record.remove_phone_number(last=True),
+    lambda record: record.remove_email(idx=1),
+    lambda record: record.edit_phone_number("0931112233", first=True),
+    lambda record: record.edit_email("ann@work.com", cur_value="ann@mail.com"),
+])
+def test_every_mutator_invalidates_the_rendered_record(mutate):
+    record = Record("Ann", "0501234567", "ann@mail.com", "29/02")
+    record.add_phone_number("0671112233")
+    today = Today(date(2024, 2, 1))
+    before = record.to_string(today)
+    mutate(record)
+    after = record.to_string(today)
+    record.invalidate_rendering()
+    assert after == record.to_string(today) != before
+
+
+def test_rendered_record_follows_the_date():
+    record = Record("Ann", birthday="29/02")
+    first, second = record.to_string(Today(date(2024, 2, 1))), record.to_string(Today(date(2024, 2, 2)))
+    assert first != second
+    record.invalidate_rendering()
+    assert record.to_string(Today(date(2024, 2, 2))) == second
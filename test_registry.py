@@ -0,0 +1,50 @@
+import pytest
+from registry import *
+
+
+@pytest.fixture
+def saves(monkeypatch):
+    """
+    Counts the writes of the pickle files by username.
+    """
+    counts = {}
+    store_to_file = AddressBook.store_to_file
+
+    def counting_store_to_file(self, path="", filename=""):
+        counts[self.get_username()] = counts.get(self.get_username(), 0) + 1
+        return store_to_file(self, path, filename)
+
+    monkeypatch.setattr(AddressBook, "store_to_file", counting_store_to_file)
+    return counts
+
+
+def store_books(folder: str, *usernames):
+    for username in usernames:
+        addressbook = AddressBook(username)
+        addressbook.add_record(Record(f"{username}_contact"))
+        addressbook.store_to_file(path=folder)
+
+
+def test_eviction_flushes_only_the_changed_books(tmp_path, saves):
+    folder = str(tmp_path)
+    store_books(folder, "ann", "bob", "eve")
+    saves.clear()
+    registry = BookRegistry(folder, capacity=2)
+    ann = registry.open("ann")
+    ann.add_record(Record("Zed"))
+    assert registry.open("bob") is registry.open("bob")
+    registry.open("eve")
+    assert "ann" not in registry and list(registry.books) == ["bob", "eve"]
+    assert saves == {"ann": 1}
+    registry.open("ann")
+    assert "bob" not in registry and saves == {"ann": 1}
+    assert sorted(registry.open("ann").data) == ["Zed", "ann_contact"]
+    registry.open("eve").delete_record("eve_contact")
+    registry.close_all()
+    assert len(registry) == 0 and saves == {"ann": 1, "eve": 1}
+    assert len(BookRegistry(folder).open("eve")) == 0
+
+
+def test_unknown_user_is_reported(tmp_path):
+    with pytest.raises(MyException, match="No address book stored for the user 'nobody'"):
+        BookRegistry(str(tmp_path)).open("nobody")
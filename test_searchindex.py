@@ -0,0 +1,50 @@
+import random
+import pytest
+from searchindex import *
+
+LETTERS = "abcdeéklmnorsty"
+
+
+def add_typos(rnd: random.Random, name: str, typos: int):
+    """
+    Adds random typos: insertions, deletions, substitutions and transpositions of adjacent characters.
+    """
+    for _ in range(typos):
+        position = rnd.randrange(len(name) + 1)
+        kind = rnd.choice(("insert", "delete", "substitute", "transpose"))
+        if kind == "insert" or len(name) < 2:
+            name = name[:position] + rnd.choice(LETTERS) + name[position:]
+        elif kind == "delete":
+            position = min(position, len(name) - 1)
+            name = name[:position] + name[position + 1:]
+        elif kind == "substitute":
+            position = min(position, len(name) - 1)
+            name = name[:position] + rnd.choice(LETTERS) + name[position + 1:]
+        else:
+            position = min(position, len(name) - 2)
+            name = name[:position] + name[position + 1] + name[position] + name[position + 2:]
+    return name
+
+
+def test_fuzzy_search_finds_the_same_names_as_a_full_scan():
+    rnd = random.Random(24)
+    names = {"".join(rnd.choice(LETTERS) for _ in range(rnd.randint(2, 12))).title() for _ in range(300)}
+    index = FuzzyNameIndex(names)
+    for query in [add_typos(rnd, rnd.choice(sorted(names)), rnd.randint(0, 3)) for _ in range(300)]:
+        for max_distance in (0, 1, 2):
+            expected = sorted((FuzzyNameIndex.distance(query.lower(), name.lower(), max_distance), name)
+                              for name in names)
+            assert index.find(query, max_distance) == [entry for entry in expected if entry[0] <= max_distance]
+
+
+def test_fuzzy_search_with_typos():
+    index = FuzzyNameIndex(["Alexander", "Alexandra", "Oleksandr", "Ann", "Anna", "ann"])
+    assert index.find("Alxeander") == [(1, "Alexander")]
+    assert index.find("alexnadra", 1) == [(1, "Alexandra")]
+    assert index.find("An") == [(1, "Ann"), (1, "ann"), (2, "Anna")]
+    assert index.find("Oleksndr", 1) == [(1, "Oleksandr")]
+    assert index.find("Olexandr", 1) == []
+    index.remove("Ann")
+    index.add("Anne")
+    assert index.find("ann", 0) == [(0, "ann")]
+    assert index.find("Annie", 2) == [(1, "Anne"), (2, "Anna"), (2, "ann")]
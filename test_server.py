@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+import main as app
+import server
+from main import *
+from server import read_response
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, "ADDRESSBOOK", AddressBook("test"))
+    monkeypatch.setattr(server, "BOOK_LOCK", asyncio.Lock())
+
+
+async def session(*command_lists):
+    """
+    Sends the lists of commands over concurrent connections and collects the responses of each connection.
+    """
+    tcp_server = await asyncio.start_server(server.handle_client, host="127.0.0.1", port=0)
+    port = tcp_server.sockets[0].getsockname()[1]
+
+    async def client(commands):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for command in commands:
+            writer.write(f"{command}\n".encode("utf-8"))
+            responses.append(await read_response(reader))
+        writer.close()
+        return responses
+
+    async with tcp_server:
+        return await asyncio.gather(*(client(commands) for commands in command_lists))
+
+
+@pytest.mark.parametrize("command", ["load Bob", "store", "compact", "import contacts.csv", "export contacts.csv",
+                                     "new username Bob", "stats dump stats.json"])
+def test_server_refuses_the_commands_of_the_operator(command):
+    [responses] = asyncio.run(session([command, "username"]))
+    status, text = responses[0]
+    assert status == "ERROR" and "is not available over the network" in text
+    assert responses[1] == ("OK", "test")
+    assert not list(os.scandir())
+
+
+def test_concurrent_clients_share_the_address_book():
+    adds = [[f"add Client{client}_{i} 050123{client}{i:03d}" for i in range(20)] for client in range(4)]
+    results = asyncio.run(session(*adds))
+    assert all(status == "OK" for responses in results for status, _ in responses)
+    assert len(app.ADDRESSBOOK) == 80
+    [responses] = asyncio.run(session(["show all 50", "more", "more", "exit"]))
+    assert [status for status, _ in responses] == ["PAGE", "PAGE", "OK", "BYE"]
+    assert responses[2][1] == server.NO_MORE_RESULTS
@@ -0,0 +1,176 @@
+import re
+import warnings
+import pytest
+from change import Change, ChangeType
+from storage import *
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def addressbook(request, tmp_path):
+    if request.param == "sqlite":
+        addressbook = SQLiteAddressBook(str(tmp_path / "test.db"), "test")
+    else:
+        addressbook = AddressBook("test")
+    yield addressbook
+    addressbook.close()
+
+
+def fill(addressbook):
+    addressbook.add_record(Record("A", "0501111111", "a@mail.com"))
+    addressbook.add_record(Record("B", "0502222222", "b@mail.com", "29/02"))
+    addressbook.add_record(Record("C", "0503333333", "shared@mail.com", "31/12"))
+    addressbook.add_record(Record("D", "0504444444", "shared@mail.com", "01/01"))
+
+
+def test_edits_keep_the_order_of_the_records(addressbook):
+    fill(addressbook)
+    addressbook.edit_record(Change(ChangeType.EDIT_BIRTHDAY, "A", new_birthday="05/05"))
+    addressbook.edit_records([Change(ChangeType.ADD_PHONE, "B", new_value="0671234567"),
+                              Change(ChangeType.REMOVE_EMAIL, "C", cur_value="shared@mail.com")])
+    assert list(addressbook.data) == ["A", "B", "C", "D"]
+    assert addressbook.get_record_by_name("A").get_birthday() == "05/05"
+    addressbook.edit_record(Change(ChangeType.EDIT_NAME, "A", new_name="E"))
+    assert list(addressbook.data) == ["B", "C", "D", "E"]
+
+
+def test_backends_give_the_same_results(addressbook):
+    fill(addressbook)
+    assert [record.get_name() for record in addressbook.get_record_by_phone("+380502222222")] == ["B"]
+    assert [record.get_name() for record in addressbook.get_record_by_email("shared@mail.com")] == ["C", "D"]
+    assert [record.get_name() for record in addressbook.get_record_by_birthday("29/2")] == ["B"]
+    assert sorted(record.get_name() for record in addressbook.get_record_by_fragment("050")) == ["A", "B", "C", "D"]
+    assert addressbook.get_names_in_range("B", "D") == ["B", "C"]
+    addressbook.delete_record("C")
+    assert [record.get_name() for record in addressbook.get_record_by_email("shared@mail.com")] == ["D"]
+    with pytest.raises(MyException):
+        addressbook.get_record_by_phone("0503333333")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        addressbook.edit_record(Change(ChangeType.EDIT_NAME, "A", new_name="B"))
+    assert list(addressbook.data) == ["B", "D"]
+    assert addressbook.get_record_by_name("B").get_phones() == ["0501111111"]
+
+
+def describe(addressbook):
+    return [record.to_string() for record in addressbook.data.values()], \
+        [record.get_name() for record in addressbook.get_record_by_email("shared@mail.com")], \
+        addressbook.get_changed_records()
+
+
+@pytest.mark.parametrize("failing", [
+    Change(ChangeType.ADD_PHONE, "D", new_value="0504444444"),
+    Change(ChangeType.EDIT_PHONE, "A", cur_value="0999999999", new_value="0931112233"),
+    Change(ChangeType.REMOVE_EMAIL, "Nobody", cur_value="a@mail.com"),
+    Change(ChangeType.EDIT_BIRTHDAY, "A", new_birthday="30/02"),
+    Change(ChangeType.ADD_EMAIL, "A"),
+])
+def test_failed_transaction_changes_nothing(addressbook, failing):
+    fill(addressbook)
+    addressbook.mark_saved()
+    before = describe(addressbook)
+    changes = [Change(ChangeType.EDIT_NAME, "B", new_name="F"),
+               Change(ChangeType.ADD_PHONE, "F", new_value="0671234567"),
+               Change(ChangeType.REMOVE_EMAIL, "C", cur_value="shared@mail.com"),
+               Change(ChangeType.EDIT_EMAIL, "D", cur_value="shared@mail.com", new_value="d@mail.com"),
+               failing]
+    with pytest.raises(MyException, match="Change 5 of 5 cannot be performed, no changes were made"):
+        addressbook.edit_records(changes)
+    assert describe(addressbook) == before
+    assert addressbook.get_record_by_phone("0502222222")[0].get_name() == "B"
+    with pytest.raises(MyException):
+        addressbook.get_record_by_name("F")
+    addressbook.edit_records(changes[:-1])
+    assert list(addressbook.data) == ["A", "C", "D", "F"]
+    assert [record.get_name() for record in addressbook.get_record_by_phone("0671234567")] == ["F"]
+
+
+def snapshot_of(addressbook, folder: str):
+    return SnapshotStorage(folder, addressbook.get_username()).save(addressbook)
+
+
+def apply_edits(addressbook):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        addressbook.add_record(Record("E", "0505555555", "shared@mail.com"))
+        addressbook.delete_record("A")
+        addressbook.edit_records([Change(ChangeType.EDIT_NAME, "B", new_name="F"),
+                                  Change(ChangeType.ADD_PHONE, "C", new_value="0671234567"),
+                                  Change(ChangeType.EDIT_BIRTHDAY, "D", new_birthday="29/02")])
+
+
+def test_snapshot_round_trip(tmp_path):
+    expected = AddressBook("test")
+    fill(expected)
+    snapshot = snapshot_of(expected, str(tmp_path))
+    for step in range(2):
+        reopened = SnapshotStorage(str(tmp_path), "test").open()
+        assert reopened.get_username() == "test" and list(reopened.data) == list(expected.data)
+        assert [record.to_string() for record in reopened.data.values()] == \
+               [record.to_string() for record in expected.data.values()]
+        for lookup, value in (("get_record_by_email", "shared@mail.com"), ("get_record_by_birthday", "29/02"),
+                              ("get_record_by_phone", "0503333333")):
+            assert sorted(record.get_name() for record in getattr(reopened, lookup)(value)) == \
+                   sorted(record.get_name() for record in getattr(expected, lookup)(value))
+        reopened.close()
+        if step == 0:
+            apply_edits(expected)
+            apply_edits(snapshot)
+            snapshot.store_to_file(str(tmp_path))
+    snapshot.close()
+
+
+def test_snapshot_keeps_a_bounded_number_of_decoded_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(SnapshotRecords, "DECODED_CACHE_SIZE", 5)
+    addressbook = AddressBook("test")
+    addressbook.add_records(Record(f"Name{i:02d}", f"0501234{i:03d}") for i in range(20))
+    snapshot = snapshot_of(addressbook, str(tmp_path))
+    for name in snapshot.data:
+        assert snapshot.data[name].get_phones() == addressbook.data[name].get_phones()
+        assert len(snapshot.data.decoded) <= 5
+    snapshot.data["Name16"]
+    assert list(snapshot.data.decoded) == ["Name15", "Name17", "Name18", "Name19", "Name16"]
+    assert snapshot.data["Name00"].get_name() == "Name00" and "Name15" not in snapshot.data.decoded
+    snapshot.close()
+
+
+def test_fuzzy_search_follows_the_changes(addressbook):
+    fill(addressbook)
+    assert [record.get_name() for record in addressbook.get_record_by_fuzzy_name("c", 0)] == ["C"]
+    addressbook.edit_record(Change(ChangeType.EDIT_NAME, "A", new_name="Alexander"))
+    addressbook.add_record(Record("Alexandra"))
+    assert [record.get_name() for record in addressbook.get_record_by_fuzzy_name("alexnader")] == ["Alexander"]
+    assert [record.get_name() for record in addressbook.get_record_by_fuzzy_name("Alexandr")] == \
+           ["Alexander", "Alexandra"]
+    addressbook.delete_record("Alexander")
+    with pytest.raises(MyException, match="No record with a name similar to 'Alexnder'"):
+        addressbook.get_record_by_fuzzy_name("Alexnder", 1)
+
+
+@pytest.mark.parametrize("kind", ["pickle", "sqlite"])
+def test_phone_duplicates_are_found_by_the_keys_of_the_country_code(tmp_path, monkeypatch, kind):
+    monkeypatch.setattr(Phone, "country_code", Phone.country_code)
+    Phone.set_country_code("+44")
+    if kind == "sqlite":
+        addressbook = SQLiteAddressBook(str(tmp_path / "test.db"), "test")
+    else:
+        addressbook = AddressBook("test")
+    addressbook.add_record(Record("Ann", "07700900123"))
+    for duplicate in ("+447700900123", "00447700900123", "447700900123"):
+        with pytest.raises(MyException, match=re.escape(f"Phone '{duplicate}' is already present.")):
+            addressbook.edit_record(Change(ChangeType.ADD_PHONE, "Ann", new_value=duplicate))
+    assert addressbook.get_record_by_phone("00447700900123")[0].get_name() == "Ann"
+    if kind == "sqlite":
+        addressbook.close()
+        Phone.set_country_code("380")
+        addressbook = SQLiteAddressBook(str(tmp_path / "test.db"))
+    else:
+        addressbook.store_to_file(str(tmp_path))
+        Phone.set_country_code("380")
+        addressbook = AddressBook()
+        addressbook.load_from_file(str(tmp_path / "test.bin"))
+    assert addressbook.get_record_by_phone("+3807700900123")[0].get_name() == "Ann"
+    with pytest.raises(MyException):
+        addressbook.get_record_by_phone("+447700900123")
+    addressbook.edit_record(Change(ChangeType.ADD_PHONE, "Ann", new_value="+447700900123"))
+    assert addressbook.get_record_by_name("Ann").get_phones() == ["07700900123", "+447700900123"]
+    addressbook.close()